@@ -3,57 +3,24 @@ import os
 import re
 from pathlib import Path
 
-name_to_id = {
-    "Genesis": "GEN",
-    "Exodus": "EXO",
-    "Leviticus": "LEV",
-    "Numbers": "NUM",
-    "Deuteronomy": "DEU",
-    "Joshua": "JOS",
-    "Judges": "JDG",
-    "Ruth": "RUT",
-    "I Samuel": "1SA",
-    "II Samuel": "2SA",
-    "I Kings": "1KI",
-    "II Kings": "2KI",
-    "I Chronicles": "1CH",
-    "II Chronicles": "2CH",
-    "Ezra": "EZR",
-    "Nehemiah": "NEH",
-    "Esther": "EST",
-    "Job": "JOB",
-    "Psalms": "PSA",
-    "Proverbs": "PRO",
-    "Ecclesiastes": "ECC",
-    "Song of Solomon": "SNG",
-    "Isaiah": "ISA",
-    "Jeremiah": "JER",
-    "Lamentations": "LAM",
-    "Ezekiel": "EZK",
-    "Daniel": "DAN",
-    "Hosea": "HOS",
-    "Joel": "JOL",
-    "Amos": "AMO",
-    "Obadiah": "OBA",
-    "Jonah": "JON",
-    "Micah": "MIC",
-    "Nahum": "NAM",
-    "Habakkuk": "HAB",
-    "Zephaniah": "ZEP",
-    "Haggai": "HAG",
-    "Zechariah": "ZEC",
-    "Malachi": "MAL",
-}
+from sfm_parser import Event, generate
+from versification import book_file_name, book_id_from_name
+
+
+re_verse_line = re.compile(r"(.+?) (\d+):(\d+) (.+)")
+
 
 def parse_bible_file(input_file):
-    sfm_files = {}
+    """Yield the \\id, \\c and \\v events for a text file with a verse on each line, like 'I Samuel 1:1 text'."""
     with open(input_file, "r", encoding="utf-8") as file:
         current_book = None
         current_chapter = None
-        for line in file:
-            match = re.match(r"(.+?) (\d+):(\d+) (.+)", line)
+        for line_number, line in enumerate(file, 1):
+            match = re_verse_line.match(line)
             if match:
-                book = name_to_id[match.group(1).strip()]
+                book = book_id_from_name(match.group(1))
+                if book is None:
+                    raise ValueError(f"Unknown book name {match.group(1)!r} in line: {line.strip()}")
                 chapter = int(match.group(2).strip())
                 verse = int(match.group(3).strip())
                 text = match.group(4).strip()
@@ -61,31 +28,44 @@ def parse_bible_file(input_file):
                 if book != current_book:
                     current_book = book
                     current_chapter = None
-                    if current_book not in sfm_files:
-                        sfm_files[current_book] = []
+                    yield Event("id", {"book": book}, "", line_number, 1)
 
                 if chapter != current_chapter:
                     current_chapter = chapter
-                    sfm_files[current_book].append([])
-
-                sfm_files[current_book][-1].append((verse, text))
+                    yield Event("c", {"number": str(chapter)}, "", line_number, 1)
 
-    return sfm_files
+                yield Event("v", {"number": str(verse)}, text, line_number, 1)
 
 
-def write_sfm_files(sfm_files, output_dir):
-    for book_num, (book, chapters) in enumerate(sfm_files.items(),1):
-        if not os.path.exists(output_dir):
-            os.makedirs(output_dir)
-        for idx, chapter in enumerate(chapters):
-            output_file = os.path.join(output_dir, f"{book_num:02}{book}.sfm")
-            with open(output_file, "a", encoding="utf-8") as file:
-                if idx == 0:
-                    file.write(f"\\id {book}\n")
-                file.write(f"\\c {idx + 1}\n")
-                for verse, text in chapter:
-                    file.write(f"\\v {verse} {text}\n")
-                file.write("\n")
+def write_sfm_files(events, output_dir):
+    """Write the events to a file for each book, starting a new file at each \\id."""
+    os.makedirs(output_dir, exist_ok=True)
+    written = set()
+    file = None
+    first_chapter = True
+    try:
+        for event in events:
+            if event.marker == "id":
+                if file:
+                    file.write("\n")
+                    file.close()
+                book = event.attributes["book"]
+                # A book that comes back later in the input is added to its file.
+                file = open(os.path.join(output_dir, book_file_name(book)), "a" if book in written else "w", encoding="utf-8")
+                written.add(book)
+                first_chapter = True
+            elif event.marker == "c":
+                if not first_chapter:
+                    file.write("\n")
+                first_chapter = False
+            for line in generate([event]):
+                file.write(line + "\n")
+        if file:
+            file.write("\n")
+    finally:
+        if file:
+            file.close()
+    return written
 
 
 def main():
@@ -100,8 +80,8 @@ def main():
 
     output_folder = Path(args.output)
     print(file, output_folder)
-    sfm_files = parse_bible_file(file)
-    write_sfm_files(sfm_files, output_dir=output_folder)
+    books = write_sfm_files(parse_bible_file(file), output_dir=output_folder)
+    print(f"Wrote {len(books)} books to {output_folder}")
 
 
 if __name__ == "__main__":
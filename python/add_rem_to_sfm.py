@@ -3,7 +3,8 @@ import argparse
 from datetime import date
 from pathlib import Path
 from string import Template
-from pathlib import Path
+
+from sfm_parser import parse_file, parse_lines
 
 # target = Path('out/soong/build.ninja')
 # mtime = target.stat().st_mtime
@@ -34,13 +35,13 @@ def save_file(file, lines):
         for line in lines:
             f_out.write(line + "\n")
 
-def get_id(lines):
-    id = lines[0][4:7]
-    return id
+def get_id_event(events):
+    """The \\id event, reading no further than the \\id line."""
+    for event in events:
+        if event.marker == "id":
+            return event
+    raise RuntimeError("There is no \\id marker in the file.")
 
-def get_description(lines):
-    description = lines[0][7:] if len(lines[0]) > 8 else ""
-    return description.strip()
 
 
 def main() -> None:
@@ -70,10 +71,14 @@ def main() -> None:
 
     files = [file for file in folder.glob("*.sfm") if file not in folder.glob("*.rem.sfm")]
     
+    if not files:
+        print(f"There are no .sfm files in {folder}")
+        exit()
+
+    first_id = get_id_event(parse_file(files[0]))
+    first_book_id = first_id.attributes["book"]
     if not args.source:
-        first_file_lines = get_lines(files[0])
-        first_book_id =  get_id(first_file_lines)
-        description = get_description(first_file_lines)
+        description = first_id.text
 
         # Some ID lines also contain a remark.
         if "\\rem" in description:
@@ -110,14 +115,17 @@ def main() -> None:
             print(f"The output file {file_out} already exists. Skipping")
             continue
         lines = get_lines(file_in)
-        book = get_id(lines)
+        id_event = get_id_event(parse_lines(lines))
+        book = id_event.attributes["book"]
+        # The remark goes on the line after the \\id line.
+        remark_line = id_event.line
         #remark = f"\\rem This draft of {book} was machine translated on {today} from the {source} using model {experiment}.  It should be reviewed and edited carefully."
         next_remark = remark.substitute(book = book, today = date.today(), description = description, experiment = experiment).replace("  ", " ")
-        if lines[1] == next_remark:
+        if remark_line < len(lines) and lines[remark_line] == next_remark:
             print(f"Remark already exists in the input file: {file_in}, making unchanged copy.")
             save_file(file_out,lines)
         else :
-            lines.insert(1, next_remark)
+            lines.insert(remark_line, next_remark)
             save_file(file_out,lines)
             print(f"Added {next_remark} to file {file_out}")
 
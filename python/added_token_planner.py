@@ -0,0 +1,112 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""Plan the added tokens a tokenizer needs for a corpus.
+
+Streams every extract once, in parallel, through the vocabulary coverage index and
+collects the code points the vocabulary can't represent. These are reported with their
+frequency, script and per-file counts, and written as a token list that
+nllbtokenizer.py --added-tokens reads directly.
+"""
+import argparse
+import csv
+import json
+import multiprocessing as mp
+from collections import Counter
+from pathlib import Path
+from typing import Dict, List
+
+from charfreq import script
+from vocab_coverage import CoverageIndex, char_name, coverage_report, default_cache_dir, model_name
+
+
+def plan_added_tokens(uncovered_by_file: Dict[Path, Counter], min_count: int = 1, min_files: int = 1) -> List[dict]:
+    """Summarize the uncovered characters, most frequent first."""
+    totals = Counter()
+    files = Counter()
+    for uncovered in uncovered_by_file.values():
+        totals.update(uncovered)
+        files.update(uncovered.keys())
+
+    plan = []
+    for char, count in totals.most_common():
+        if count < min_count or files[char] < min_files:
+            continue
+        plan.append(
+            {
+                "codepoint": ord(char),
+                "name": char_name(char),
+                "script": script(char),
+                "count": count,
+                "files": files[char],
+            }
+        )
+    return plan
+
+
+def write_token_list(token_file: Path, plan: List[dict], index: CoverageIndex) -> None:
+    token_list = {
+        "model": index.model,
+        "fingerprint": index.fingerprint,
+        "code_points": sorted(entry["codepoint"] for entry in plan),
+    }
+    with open(token_file, "w", encoding="utf-8") as out:
+        json.dump(token_list, out, indent=1)
+
+
+def load_added_tokens(token_file: Path) -> List[str]:
+    """Read a token list written by this planner and return the characters to add to the tokenizer."""
+    with open(token_file, "r", encoding="utf-8") as in_file:
+        token_list = json.load(in_file)
+    return [chr(code_point) for code_point in token_list["code_points"]]
+
+
+def write_plan(summary_file: Path, detail_file: Path, plan: List[dict], uncovered_by_file: Dict[Path, Counter]) -> None:
+    fieldnames = ["codepoint", "name", "script", "count", "files"]
+    with open(summary_file, "w", encoding="utf-8", newline="") as csv_file:
+        writer = csv.DictWriter(csv_file, fieldnames=fieldnames)
+        writer.writeheader()
+        writer.writerows(plan)
+
+    planned = {chr(entry["codepoint"]): entry for entry in plan}
+    with open(detail_file, "w", encoding="utf-8", newline="") as csv_file:
+        writer = csv.writer(csv_file)
+        writer.writerow(["file", "codepoint", "name", "script", "count"])
+        for file, uncovered in sorted(uncovered_by_file.items()):
+            for char, count in uncovered.most_common():
+                if char in planned:
+                    writer.writerow([file.name, ord(char), planned[char]["name"], planned[char]["script"], count])
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description="Find the characters in the extracts that need to be added to the tokenizer."
+    )
+    parser.add_argument("input", type=Path, help="Folder of extracts.")
+    parser.add_argument("output", type=Path, help="Folder for the token list and reports.")
+    parser.add_argument("--model", default=model_name, help=f"Tokenizer to plan for. The default is {model_name}")
+    parser.add_argument("--index", type=Path, help="Use a saved coverage index instead of loading the tokenizer.")
+    parser.add_argument("--cache-dir", type=Path, default=default_cache_dir, help="Folder for saved coverage indexes.")
+    parser.add_argument("--min-count", type=int, default=1, help="Omit characters that occur fewer times than this.")
+    parser.add_argument("--min-files", type=int, default=1, help="Omit characters found in fewer files than this.")
+    parser.add_argument("--workers", type=int, default=0, help="Number of processes. The default is one per cpu less one.")
+    args = parser.parse_args()
+
+    index = CoverageIndex.load(args.index) if args.index else CoverageIndex.from_model(args.model, args.cache_dir)
+
+    files = sorted(args.input.glob("*.txt"))
+    print(f"Scanning {len(files)} extracts for characters not covered by {index.model}.")
+    uncovered_by_file = coverage_report(files, index, args.workers)
+
+    plan = plan_added_tokens(uncovered_by_file, args.min_count, args.min_files)
+    print(f"{len(plan)} characters need to be added as tokens.")
+
+    args.output.mkdir(parents=True, exist_ok=True)
+    token_file = args.output / "added_tokens.json"
+    write_token_list(token_file, plan, index)
+    write_plan(args.output / "added_tokens_summary.csv", args.output / "added_tokens_by_file.csv", plan, uncovered_by_file)
+    print(f"Wrote the token list to {token_file} and the reports to {args.output}")
+
+
+if __name__ == "__main__":
+    mp.freeze_support()
+    main()
@@ -0,0 +1,54 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""Pre and post processing around the HuggingFace added token bug.
+
+Characters added to the tokenizer are followed by U+FFFC before tokenizing, and the
+resulting '▁', U+FFFC token pairs are stripped out again afterwards.
+The preprocessing is a single str.translate over a batch of lines and the post
+processing is one linear pass over each token list.
+
+test_added_tokens.py checks that the output is identical to the original prep and
+post_process functions.
+"""
+from typing import Iterable, List, Sequence
+
+special_token = "￼"
+start_of_word = "▁"
+space = " "
+
+
+class AddedTokenProcessor:
+    def __init__(self, code_points: Iterable[int]):
+        self.code_points = frozenset(code_points)
+        self.added_chars = frozenset(chr(code_point) for code_point in self.code_points)
+        self.prep_table = {code_point: chr(code_point) + special_token for code_point in self.code_points}
+
+    def prep(self, line: str) -> str:
+        # Add the special token after every added character.
+        return line.translate(self.prep_table)
+
+    def prep_lines(self, lines: Iterable[str]) -> List[str]:
+        lines = list(lines)
+        prepped = "\n".join(lines).translate(self.prep_table).split("\n")
+        if len(prepped) != len(lines):
+            # Some lines contain line breaks of their own.
+            return [self.prep(line) for line in lines]
+        return prepped
+
+    def post_process(self, tokens: Sequence[str]) -> List[str]:
+        # Remove the '▁', '￼' pairs from the tokenized line.
+        # Tokens that consist of a space and an added token only
+        # are replaced with a start_of_word marker and the added token.
+        post_processed = []
+        for index, token in enumerate(tokens):
+            if token == special_token and tokens[index - 1] == start_of_word:
+                if index > 0:
+                    post_processed.pop()
+                continue
+            if len(token) == 2 and token[0] == space and token[1] in self.added_chars:
+                token = start_of_word + token[1]
+            post_processed.append(token)
+        return post_processed
+
+    def post_process_lines(self, token_lists: Iterable[Sequence[str]]) -> List[List[str]]:
+        return [self.post_process(tokens) for tokens in token_lists]
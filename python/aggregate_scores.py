@@ -2,37 +2,17 @@ from pathlib import Path
 import csv
 import argparse
 
-def parse_scores_file(scores_file):
-    """Parse the CHRF3 scores along with src_iso and trg_iso from a scores file."""
-    scores_data = []
-    with open(scores_file, 'r', newline='') as csvfile:
-        reader = csv.DictReader(csvfile)
-        chrf3_score = None
-        src_iso = None
-        trg_iso = None
-        for row in reader:
-            if row['scorer'] == 'CHRF3':
-                chrf3_score = float(row['score'])
-                src_iso = row['src_iso']
-                trg_iso = row['trg_iso']
-                if chrf3_score is not None and src_iso is not None and trg_iso is not None:
-                    scores_data.append({'src_iso': src_iso, 'trg_iso': trg_iso, 'CHRF3': chrf3_score})
-                    print(f"src_iso: {src_iso}  trg_iso: {trg_iso}  CHRF3: {chrf3_score}")
-    return scores_data
+from column_store import table_rows
+from scores_warehouse import select, sort_rows, update_scores_table
 
-def aggregate_chrf3_scores(series_folder):
+def aggregate_chrf3_scores(table, series_folder):
     """Aggregate CHRF3 scores for each experiment in the series."""
+    chrf3 = select(table, series=series_folder.name, scorer="CHRF3")
     chrf3_scores = {}
-    for experiment_folder in series_folder.iterdir():
-        if experiment_folder.is_dir():
-            scores_files = experiment_folder.glob('scores-*.csv')
-            for scores_file in scores_files:
-                print(f"Reading {scores_file}")
-                scores = parse_scores_file(scores_file)
-                if scores:
-                    experiment_name = experiment_folder.name
-                    chrf3_scores[experiment_name] = scores
-
+    for row in table_rows(sort_rows(chrf3, "experiment", "file")):
+        chrf3_scores.setdefault(row["experiment"], []).append(
+            {'src_iso': row['src_iso'], 'trg_iso': row['trg_iso'], 'CHRF3': row['score']}
+        )
     return chrf3_scores
 
 def write_aggregated_scores(series_folder, chrf3_scores):
@@ -54,11 +34,12 @@ def main():
     args = parser.parse_args()
 
     experiments_folder = Path(args.experiments_folder)
+    table = update_scores_table([experiments_folder])
     if args.series:
         series_folder = experiments_folder / args.series
         if series_folder.is_dir():
             print(f"Looking in series {series_folder}")
-            chrf3_scores = aggregate_chrf3_scores(series_folder)
+            chrf3_scores = aggregate_chrf3_scores(table, series_folder)
             if chrf3_scores:
                 print(f"Found scores in {series_folder}")
                 write_aggregated_scores(series_folder, chrf3_scores)
@@ -68,7 +49,7 @@ def main():
         for series_folder in experiments_folder.iterdir():
             if series_folder.is_dir():
                 print(f"Looking in series {series_folder}")
-                chrf3_scores = aggregate_chrf3_scores(series_folder)
+                chrf3_scores = aggregate_chrf3_scores(table, series_folder)
                 if chrf3_scores:
                     print(f"Found scores in {series_folder}")
                     write_aggregated_scores(series_folder, chrf3_scores)
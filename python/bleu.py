@@ -1,35 +1,26 @@
-from nltk.translate.bleu_score import sentence_bleu
 import argparse
 
+from corpus_scorer import bleu_details, chrf_score, read_lines, sharded_stats
+
 def argparser():
     Argparser = argparse.ArgumentParser()
     Argparser.add_argument('--reference', type=str, default='summaries.txt', help='Reference File')
     Argparser.add_argument('--candidate', type=str, default='candidates.txt', help='Candidate file')
+    Argparser.add_argument('--workers', type=int, default=0, help='Number of processes to use for large files')
 
     args = Argparser.parse_args()
     return args
 
 args = argparser()
 
-reference = open(args.reference, 'r', encoding='utf-8').readlines()
-candidate = open(args.candidate, 'r', encoding='utf-8').readlines()
+reference = read_lines(args.reference)
+candidate = read_lines(args.candidate)
 
 if len(reference) != len(candidate):
     raise ValueError('The number of sentences in both files do not match.')
 
-score = 0.
-count = 0
-
-for i in range(len(reference)):
-    ref = reference[i].strip().split()
-    cand = candidate[i].strip().split()
-    bleu = sentence_bleu(ref,cand)
-    if len(ref) >= 4 and len(cand) >= 4:
-        count += 1
-        score += bleu
-        #print(f"{ref}")
-        #print(f"{cand}")
-        print(f"{len(ref)}, {len(cand)},  ***{bleu}***")
-
-score /= count
-print("The bleu score is: "+str(score))
\ No newline at end of file
+# Corpus scores from the n-gram statistics of all the sentences, not an average of sentence scores.
+stats = sharded_stats(candidate, reference, args.workers)
+
+print("The bleu score is: " + bleu_details(stats["BLEU"].sum(axis=0)))
+print(f"The chrF3 score is: {float(chrf_score(stats['CHRF3'].sum(axis=0))):.2f}")
@@ -0,0 +1,157 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""Rank extracts by how similar their characters are to those of a target language.
+
+The character report written by charfreq.py has the count of every character in every
+extract. From it each extract gets a vector of the relative frequencies of its letters
+and marks, lowercased, and a main script: the script of most of those letters. The
+vectors are the rows of a sparse matrix scaled to unit length, so the cosine similarity
+of every extract to a target is one matrix-vector product. Extracts in the same main
+script as the target rank above those that aren't, then by similarity.
+
+The matrix is built once from the report and saved with the report, e.g.
+    python char_similarity.py character_report.tsv --target ksb --isos swh tgl nya
+"""
+import argparse
+import csv
+from pathlib import Path
+from typing import Dict, Iterable, List, Optional
+
+import numpy as np
+from scipy import sparse
+
+vectors_suffix = ".vectors.npz"
+ignored_scripts = {"Common", "Inherited", "Unknown"}
+
+
+def extract_iso(extract: str) -> str:
+    return Path(extract).stem.split("-")[0]
+
+
+class CharacterVectors:
+    def __init__(self, extracts: np.ndarray, scripts: np.ndarray, codes: np.ndarray, matrix: sparse.csr_matrix):
+        self.extracts = extracts
+        self.scripts = scripts
+        self.codes = codes
+        self.matrix = matrix
+        self.isos = np.array([extract_iso(extract) for extract in extracts.tolist()], dtype=str)
+
+    @classmethod
+    def from_report(cls, report_file: Path) -> "CharacterVectors":
+        """Read a charfreq.py character report, tab delimited if it is a .tsv file."""
+        report_file = Path(report_file)
+        delimiter = "\t" if report_file.suffix == ".tsv" else ","
+        rows, columns, counts = [], [], []
+        extract_ids: Dict[str, int] = {}
+        code_ids: Dict[int, int] = {}
+        script_counts: Dict[str, Dict[str, int]] = {}
+        with open(report_file, "r", encoding="utf-8", newline="") as f:
+            for row in csv.DictReader(f, delimiter=delimiter):
+                if not row.get("cat", "")[:1] in ("L", "M"):
+                    continue
+                extract, count = row["filename"], int(row["count"])
+                code = ord(chr(int(row["code"])).lower()[0])
+                rows.append(extract_ids.setdefault(extract, len(extract_ids)))
+                columns.append(code_ids.setdefault(code, len(code_ids)))
+                counts.append(count)
+                if row["script"] not in ignored_scripts:
+                    scripts = script_counts.setdefault(extract, {})
+                    scripts[row["script"]] = scripts.get(row["script"], 0) + count
+
+        matrix = sparse.csr_matrix(
+            (np.array(counts, dtype=np.float64), (rows, columns)), shape=(len(extract_ids), len(code_ids))
+        )
+        matrix.sum_duplicates()
+        norms = np.sqrt(np.asarray(matrix.multiply(matrix).sum(axis=1)).ravel())
+        matrix = sparse.diags(1 / np.where(norms > 0, norms, 1)) @ matrix
+        extracts = list(extract_ids)
+        main_scripts = [max(script_counts[extract], key=script_counts[extract].get) if extract in script_counts else "" for extract in extracts]
+        codes = np.empty(len(code_ids), dtype=np.int64)
+        codes[list(code_ids.values())] = list(code_ids)
+        return cls(np.array(extracts, dtype=str), np.array(main_scripts, dtype=str), codes, matrix.astype(np.float32).tocsr())
+
+    def save(self, vectors_file: Path) -> Path:
+        np.savez_compressed(
+            vectors_file,
+            extracts=self.extracts,
+            scripts=self.scripts,
+            codes=self.codes,
+            data=self.matrix.data,
+            indices=self.matrix.indices,
+            indptr=self.matrix.indptr,
+            shape=np.array(self.matrix.shape),
+        )
+        return Path(vectors_file)
+
+    @classmethod
+    def load(cls, vectors_file: Path) -> "CharacterVectors":
+        with np.load(vectors_file) as data:
+            matrix = sparse.csr_matrix((data["data"], data["indices"], data["indptr"]), shape=tuple(data["shape"]))
+            return cls(data["extracts"], data["scripts"], data["codes"], matrix)
+
+    def rank(self, target_isos: Iterable[str], candidate_isos: Optional[Iterable[str]] = None) -> List[Dict]:
+        """Rank the extracts of the candidate languages, or all the others, by similarity to the
+        extracts of the target languages. Return an empty list if the targets have no extracts."""
+        target = np.isin(self.isos, list(target_isos))
+        if not target.any():
+            return []
+        # The mean of the target vectors, so a language with several extracts counts once.
+        query = np.asarray(self.matrix[target].mean(axis=0)).ravel()
+        similarity = self.matrix @ query / max(np.linalg.norm(query), 1e-12)
+
+        values, counts = np.unique(self.scripts[target], return_counts=True)
+        target_script = values[np.argmax(counts)]
+        same_script = self.scripts == target_script
+
+        candidates = ~target if candidate_isos is None else np.isin(self.isos, list(candidate_isos)) & ~target
+        order = np.flatnonzero(candidates)
+        order = order[np.lexsort((-similarity[order], ~same_script[order]))]
+        return [
+            {
+                "extract": self.extracts[i],
+                "iso": self.isos[i],
+                "script": self.scripts[i],
+                "same_script": bool(same_script[i]),
+                "similarity": round(float(similarity[i]), 4),
+            }
+            for i in order.tolist()
+        ]
+
+
+def load_vectors(report_file: Path, rebuild: bool = False) -> CharacterVectors:
+    """Load the vectors saved next to a character report, building them if the report is newer."""
+    report_file = Path(report_file)
+    vectors_file = report_file.with_name(report_file.name + vectors_suffix)
+    if not rebuild and vectors_file.is_file() and vectors_file.stat().st_mtime_ns >= report_file.stat().st_mtime_ns:
+        return CharacterVectors.load(vectors_file)
+    vectors = CharacterVectors.from_report(report_file)
+    vectors.save(vectors_file)
+    return vectors
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Rank extracts by the similarity of their characters to a target language.")
+    parser.add_argument("report", type=Path, help="The character report written by charfreq.py.")
+    parser.add_argument("--target", nargs="+", required=True, help="ISO codes of the target language.")
+    parser.add_argument("--isos", nargs="+", help="Only rank extracts of these languages. The default is every extract.")
+    parser.add_argument("--top", type=int, default=20, help="Number of extracts to show.")
+    parser.add_argument("--rebuild", action="store_true", help="Build the vectors from the report even if they are up to date.")
+    parser.add_argument("--output", type=Path, help="Write the whole ranking to this csv file.")
+    args = parser.parse_args()
+
+    ranked = load_vectors(args.report, args.rebuild).rank(args.target, args.isos)
+    if not ranked:
+        print(f"There are no extracts for {' '.join(args.target)} in {args.report}")
+        return
+    if args.output:
+        with open(args.output, "w", encoding="utf-8", newline="") as csvfile:
+            writer = csv.DictWriter(csvfile, fieldnames=list(ranked[0]))
+            writer.writeheader()
+            writer.writerows(ranked)
+        print(f"Wrote {len(ranked)} ranked extracts to {args.output}")
+    for row in ranked[: args.top]:
+        print(f"{row['similarity']:.4f} {row['script']:<10} {row['extract']}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,84 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""Compact columnar tables stored as compressed NumPy .npz files.
+
+A table is a dict of equal length columns. Text columns are stored as integer codes
+into a sorted array of their unique values, so repeated strings such as file names,
+books or scorers take a few bytes per row.
+"""
+from pathlib import Path
+from typing import Dict, Iterable, List, Mapping
+
+import numpy as np
+
+Table = Dict[str, np.ndarray]
+
+values_suffix = ".values"
+columns_key = "__columns__"
+
+
+def encode(column) -> tuple:
+    """Return the unique values and the integer code of each row."""
+    values, codes = np.unique(np.asarray(column, dtype=str), return_inverse=True)
+    return values, codes.astype(np.int32)
+
+
+def save_table(table_file: Path, table: Mapping[str, Iterable]) -> Path:
+    # Arrays are stored by column number since names such as 'file' clash with np.savez arguments.
+    arrays = {columns_key: np.array(list(table), dtype=str)}
+    lengths = set()
+    for number, column in enumerate(table.values()):
+        key = f"c{number}"
+        column = np.asarray(column)
+        lengths.add(len(column))
+        if column.dtype.kind in "USO":
+            arrays[key + values_suffix], arrays[key] = encode(column)
+        else:
+            arrays[key] = column
+
+    if len(lengths) > 1:
+        raise ValueError(f"The columns of a table must all be the same length, found lengths {sorted(lengths)}")
+
+    table_file = Path(table_file)
+    table_file.parent.mkdir(parents=True, exist_ok=True)
+    # Write to a temporary file first so that readers never see a partial table.
+    tmp_file = table_file.with_name(table_file.name + ".tmp")
+    with open(tmp_file, "wb") as out:
+        np.savez_compressed(out, **arrays)
+    tmp_file.replace(table_file)
+    return table_file
+
+
+def load_table(table_file: Path, decode: bool = True) -> Table:
+    """Read a table. With decode=False text columns are left as codes and the values
+    are returned in an extra '<name>.values' column."""
+    table = {}
+    with np.load(table_file) as data:
+        for number, name in enumerate(data[columns_key].tolist()):
+            key = f"c{number}"
+            column = data[key]
+            if key + values_suffix in data:
+                values = data[key + values_suffix]
+                if decode:
+                    column = values[column]
+                else:
+                    table[name + values_suffix] = values
+            table[name] = column
+    return table
+
+
+def concat_tables(tables: List[Table]) -> Table:
+    tables = [table for table in tables if table]
+    if not tables:
+        return {}
+    return {name: np.concatenate([table[name] for table in tables]) for name in tables[0]}
+
+
+def table_length(table: Table) -> int:
+    return len(next(iter(table.values()))) if table else 0
+
+
+def table_rows(table: Table) -> Iterable[dict]:
+    names = list(table)
+    for row in zip(*(table[name].tolist() for name in names)):
+        yield dict(zip(names, row))
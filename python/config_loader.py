@@ -0,0 +1,134 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""Fast loading of SILNLP config.yml and effective-config-*.yml files.
+
+Configs are parsed with libyaml's CSafeLoader when PyYAML was built with it, which is
+many times faster than the pure Python SafeLoader on effective configs with hundreds of keys.
+load_config caches each parsed config by path, modification time and size, and can keep
+only the fields a report needs. The cache can be saved between runs.
+
+Run this file with a folder of experiments to compare the loaders.
+"""
+import argparse
+import os
+import pickle
+import time
+from pathlib import Path
+from threading import Lock
+from typing import Dict, Iterable, List, Optional
+
+import yaml
+
+Loader = getattr(yaml, "CSafeLoader", yaml.SafeLoader)
+
+# The keys of the data section that are always kept in a compact config.
+data_keys_kept = {"corpus_pairs", "terms"}
+
+config_cache: Dict[str, tuple] = {}
+cache_lock = Lock()
+
+
+def read_config(config_file: Path):
+    """Parse a config file without caching. Use this when the config will be modified."""
+    with open(config_file, "r", encoding="utf-8") as conf:
+        return yaml.load(conf, Loader=Loader)
+
+
+def compact_config(config, fieldnames: Optional[Iterable[str]] = None):
+    """Keep only the model, the corpus pairs and terms, and the data and params values named in fieldnames."""
+    if fieldnames is None or not isinstance(config, dict):
+        return config
+
+    fieldnames = set(fieldnames)
+    compact = {}
+    if "model" in config:
+        compact["model"] = config["model"]
+    for section, always_kept in (("data", data_keys_kept), ("params", set())):
+        if isinstance(config.get(section), dict):
+            compact[section] = {
+                key: value for key, value in config[section].items() if key in fieldnames or key in always_kept
+            }
+        elif section in config:
+            compact[section] = config[section]
+    return compact
+
+
+def load_config(config_file: Path, fieldnames: Optional[Iterable[str]] = None):
+    """Return the parsed config, reusing the cached copy if the file hasn't changed.
+
+    The returned config is shared with the cache, so don't modify it.
+    """
+    stat = os.stat(config_file)
+    fields_key = None if fieldnames is None else frozenset(fieldnames)
+    key = str(config_file)
+    signature = (stat.st_mtime_ns, stat.st_size, fields_key)
+
+    cached = config_cache.get(key)
+    if cached and cached[0] == signature:
+        return cached[1]
+
+    config = compact_config(read_config(config_file), fields_key)
+    with cache_lock:
+        config_cache[key] = (signature, config)
+    return config
+
+
+def load_cache(cache_file: Path) -> int:
+    """Read a saved cache. Returns the number of configs it holds."""
+    if Path(cache_file).is_file():
+        with open(cache_file, "rb") as f:
+            with cache_lock:
+                config_cache.update(pickle.load(f))
+    return len(config_cache)
+
+
+def save_cache(cache_file: Path) -> None:
+    cache_file = Path(cache_file)
+    cache_file.parent.mkdir(parents=True, exist_ok=True)
+    tmp_file = cache_file.with_name(cache_file.name + ".tmp")
+    with cache_lock, open(tmp_file, "wb") as f:
+        pickle.dump(config_cache, f, protocol=pickle.HIGHEST_PROTOCOL)
+    tmp_file.replace(cache_file)
+
+
+def time_loads(files: List[Path], load) -> float:
+    start = time.perf_counter()
+    for file in files:
+        try:
+            load(file)
+        except yaml.YAMLError:
+            pass
+    return time.perf_counter() - start
+
+
+def main():
+    from experiment_scan import scan_experiments
+    from summarize_scores_multi import get_fieldnames
+
+    parser = argparse.ArgumentParser(description="Compare the speed of the config loaders on the effective configs in a folder.")
+    parser.add_argument("folders", nargs="+", type=Path, help="Folders of experiments.")
+    parser.add_argument("--limit", type=int, default=5000, help="Maximum number of configs to load.")
+    args = parser.parse_args()
+
+    scans, _ = scan_experiments(args.folders)
+    files = [scan["effective_configs"][0] if scan["effective_configs"] else scan["config"] for scan in scans][: args.limit]
+    all_fieldnames, omit = get_fieldnames()
+    fieldnames = {fieldname for fieldname in all_fieldnames if fieldname not in omit}
+    print(f"Loading {len(files)} configs. libyaml is {'available' if Loader is not yaml.SafeLoader else 'not available'}.")
+
+    def safe_load(file):
+        with open(file, "r", encoding="utf-8") as conf:
+            return yaml.load(conf, Loader=yaml.SafeLoader)
+
+    timings = {
+        "SafeLoader": time_loads(files, safe_load),
+        Loader.__name__: time_loads(files, read_config),
+        "load_config, first run": time_loads(files, lambda file: load_config(file, fieldnames)),
+        "load_config, cached": time_loads(files, lambda file: load_config(file, fieldnames)),
+    }
+    for name, seconds in timings.items():
+        print(f"{name:>24}: {seconds:8.3f} s  {1000 * seconds / max(1, len(files)):8.3f} ms per config")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,281 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""Corpus BLEU and chrF3 scores for translations, overall and for each book.
+
+The n-grams of every sentence are counted at once with NumPy. Tokens are numbered
+(characters by their code point), n-grams are hashed to 64 bit integers and the
+clipped matches of each sentence are found by counting the hashes of the hypothesis
+and reference n-grams. The result is a row of sufficient statistics per sentence:
+n-gram matches and totals and lengths. Sums of these rows over a book or the whole
+corpus give the corpus scores, and bootstrap resampling (see significance.py) can
+reuse them. Large files can be split across processes.
+
+BLEU follows sacrebleu's defaults: 13a tokenization, exponential smoothing and a
+single reference. chrF3 uses character n-grams up to 6 with whitespace removed.
+Scores are written in the layout of the SILNLP scores-<steps>.csv files.
+"""
+import argparse
+import csv
+import re
+from concurrent.futures import ProcessPoolExecutor
+from pathlib import Path
+from typing import Dict, Iterable, List, Optional, Sequence
+
+import numpy as np
+
+bleu_order = 4
+chrf_order = 6
+chrf_beta = 3
+
+# Columns of the BLEU statistics: matches and totals for each order, then hypothesis and reference lengths.
+bleu_columns = 2 * bleu_order + 2
+# Columns of the chrF statistics: hypothesis n-grams, reference n-grams and matches for each order.
+chrf_columns = 3 * chrf_order
+
+scores_file_header = ["book", "src_iso", "trg_iso", "num_refs", "references", "sent_len", "scorer", "score"]
+
+multiplier = np.uint64(0x9E3779B97F4A7C15)
+
+# The 13a tokenizer of mteval-v13a.pl, as used by sacrebleu. Its first rule puts spaces
+# around the punctuation and symbols in [{-~[-` -&(-+:-@/], which is done with str.translate.
+spaced_characters = "{|}~[\\]^_`!\"#$%&()*+:;<=>?@/"
+tokenizer_13a_table = str.maketrans({char: f" {char} " for char in spaced_characters})
+tokenizer_13a_rules = [
+    (re.compile(r"([^0-9])([\.,])"), r"\1 \2 "),
+    (re.compile(r"([\.,])([^0-9])"), r" \1 \2"),
+    (re.compile(r"([0-9])(-)"), r"\1 \2 "),
+]
+
+
+def tokenize_13a_lines(lines: Sequence[str]) -> List[List[str]]:
+    """Tokenize lines with the 13a tokenizer. All the lines are processed at once: each is
+    padded with spaces, so none of the rules can match across the newline between lines."""
+    text = "\n".join(f" {line} " for line in lines)
+    text = text.replace("<skipped>", "")
+    if "&" in text:
+        text = text.replace("&quot;", '"').replace("&amp;", "&").replace("&lt;", "<").replace("&gt;", ">")
+    text = text.translate(tokenizer_13a_table)
+    for pattern, replacement in tokenizer_13a_rules:
+        text = pattern.sub(replacement, text)
+    return [line.split() for line in text.split("\n")] if lines else []
+
+
+def tokenize_13a(line: str) -> List[str]:
+    return tokenize_13a_lines([line])[0]
+
+
+def mix(values: np.ndarray) -> np.ndarray:
+    """Scramble 64 bit integers (the splitmix64 finalizer) so that similar n-grams get unrelated hashes."""
+    values = values.copy()
+    values ^= values >> np.uint64(30)
+    values *= np.uint64(0xBF58476D1CE4E5B9)
+    values ^= values >> np.uint64(27)
+    values *= np.uint64(0x94D049BB133111EB)
+    values ^= values >> np.uint64(31)
+    return values
+
+
+def flatten(sequences: Sequence[Sequence[int]]) -> tuple:
+    """Concatenate the token ids of the sentences and return them with the sentence number of each token."""
+    lengths = np.fromiter((len(sequence) for sequence in sequences), dtype=np.int64, count=len(sequences))
+    ids = np.fromiter((token for sequence in sequences for token in sequence), dtype=np.uint64, count=int(lengths.sum()))
+    sentences = np.repeat(np.arange(len(sequences), dtype=np.int64), lengths)
+    return ids, sentences, lengths
+
+
+def ngram_keys(ids: np.ndarray, sentences: np.ndarray, n: int) -> tuple:
+    """Return a hash of each n-gram that lies within one sentence, combined with its sentence number."""
+    count = len(ids) - n + 1
+    if count <= 0:
+        return np.array([], dtype=np.uint64), np.array([], dtype=np.int64)
+    hashes = np.zeros(count, dtype=np.uint64)
+    with np.errstate(over="ignore"):
+        for k in range(n):
+            hashes = hashes * multiplier + ids[k : k + count] + np.uint64(1)
+        within = sentences[:count] == sentences[n - 1 :]
+        hashes, owners = hashes[within], sentences[:count][within]
+        keys = mix(hashes ^ mix(owners.astype(np.uint64) + np.uint64(1)))
+    return keys, owners
+
+
+def count_matches(hyp_keys, hyp_owners, ref_keys, size: int) -> np.ndarray:
+    """The clipped n-gram matches of each sentence: for each n-gram the smaller of its counts in the hypothesis and reference."""
+    hyp_unique, hyp_first, hyp_counts = np.unique(hyp_keys, return_index=True, return_counts=True)
+    ref_unique, ref_counts = np.unique(ref_keys, return_counts=True)
+    _, in_hyp, in_ref = np.intersect1d(hyp_unique, ref_unique, assume_unique=True, return_indices=True)
+    matched = np.minimum(hyp_counts[in_hyp], ref_counts[in_ref])
+    return np.bincount(hyp_owners[hyp_first[in_hyp]], weights=matched, minlength=size)
+
+
+def ngram_stats(hyp_ids, hyp_sentences, ref_ids, ref_sentences, size: int, order: int) -> np.ndarray:
+    """Return hypothesis n-grams, reference n-grams and matches of each order for each sentence."""
+    stats = np.zeros((size, 3 * order), dtype=np.int64)
+    for n in range(1, order + 1):
+        hyp_keys, hyp_owners = ngram_keys(hyp_ids, hyp_sentences, n)
+        ref_keys, ref_owners = ngram_keys(ref_ids, ref_sentences, n)
+        column = 3 * (n - 1)
+        stats[:, column] = np.bincount(hyp_owners, minlength=size)
+        stats[:, column + 1] = np.bincount(ref_owners, minlength=size)
+        stats[:, column + 2] = count_matches(hyp_keys, hyp_owners, ref_keys, size)
+    return stats
+
+
+def bleu_stats(hyps: Sequence[str], refs: Sequence[str]) -> np.ndarray:
+    """Matches and totals of each n-gram order, hypothesis length and reference length for each sentence."""
+    vocab: Dict[str, int] = {}
+    hyp_tokens = [[vocab.setdefault(token, len(vocab)) for token in tokens] for tokens in tokenize_13a_lines(hyps)]
+    ref_tokens = [[vocab.setdefault(token, len(vocab)) for token in tokens] for tokens in tokenize_13a_lines(refs)]
+    hyp_ids, hyp_sentences, hyp_lengths = flatten(hyp_tokens)
+    ref_ids, ref_sentences, ref_lengths = flatten(ref_tokens)
+
+    ngrams = ngram_stats(hyp_ids, hyp_sentences, ref_ids, ref_sentences, len(hyps), bleu_order)
+    stats = np.zeros((len(hyps), bleu_columns), dtype=np.int64)
+    stats[:, 0:bleu_order] = ngrams[:, 2::3]
+    stats[:, bleu_order : 2 * bleu_order] = ngrams[:, 0::3]
+    stats[:, -2] = hyp_lengths
+    stats[:, -1] = ref_lengths
+    return stats
+
+
+def code_points(lines: Sequence[str]) -> tuple:
+    """The code points of the lines with whitespace removed, with the line number of each."""
+    lines = ["".join(line.split()) for line in lines]
+    lengths = np.fromiter((len(line) for line in lines), dtype=np.int64, count=len(lines))
+    ids = np.frombuffer("".join(lines).encode("utf-32-le"), dtype=np.uint32).astype(np.uint64)
+    return ids, np.repeat(np.arange(len(lines), dtype=np.int64), lengths)
+
+
+def chrf_stats(hyps: Sequence[str], refs: Sequence[str]) -> np.ndarray:
+    """Hypothesis n-grams, reference n-grams and matches of each character n-gram order for each sentence."""
+    stats = ngram_stats(*code_points(hyps), *code_points(refs), len(hyps), chrf_order)
+    # Like sacrebleu, don't count hypothesis n-grams of an order the reference is too short to have.
+    stats[:, 0::3] *= stats[:, 1::3] > 0
+    return stats
+
+
+def sentence_stats(hyps: Sequence[str], refs: Sequence[str]) -> Dict[str, np.ndarray]:
+    if len(hyps) != len(refs):
+        raise ValueError(f"There are {len(hyps)} translations but {len(refs)} references.")
+    return {"BLEU": bleu_stats(hyps, refs), "CHRF3": chrf_stats(hyps, refs)}
+
+
+def sharded_stats(hyps: Sequence[str], refs: Sequence[str], workers: int = 0, shard_size: int = 20000) -> Dict[str, np.ndarray]:
+    """sentence_stats computed in shards across worker processes. The statistics of a
+    sentence don't depend on the others, so the shards are simply joined."""
+    if workers <= 1 or len(hyps) <= shard_size:
+        return sentence_stats(hyps, refs)
+    starts = range(0, len(hyps), shard_size)
+    with ProcessPoolExecutor(max_workers=workers) as executor:
+        shards = list(executor.map(sentence_stats, [hyps[i : i + shard_size] for i in starts], [refs[i : i + shard_size] for i in starts]))
+    return {scorer: np.concatenate([shard[scorer] for shard in shards]) for scorer in shards[0]}
+
+
+def bleu_score(stats: np.ndarray) -> np.ndarray:
+    """Corpus BLEU from summed statistics. stats may have leading dimensions, e.g. one row per bootstrap sample."""
+    stats = np.asarray(stats, dtype=np.float64)
+    matches, totals = stats[..., :bleu_order], stats[..., bleu_order : 2 * bleu_order]
+    hyp_len, ref_len = stats[..., -2], stats[..., -1]
+
+    # Exponential smoothing: the k-th order with no matches counts as 1 / 2**k matches.
+    no_matches = matches == 0
+    smoothing = np.power(2.0, np.cumsum(no_matches, axis=-1))
+    with np.errstate(divide="ignore", invalid="ignore"):
+        precisions = np.where(no_matches, 100.0 / (smoothing * totals), 100.0 * matches / totals)
+        log_mean = np.log(precisions).mean(axis=-1)
+        brevity = np.where(hyp_len < ref_len, np.exp(1 - ref_len / hyp_len), 1.0)
+        score = brevity * np.exp(log_mean)
+    return np.where((totals > 0).all(axis=-1) & (hyp_len > 0), score, 0.0)
+
+
+def bleu_details(stats: np.ndarray) -> str:
+    """The BLEU score with its precisions and brevity penalty, as written in SILNLP scores files."""
+    stats = np.asarray(stats, dtype=np.float64)
+    matches, totals = stats[:bleu_order], stats[bleu_order : 2 * bleu_order]
+    hyp_len, ref_len = int(stats[-2]), int(stats[-1])
+    precisions = [100 * match / total if total else 0.0 for match, total in zip(matches, totals)]
+    ratio = hyp_len / ref_len if ref_len else 0.0
+    brevity = 1.0 if hyp_len >= ref_len else (np.exp(1 - ref_len / hyp_len) if hyp_len else 0.0)
+    return (
+        f"{float(bleu_score(stats)):.2f}/" + "/".join(f"{precision:.1f}" for precision in precisions)
+        + f" (BP = {brevity:.3f} ratio = {ratio:.3f} hyp_len = {hyp_len} ref_len = {ref_len})"
+    )
+
+
+def chrf_score(stats: np.ndarray, beta: float = chrf_beta) -> np.ndarray:
+    """Corpus chrF from summed statistics. As in sacrebleu, the precision and recall are
+    averaged over the n-gram orders present in both hypothesis and reference."""
+    stats = np.asarray(stats, dtype=np.float64)
+    hyp, ref, matches = stats[..., 0::3], stats[..., 1::3], stats[..., 2::3]
+    present = (hyp > 0) & (ref > 0)
+    effective_order = np.maximum(present.sum(axis=-1), 1)
+    with np.errstate(divide="ignore", invalid="ignore"):
+        precision = np.where(present, matches / hyp, 0.0).sum(axis=-1) / effective_order
+        recall = np.where(present, matches / ref, 0.0).sum(axis=-1) / effective_order
+        factor = beta**2
+        denominator = factor * precision + recall
+        return np.where(denominator > 0, 100 * (1 + factor) * precision * recall / denominator, 0.0)
+
+
+def book_rows(stats: Dict[str, np.ndarray], books: Optional[Sequence[str]] = None) -> List[Dict]:
+    """Return a score for each scorer over all the sentences, then for each book in vref order."""
+    groups = [("ALL", slice(None))]
+    if books is not None:
+        books = np.asarray(books)
+        if len(books) != len(next(iter(stats.values()))):
+            raise ValueError(f"There are {len(books)} verse references but {len(next(iter(stats.values())))} sentences.")
+        _, first = np.unique(books, return_index=True)
+        groups.extend((book, books == book) for book in books[np.sort(first)].tolist())
+
+    rows = []
+    for book, selection in groups:
+        for scorer, scorer_stats in stats.items():
+            summed = scorer_stats[selection].sum(axis=0)
+            score = bleu_details(summed) if scorer == "BLEU" else f"{float(chrf_score(summed)):.2f}"
+            rows.append({"book": book, "sent_len": len(scorer_stats[selection]), "scorer": scorer, "score": score})
+    return rows
+
+
+def read_lines(file: Path) -> List[str]:
+    with open(file, "r", encoding="utf-8") as f:
+        return f.read().splitlines()
+
+
+def score_files(hyp_file: Path, ref_file: Path, vref_file: Optional[Path] = None, workers: int = 0) -> List[Dict]:
+    from token_stats import get_books
+
+    hyps, refs = read_lines(hyp_file), read_lines(ref_file)
+    books = get_books(Path(vref_file)) if vref_file else None
+    if books is not None and len(books) != len(refs):
+        raise ValueError(f"{vref_file} has {len(books)} verse references but {ref_file} has {len(refs)} lines.")
+    return book_rows(sharded_stats(hyps, refs, workers), books)
+
+
+def write_scores(scores_file: Path, rows: Iterable[Dict], src_iso: str = "", trg_iso: str = "", references: str = "") -> None:
+    with open(scores_file, "w", encoding="utf-8", newline="") as csvfile:
+        writer = csv.DictWriter(csvfile, fieldnames=scores_file_header)
+        writer.writeheader()
+        for row in rows:
+            writer.writerow({"src_iso": src_iso, "trg_iso": trg_iso, "num_refs": 1, "references": references, **row})
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Compute corpus BLEU and chrF3 scores, overall and for each book.")
+    parser.add_argument("hypothesis", type=Path, help="File of translations, one per line.")
+    parser.add_argument("reference", type=Path, help="File of reference translations, one per line.")
+    parser.add_argument("--vref", type=Path, help="File giving the verse reference of each line of the reference, line for line, e.g. an experiment's test vref file, for scores by book.")
+    parser.add_argument("--output", type=Path, help="Write the scores to this file in the layout of the scores-<steps>.csv files.")
+    parser.add_argument("--src-iso", default="", help="Source language code for the scores file.")
+    parser.add_argument("--trg-iso", default="", help="Target language code for the scores file.")
+    parser.add_argument("--workers", type=int, default=0, help="Number of processes to use for large files.")
+    args = parser.parse_args()
+
+    rows = score_files(args.hypothesis, args.reference, args.vref, args.workers)
+    for row in rows:
+        print(f"{row['book']:>4} {row['scorer']:>6} {row['score']}")
+    if args.output:
+        write_scores(args.output, rows, args.src_iso, args.trg_iso, args.reference.name)
+        print(f"Wrote the scores to {args.output}")
+
+
+if __name__ == "__main__":
+    main()
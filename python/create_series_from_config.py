@@ -1,5 +1,6 @@
 from pathlib import Path
 import yaml
+from config_loader import read_config
 import shutil
 import re
 
@@ -34,8 +35,7 @@ def generate_configs(config_file_path):
     config_path = Path(config_file_path)
     parent_dir = config_path.parent.parent  # Go up one level from the config file
     
-    with open(config_path, 'r') as f:
-        config = yaml.safe_load(f)
+    config = read_config(config_path)
     
     # Extract corpus pairs and sources
     corpus_pairs = config['data']['corpus_pairs']
@@ -1,6 +1,7 @@
 import argparse
 from pathlib import Path
 import yaml
+from config_loader import read_config
 import re
 
 def extract_isocode(source_string):
@@ -80,8 +81,7 @@ def generate_configs(config_file_path):
     config_path = Path(config_file_path)
     parent_dir = config_path.parent.parent  # Go up one level from the config file
     
-    with open(config_path, 'r') as f:
-        config = yaml.safe_load(f)
+    config = read_config(config_path)
     
     # Track created folders for the notes
     created_folders = [get_relative_path(config_path.parent)]
@@ -1,6 +1,7 @@
 import argparse
 from pathlib import Path
 import yaml
+from config_loader import read_config
 import re
 import shutil
 from copy import deepcopy
@@ -121,8 +122,7 @@ def generate_configs(config_file_path, overwrite=False):
     input_dir = config_path.parent
     parent_dir = input_dir.parent  # Go up one level from the config file
     
-    with open(config_path, 'r') as f:
-        config = yaml.safe_load(f)
+    config = read_config(config_path)
     
     # Check for translate_config.yml
     translate_config_path = input_dir / "translate_config.yml"
@@ -1,6 +1,7 @@
 import argparse
 from pathlib import Path
 import yaml
+from config_loader import read_config
 import re
 import shutil
 from copy import deepcopy
@@ -174,8 +175,7 @@ def generate_configs(config_file_path, overwrite=False):
     
     print(f"Reading configuration from: {config_path}")
     
-    with open(config_path, 'r') as f:
-        config = yaml.safe_load(f)
+    config = read_config(config_path)
     
     # Check for translate_config.yml
     translate_config_path = input_dir / "translate_config.yml"
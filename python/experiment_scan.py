@@ -0,0 +1,88 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""Find SILNLP experiment folders with a single walk of the experiments tree.
+
+Every directory is listed once with os.scandir. The directories at each level are
+listed in parallel, since on a network mount the time is spent waiting for the server.
+Each folder that contains a config.yml is an experiment. Its effective configs, scores
+files and logs are collected from the same listings. Scores files in subfolders belong
+to the nearest experiment folder above them.
+"""
+import os
+import re
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+from typing import Dict, Iterable, List, Tuple
+
+config_filename = "config.yml"
+log_filenames = ("preprocess.log", "train.log")
+re_effective_config = re.compile(r"effective-config-.*\.yml$")
+re_scores = re.compile(r"scores-.*\.csv$")
+
+
+def list_dir(folder: str) -> Tuple[str, List[str], List[str]]:
+    """Return the subfolders and files in a folder."""
+    subfolders, files = [], []
+    try:
+        with os.scandir(folder) as entries:
+            for entry in entries:
+                try:
+                    if entry.is_dir(follow_symlinks=False):
+                        subfolders.append(entry.path)
+                    elif entry.is_file():
+                        files.append(entry.name)
+                except OSError:
+                    continue
+    except OSError as e:
+        print(f"Can't read {folder}: {e}")
+    return folder, subfolders, files
+
+
+def walk(roots: Iterable[Path], workers: int = 16) -> Iterable[Tuple[str, List[str], List[str]]]:
+    """Yield (folder, subfolders, files) for every folder below the roots, one level at a time."""
+    level = list(dict.fromkeys(str(root) for root in roots))
+    with ThreadPoolExecutor(max_workers=workers) as executor:
+        while level:
+            next_level = []
+            for folder, subfolders, files in executor.map(list_dir, level):
+                next_level.extend(subfolders)
+                yield folder, subfolders, files
+            level = next_level
+
+
+def classify(folder: str, files: List[str]) -> Dict:
+    names = set(files)
+    return {
+        "folder": Path(folder),
+        "config": Path(folder, config_filename) if config_filename in names else None,
+        "effective_configs": sorted(Path(folder, name) for name in files if re_effective_config.match(name)),
+        "scores": sorted(Path(folder, name) for name in files if re_scores.match(name)),
+        "logs": {name: Path(folder, name) for name in log_filenames if name in names},
+    }
+
+
+def experiments_from_listings(listings: Dict[str, Dict]) -> List[Dict]:
+    """Return the experiment records from classified folder listings, with the scores in
+    subfolders added to the nearest experiment folder above them."""
+    experiments = {folder: dict(record, scores=list(record["scores"])) for folder, record in listings.items() if record["config"]}
+
+    # Scores in subfolders of an experiment belong to it.
+    for folder, record in listings.items():
+        if folder in experiments or not record["scores"]:
+            continue
+        parent = os.path.dirname(folder)
+        while parent and parent not in experiments and parent != os.path.dirname(parent):
+            parent = os.path.dirname(parent)
+        if parent in experiments:
+            experiments[parent]["scores"].extend(record["scores"])
+
+    return sorted(experiments.values(), key=lambda record: str(record["folder"]))
+
+
+def scan_experiments(roots: Iterable[Path], workers: int = 16) -> Tuple[List[Dict], int]:
+    """Return a record for each experiment folder found below the roots and the number of folders checked."""
+    listings = {}
+    for folder, _, files in walk(roots, workers):
+        listings[folder] = classify(folder, files)
+
+    return experiments_from_listings(listings), len(listings)
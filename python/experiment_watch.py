@@ -0,0 +1,192 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""Watch folders of experiments for new and changed config and scores files.
+
+The folders below the roots are listed once and the listings are kept in memory.
+After that only folders that have changed are listed again. On Linux with the
+optional inotify_simple package installed the kernel reports the changed folders.
+inotify doesn't see changes made by other machines to a network mount, so there,
+or without inotify_simple, the modification time of every folder is checked
+instead. A folder's modification time changes when a file or subfolder is added,
+removed or renamed, but not when a file is rewritten in place.
+"""
+import os
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+from typing import Dict, Iterable, List, Optional, Set, Tuple
+
+from experiment_scan import classify, experiments_from_listings, list_dir
+
+try:
+    import inotify_simple
+except ImportError:
+    inotify_simple = None
+
+network_filesystems = {
+    "nfs", "nfs4", "cifs", "smbfs", "smb3", "9p", "afs", "ceph", "glusterfs", "lustre",
+    "fuse.sshfs", "fuse.s3fs", "fuse.rclone", "fuse.gcsfuse", "fuse.blobfuse",
+}  # fmt: skip
+
+
+def mount_type(path: Path) -> str:
+    """Return the file system type of the mount that path is on, or '' if it can't be found."""
+    path = os.path.realpath(path)
+    mountpoint, fstype = "", ""
+    try:
+        with open("/proc/mounts", "r", encoding="utf-8") as mounts:
+            for line in mounts:
+                fields = line.split()
+                if len(fields) < 3:
+                    continue
+                point = fields[1].replace("\\040", " ")
+                if (path == point or path.startswith(point.rstrip("/") + "/")) and len(point) > len(mountpoint):
+                    mountpoint, fstype = point, fields[2]
+    except OSError:
+        return ""
+    return fstype
+
+
+def is_network_mount(path: Path) -> bool:
+    return mount_type(path) in network_filesystems
+
+
+def folder_mtime(folder: str) -> Optional[int]:
+    try:
+        return os.stat(folder).st_mtime_ns
+    except OSError:
+        return None
+
+
+def stat_and_list(folder: str) -> Tuple[Optional[int], Tuple[str, List[str], List[str]]]:
+    # The time is read before listing so that a change made while listing is seen next time.
+    mtime = folder_mtime(folder)
+    if mtime is None:
+        return None, (folder, [], [])
+    return mtime, list_dir(folder)
+
+
+class ExperimentWatcher:
+    def __init__(self, roots: Iterable[Path], workers: int = 16, use_inotify: Optional[bool] = None):
+        """use_inotify defaults to True when inotify_simple is installed and none of the roots are on a network mount."""
+        self.roots = list(dict.fromkeys(str(root) for root in roots))
+        self.listings: Dict[str, Dict] = {}
+        self.mtimes: Dict[str, Optional[int]] = {}
+        self.children: Dict[str, Set[str]] = {}
+        self.executor = ThreadPoolExecutor(max_workers=workers)
+
+        if use_inotify is None:
+            use_inotify = inotify_simple is not None and not any(is_network_mount(root) for root in self.roots)
+        self.inotify = inotify_simple.INotify() if use_inotify and inotify_simple else None
+        self.watches: Dict[int, str] = {}
+        self.watched: Dict[str, int] = {}
+
+        self.refresh(self.roots)
+
+    @property
+    def method(self) -> str:
+        return "inotify" if self.inotify else "folder modification times"
+
+    def close(self) -> None:
+        self.executor.shutdown()
+        self.stop_inotify()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+    def stop_inotify(self) -> None:
+        if self.inotify:
+            self.inotify.close()
+            self.inotify = None
+            self.watches.clear()
+            self.watched.clear()
+
+    def watch(self, folder: str) -> None:
+        if not self.inotify or folder in self.watched:
+            return
+        flags = inotify_simple.flags
+        mask = flags.CREATE | flags.CLOSE_WRITE | flags.MOVED_TO | flags.MOVED_FROM | flags.DELETE | flags.DELETE_SELF
+        try:
+            wd = self.inotify.add_watch(folder, mask)
+        except OSError as e:
+            # Usually the limit in /proc/sys/fs/inotify/max_user_watches has been reached.
+            print(f"Can't watch {folder} with inotify ({e}), checking folder modification times instead.")
+            self.stop_inotify()
+            return
+        self.watches[wd] = folder
+        self.watched[folder] = wd
+
+    def forget(self, folder: str) -> None:
+        """Drop a folder that no longer exists and everything below it."""
+        for child in self.children.pop(folder, set()):
+            self.forget(child)
+        self.listings.pop(folder, None)
+        self.mtimes.pop(folder, None)
+        wd = self.watched.pop(folder, None)
+        if wd is not None:
+            self.watches.pop(wd, None)
+            try:
+                self.inotify.rm_watch(wd)
+            except OSError:
+                pass
+
+    def refresh(self, folders: Iterable[str]) -> None:
+        """List the folders again, and walk any subfolders that are new."""
+        level = list(folders)
+        while level:
+            next_level = []
+            for mtime, (folder, subfolders, files) in self.executor.map(stat_and_list, level):
+                if mtime is None:
+                    self.forget(folder)
+                    continue
+                old_children = self.children.get(folder, set())
+                new_children = set(subfolders)
+                for child in old_children - new_children:
+                    self.forget(child)
+                next_level.extend(child for child in subfolders if child not in old_children)
+
+                self.children[folder] = new_children
+                self.listings[folder] = classify(folder, files)
+                self.mtimes[folder] = mtime
+                self.watch(folder)
+            level = next_level
+
+    def changed_folders(self) -> Set[str]:
+        if self.inotify:
+            events = self.inotify.read(timeout=0)
+            if not any(event.mask & inotify_simple.flags.Q_OVERFLOW for event in events):
+                return {self.watches[event.wd] for event in events if event.wd in self.watches}
+            # Events were lost, so check every folder this time.
+
+        folders = list(self.mtimes)
+        mtimes = self.executor.map(folder_mtime, folders)
+        return {folder for folder, mtime in zip(folders, mtimes) if mtime != self.mtimes[folder]}
+
+    def experiments(self) -> List[Dict]:
+        """The experiment records for all the folders being watched, as returned by scan_experiments."""
+        return experiments_from_listings(self.listings)
+
+    def poll(self) -> Tuple[List[Dict], List[str]]:
+        """Return the records of the experiments that may have changed since the last poll
+        and the experiment folders that have gone."""
+        folders = self.changed_folders()
+        if not folders:
+            return [], []
+
+        before = {str(record["folder"]) for record in experiments_from_listings(self.listings)}
+        self.refresh(folders)
+        experiments = {str(record["folder"]): record for record in self.experiments()}
+
+        # A change in a folder affects the nearest experiment at or above it.
+        changed = set()
+        for folder in folders:
+            while folder and folder not in experiments and folder != os.path.dirname(folder):
+                folder = os.path.dirname(folder)
+            if folder in experiments:
+                changed.add(folder)
+        changed.update(set(experiments) - before)
+
+        removed = sorted(before - set(experiments))
+        return [experiments[folder] for folder in sorted(changed)], removed
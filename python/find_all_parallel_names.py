@@ -17,6 +17,11 @@ import unicodedata
 from pathlib import Path
 import re
 
+import numpy as np
+
+from name_extractor import NameStore, words
+from name_extractor import remove_first_only as remove_first_only_mask
+
 """
 These are the Unicode Categories.
 Code	Description
@@ -117,17 +122,7 @@ def move_punct(lines):
 
 
 def strip_punct(line):
-
-    stripped = []
-    words = line.split()
-    for word in words:
-        result = ""
-        for char in word:
-            if unicodedata.category(char)[0] == "L":
-                result = result + char
-        if result:
-            stripped.append(result)
-    return stripped
+    return words(line)
 
 
 def get_punctuation(file):
@@ -157,32 +152,15 @@ def get_names(lines):
 
 
 def remove_first_only(names):
-    first_count = Counter()
-    total_count = Counter()
-    filtered_count = Counter()
-
-    ignored_names = set()
-
-    for namelist in names:
-        if namelist:
-            first_count.update([namelist[0]])
-            total_count.update(namelist)
-    for name in sorted(first_count):
-        if total_count[name] == first_count[name]:
-            # print(f"{name}, {total_count[name]}, {first_count[name]}")
-            ignored_names.add(name)
-    print(
-        f"Found {len(total_count)} title case words.\nFound {len(first_count)} words at the start. There are {len(ignored_names)} words which only appear at the start."
-    )
-
-    # print(ignored_names,len(ignored_names))
-    filtered_names = list()
-    for namelist in names:
-        filtered_names.append([name for name in namelist if name not in ignored_names])
-    for namelist in filtered_names:
-        if namelist:
-            filtered_count.update(namelist)
-    print(f"There are {len(filtered_count)} names remaining.")
+    """Remove the words that only appear as the first name of a line. names is a list of the names on each line."""
+    table = {
+        "extract_id": np.zeros(sum(len(namelist) for namelist in names), dtype=np.int32),
+        "name_id": np.unique([name for namelist in names for name in namelist], return_inverse=True)[1].ravel().astype(np.int32),
+        "first": np.array([position == 0 for namelist in names for position in range(len(namelist))], dtype=bool),
+    }
+    keep = iter(remove_first_only_mask(table).tolist())
+    filtered_names = [[name for name in namelist if next(keep)] for namelist in names]
+    print(f"There are {len(set(name for namelist in filtered_names for name in namelist))} names remaining.")
     return filtered_names
 
 
@@ -266,71 +244,28 @@ def main():
     else:
         print("Either --input_folder or --input_files must be specified.")
         exit(0)
-          
-    
-    
-    with open(file1, 'r', encoding='utf-8') as f1, open(file2, 'r', encoding='utf-8') as f2:
-
-    # # Get lines without newlines.
-    # lines1 = [line.strip() for line in f1.readlines()]
-    # lines2 = [line.strip() for line in f2.readlines()]
-
-    # Deal with any number of files.
-    # Problem is that the output won't fit usefully in a single file.
-    # If this is to compare all the names across all the extracts then we'd need a file per verse.
-    # Each with ~1700 lines, one for each extract
-
-    # How to reduce that?
-    # 1 Only deal with Latin script.
-    # 2 Report only verses containing names?
-    # 3 Select by book at a time rather than whole Bible?
-    # ref, filename, names
-
-    with open(file1, "r", encoding="utf-8") as f1, open(
-        file2, "r", encoding="utf-8"
-    ) as f2, open(vref, "r", encoding="utf-8") as fref:
-        # Get list of words per line.
-        vrefs = [line.strip() for line in fref.readlines()]
-        words1 = [strip_punct(line) for line in f1.readlines()]
-        words2 = [strip_punct(line) for line in f2.readlines()]
-    if not len(words1) == len(words2) == len(vrefs):
-        print("\nWarning: Line counts don't match:")
-        print(f"{file1} : {len(words1)}")
-        print(f"{file2} : {len(words2)}")
-        print(f"{vref}  : {len(vrefs)}\n")
-    names1 = get_names(words1)
-    names2 = get_names(words2)
-    names_by_verse = [
-        f"{ref},{names_1},{names_2}\n"
-        for (ref, names_1, names_2) in zip(vrefs, names1, names2)
-    ]
-    print(names_by_verse[0:5])
-    with open(data, "w", encoding="utf-8") as fdata:
-        fdata.writelines(names_by_verse)
-    #    for i in range(0,5):
-    #        #print(f"{words1[i]}\n{names1[i]}\n")
-    #        #print(f"{words2[i]}\n{names2[i]}\n\n")
-    #        print(f"{names1[i]}\n{names2[i]}\n\n")
-
-    name_pairs = Counter()
-    for src_names, trg_names in zip(names1, names2):
-        for (src_name, trg_name) in zip(src_names, trg_names):
-            # print(src_name,trg_name)
-            name_pairs.update([(src_name, trg_name)])
-    print(f"{name_pairs.most_common(5)}")
-    row_data = []
-    for item, count in sorted(name_pairs.items()):
-        src_name, trg_name = item
-        row_data.append([src_name, trg_name, count])
-    # print(row_data)
-
-    write_csv(
-        output_csv,
-        row_data,
-        column_headers=["Source name, Target name, Occurrences"],
-        overwrite=True,
-    )
 
+    # Each extract is read once and the names of all of them are stored by verse.
+    # Writing a file per verse isn't needed: the store can be queried by verse with name_extractor.py.
+    store = NameStore(output_folder / "names_store")
+    store.update(files_found, vref)
+    table = store.rows(filtered=True)
+    extracts = [Path(extract).name for extract in store.extracts["extract"].tolist()]
+
+    detail_rows = []
+    for vref_id, extract_id, name_id in zip(table["vref_id"].tolist(), table["extract_id"].tolist(), table["name_id"].tolist()):
+        if detail_rows and detail_rows[-1][:2] == [store.vrefs[vref_id], extracts[extract_id]]:
+            detail_rows[-1][2] += " " + store.names[name_id]
+        else:
+            detail_rows.append([store.vrefs[vref_id], extracts[extract_id], str(store.names[name_id])])
+    write_csv(detail_csv_file, detail_rows, column_headers=["vref", "extract", "names"], overwrite=True)
+
+    summary_rows = [
+        [extract, name, count]
+        for extract, counts in store.name_counts(filtered=True).items()
+        for name, count in sorted(counts.items())
+    ]
+    write_csv(summary_csv_file, summary_rows, column_headers=["extract", "name", "occurrences"], overwrite=True)
 
 if __name__ == "__main__":
     main()
@@ -13,6 +13,7 @@ from pathlib import Path
 import operator
 import re
 import string_utils
+from name_aligner import align_lists
 
 """
 These are the Unicode Categories.
@@ -160,23 +161,17 @@ def main():
         write_csv(detail_csv, details, column_headers = ["Reference", f"{file1}", f"{file2}"], overwrite = True)
     
     if summary_csv:    
-        name_pairs = Counter()
-        for src_names,trg_names in zip(names1,names2):
-            for (src_name,trg_name) in zip(src_names,trg_names):
-                #print(src_name,trg_name)
-                name_pairs.update([(src_name,trg_name)])
-                
-                
-        #print(f"{name_pairs.most_common(5)}")
-        column_headers = ["Occurrences" ,f"{file1}", f"{file2}"]
+        # Pair each name with the names that occur in the same verses most often,
+        # rather than with the name in the same position.
+        column_headers = ["Occurrences" ,f"{file1}", f"{file2}", "Rank", "Dice"]
         
         sort_by = "most_common"
         #sort_by = "alphabetical"
         
-        row_data = []
-        for item,count in name_pairs.items():
-            src_name,trg_name = item
-            row_data.append([count, src_name,trg_name])
+        row_data = [
+            [both, src_name, trg_name, rank, round(score, 4)]
+            for src_name, trg_name, rank, score, both in align_lists(names1, names2, top_k=3, min_count=1)
+        ]
         
         # Sort alphabetically first
         row_data.sort(key = operator.itemgetter(1, 2))
@@ -1,66 +1,235 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""Check the scores-*.csv files of a folder of experiments and repair them.
+
+Every scores file is checked, several at once. A file needs repair when it has:
+    a header repeated further down, e.g. after files were concatenated;
+    rows delimited by tabs or semicolons instead of commas;
+    rows with the wrong number of fields or a score that isn't a number;
+    columns that SILNLP doesn't write, or capitalized or padded column names and values.
+Repaired files have the SILNLP columns in the SILNLP order, comma delimited, and only
+the rows that could be read. Files without a scorer and score column are reported and
+left alone.
+
+Nothing is changed without --apply. With --apply each file is copied to a backup
+folder and a manifest of the backups is written before any file is replaced. Each
+repaired file is written to a temporary file and renamed over the original, so a
+file is never left half written. --rollback with the manifest restores the originals.
+After a repair the scores files can be read by scores_warehouse.read_scores_file
+without checking each row.
+"""
 import argparse
+import csv
+import datetime as dt
+import hashlib
+import io
+import json
+import math
+import os
 import shutil
+from concurrent.futures import ThreadPoolExecutor
 from pathlib import Path
+from typing import Dict, List
+
+from scores_warehouse import find_scores_files, parse_score, scores_file_columns
+
+delimiters = [",", "\t", ";"]
+manifest_filename = "manifest.json"
+
+
+def split_row(line: str, delimiter: str) -> List[str]:
+    return [field.strip() for field in next(csv.reader([line], delimiter=delimiter), [])]
+
+
+def sha1(data: bytes) -> str:
+    return hashlib.sha1(data).hexdigest()
+
+
+def check_scores_file(scores_file: Path) -> Dict:
+    """Check a scores file and return its problems and, if it can be repaired, the repaired text.
+
+    The result has the keys file, problems (a list of descriptions), repaired (the text of
+    the repaired file, or None when it isn't needed or isn't possible) and sha1 of the file.
+    """
+    result = {"file": Path(scores_file), "problems": [], "repaired": None, "sha1": None}
+    problems = result["problems"]
+    try:
+        data = Path(scores_file).read_bytes()
+        text = data.decode("utf-8-sig")
+    except (OSError, UnicodeDecodeError) as e:
+        problems.append(f"can't be read: {e}")
+        return result
+    result["sha1"] = sha1(data)
+
+    lines = [line for line in text.splitlines() if line.strip()]
+    if not lines:
+        problems.append("is empty")
+        return result
+
+    # The delimiter is the one that splits the header into columns including scorer and score.
+    header, delimiter = None, None
+    for candidate in delimiters:
+        fields = [field.lower() for field in split_row(lines[0], candidate)]
+        if "scorer" in fields and "score" in fields:
+            header, delimiter = fields, candidate
+            break
+    if header is None:
+        problems.append("has no header with scorer and score columns")
+        return result
+    if delimiter != ",":
+        problems.append(f"is delimited by {delimiter!r}")
+    if next(csv.reader([lines[0]], delimiter=delimiter)) != header:
+        problems.append("has capitalized or padded column names")
+
+    kept = [name for name in scores_file_columns if name in header]
+    extra = [name for name in header if name not in scores_file_columns]
+    if extra:
+        problems.append(f"has extra columns {', '.join(extra)}")
+    elif kept != header:
+        problems.append("has the columns out of order")
+    positions = [header.index(name) for name in kept]
+    score_position = header.index("score")
+
+    rows = []
+    duplicate_headers, other_delimiters, padded, malformed = 0, 0, 0, []
+    for number, line in enumerate(lines[1:], 2):
+        used = delimiter
+        if len(next(csv.reader([line], delimiter=used), [])) != len(header):
+            # Try the other delimiters on rows that don't fit.
+            used = next((other for other in delimiters if len(next(csv.reader([line], delimiter=other), [])) == len(header)), None)
+            if used is None:
+                malformed.append(number)
+                continue
+            other_delimiters += 1
+        raw = next(csv.reader([line], delimiter=used))
+        fields = [field.strip() for field in raw]
+        if [field.lower() for field in fields] == header:
+            duplicate_headers += 1
+            continue
+        if math.isnan(parse_score(fields[score_position])):
+            malformed.append(number)
+            continue
+        padded += fields != raw
+        rows.append([fields[position] for position in positions])
+
+    if duplicate_headers:
+        problems.append(f"repeats the header {duplicate_headers} times")
+    if other_delimiters:
+        problems.append(f"has {other_delimiters} rows with a different delimiter")
+    if malformed:
+        problems.append(f"has {len(malformed)} unreadable rows (lines {', '.join(map(str, malformed[:10]))}{'...' if len(malformed) > 10 else ''})")
+    if padded and delimiter == ",":
+        problems.append(f"has {padded} rows with padded values")
+
+    if problems:
+        output = io.StringIO()
+        writer = csv.writer(output, lineterminator="\n")
+        writer.writerow(kept)
+        writer.writerows(rows)
+        result["repaired"] = output.getvalue()
+    return result
+
+
+def write_atomic(file: Path, data: bytes) -> None:
+    """Write to a temporary file in the same folder and rename it over the file."""
+    temporary = file.with_name(f".{file.name}.tmp")
+    with open(temporary, "wb") as f:
+        f.write(data)
+        f.flush()
+        os.fsync(f.fileno())
+    if file.exists():
+        shutil.copymode(file, temporary)
+    os.replace(temporary, file)
+
+
+def repair_scores_files(results: List[Dict], backup_folder: Path, workers: int = 16) -> Path:
+    """Back up and replace the files that can be repaired. Return the manifest file."""
+    repairs = [result for result in results if result["repaired"] is not None]
+    backup_folder.mkdir(parents=True, exist_ok=False)
+    entries = []
+    for number, result in enumerate(repairs):
+        backup = backup_folder / f"{number:05}_{result['file'].name}.bak"
+        entries.append(
+            {
+                "file": str(result["file"].resolve()),
+                "backup": str(backup.resolve()),
+                "sha1_before": result["sha1"],
+                "sha1_after": sha1(result["repaired"].encode("utf-8")),
+                "problems": result["problems"],
+            }
+        )
+
+    with ThreadPoolExecutor(max_workers=workers) as executor:
+        list(executor.map(lambda entry: shutil.copy2(entry["file"], entry["backup"]), entries))
+
+        # The manifest is complete before the first file is replaced.
+        manifest_file = backup_folder / manifest_filename
+        manifest = {"created": dt.datetime.now().isoformat(timespec="seconds"), "files": entries}
+        write_atomic(manifest_file, json.dumps(manifest, indent=2).encode("utf-8"))
+
+        list(executor.map(lambda pair: write_atomic(Path(pair[0]["file"]), pair[1]["repaired"].encode("utf-8")), zip(entries, repairs)))
+    return manifest_file
+
+
+def rollback(manifest_file: Path, force: bool = False) -> None:
+    """Restore the files listed in a manifest from their backups.
+
+    A file that has changed since it was repaired is left alone unless force is True.
+    """
+    with open(manifest_file, "r", encoding="utf-8") as f:
+        manifest = json.load(f)
+    restored = 0
+    for entry in manifest["files"]:
+        file, backup = Path(entry["file"]), Path(entry["backup"])
+        current = sha1(file.read_bytes()) if file.is_file() else None
+        if current == entry["sha1_before"]:
+            continue
+        if current != entry["sha1_after"] and not force:
+            print(f"Not restoring {file}: it has changed since it was repaired. Use --force to restore it anyway.")
+            continue
+        write_atomic(file, backup.read_bytes())
+        restored += 1
+    print(f"Restored {restored} of {len(manifest['files'])} files from {Path(manifest_file).parent}")
+
+
+def report(results: List[Dict]) -> None:
+    for result in results:
+        if result["problems"]:
+            action = "can be repaired" if result["repaired"] is not None else "can't be repaired"
+            print(f"{result['file']} {action}:")
+            for problem in result["problems"]:
+                print(f"    {problem}")
+    repairable = sum(result["repaired"] is not None for result in results)
+    unrepairable = sum(bool(result["problems"]) and result["repaired"] is None for result in results)
+    print(f"Checked {len(results)} scores files: {repairable} can be repaired and {unrepairable} can't.")
+
 
-import boto3
-import pandas as pd
-
-
-# Function to find all scores files in a given directory
-def find_scores_files(directory):
-    scores_files = []
-    for file_path in Path(directory).rglob("scores-*.csv"):
-        scores_files.append(file_path)
-    return scores_files
-
-
-# Function to create copies of the original files with "_copy" suffix
-def create_copy_files(scores_files,destination):
-    for file_path in scores_files:
-        copy_file_path = destination / file_path.parent / (file_path.stem + "_copy.tsv")
-        if not copy_file_path.exists():
-            shutil.copy(file_path, copy_file_path)
-            print(f"Copied scores from {file_path.name} to {copy_file_path} ")
-        else:
-            print(f"{copy_file_path} already exists.")
-
-
-# Function to remove additional columns and save files in their original state
-def restore_original_state(scores_files):
-    for file_path in scores_files:
-        df = pd.read_csv(file_path)
-        original_columns = [
-            "book",
-            "src_iso",
-            "trg_iso",
-            "num_refs",
-            "references",
-            "sent_len",
-            "scorer",
-            "score",
-        ]
-        additional_columns = [col for col in df.columns if col not in original_columns]
-        if additional_columns:
-            df.drop(columns=additional_columns, inplace=True)
-            df.to_csv(file_path, index=False)
-            print(f"Removed additional columns from {file_path}")
-
-
-# Main function to execute the process
 def main():
-    parser = argparse.ArgumentParser(
-        description="Combine csv scores into a single file."
-    )
-    parser.add_argument("folder", type=Path, help="Directory to search")
+    parser = argparse.ArgumentParser(description="Check the scores-*.csv files below a folder and repair them.")
+    parser.add_argument("folder", type=Path, nargs="?", help="Directory to search")
+    parser.add_argument("--apply", action="store_true", help="Repair the files. Without this the problems are only reported.")
+    parser.add_argument("--backup", type=Path, help="Folder for the backups and manifest. The default is a new folder in the directory searched.")
+    parser.add_argument("--rollback", type=Path, metavar="MANIFEST", help="Restore the files repaired in a previous run from its manifest.")
+    parser.add_argument("--force", action="store_true", help="With --rollback, restore files even if they have changed since the repair.")
+    parser.add_argument("--workers", type=int, default=16, help="Number of files to check at once.")
     args = parser.parse_args()
 
-    series_folder = Path(args.folder)
-    scores_files = find_scores_files(series_folder)
-    for file in scores_files:
-        print(file)
-    destination = Path("C:/Users/David/Documents/MT/experiments/Markose")
-    #create_copy_files(scores_files,destination)
-    restore_original_state(scores_files)
+    if args.rollback:
+        rollback(args.rollback, args.force)
+        return
+    if not args.folder:
+        parser.error("a folder is needed unless --rollback is given")
+
+    scores_files = find_scores_files([args.folder], args.workers)
+    with ThreadPoolExecutor(max_workers=args.workers) as executor:
+        results = list(executor.map(check_scores_file, scores_files))
+    report(results)
+
+    if args.apply and any(result["repaired"] is not None for result in results):
+        now = dt.datetime.now()
+        backup_folder = args.backup or args.folder / f"scores_backup_{now.year}_{now.month}_{now.day}_{now.hour:02}h{now.minute:02}m{now.second:02}"
+        manifest_file = repair_scores_files(results, backup_folder, args.workers)
+        print(f"Repaired the files. To undo the repair run: fix_scores.py --rollback {manifest_file}")
 
 
 if __name__ == "__main__":
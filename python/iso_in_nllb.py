@@ -1,55 +1,18 @@
 import argparse
-import json
 
+from language_index import default_families_file, load_language_index
 
-def load_language_data(file_path):
-    with open(file_path, "r", encoding="utf-8") as file:
-        raw_data = json.load(file)
-
-    # Restructure the data for faster lookups
-    language_data = {}
-    country_data = {}
-    family_data = {}
-
-    for lang in raw_data:
-        iso = lang["isoCode"]
-        country = lang["langCountry"]
-        family = lang["languageFamily"]
-
-        language_data[iso] = {
-            "Name": lang["language"],
-            "Country": country,
-            "Family": family,
-        }
-
-        country_data.setdefault(country, []).append(iso)
-        family_data.setdefault(family, []).append(iso)
-
-    return language_data, country_data, family_data
-   
-
-def process_iso_codes(iso_codes, language_data, country_data, family_data, nllb_isos):
-    iso_set = set(iso_codes)
 
+def process_iso_codes(iso_codes, language_index):
     for iso in iso_codes:
-        if iso in language_data:
-
-            lang_info = language_data[iso]
+        lang_info = language_index.info(iso)
+        if lang_info:
             print(
                 f"{iso}: {lang_info['Name']}, {lang_info['Country']}, {lang_info['Family']}"
             )
 
-            # Add iso codes from the same country
-            iso_set.update(country_data.get(lang_info["Country"], []))
-
-            # Add iso codes from the same family
-            iso_set.update(family_data.get(lang_info["Family"], []))
-
-    # Remove iso codes not in NLLB
-    nllb_set = set(nllb_isos)
-    iso_set_in_nllb = sorted(iso_set.intersection(nllb_set))
-
-    return iso_set_in_nllb
+    # Add iso codes from the same country and the same family, and remove iso codes not in NLLB
+    return sorted(language_index.related_in_nllb(iso_codes))
 
 
 def main():
@@ -59,218 +22,21 @@ def main():
     parser.add_argument(
         "iso_codes", type=str, nargs="+", help="List of ISO codes to process"
     )
+    parser.add_argument(
+        "--families", type=str, default=default_families_file, help="The languageFamilies.json file."
+    )
 
     args = parser.parse_args()
     iso_codes = args.iso_codes
 
-    file_path = "F:/GitHub/davidbaines/textinfo/languageFamilies.json"
-    language_data, country_data, family_data = load_language_data(file_path)
-
-    nllb_isos = [
-        "ace",
-        "acm",
-        "acq",
-        "aeb",
-        "afr",
-        "ajp",
-        "aka",
-        "als",
-        "amh",
-        "apc",
-        "arb",
-        "ars",
-        "ary",
-        "arz",
-        "asm",
-        "ast",
-        "awa",
-        "ayr",
-        "azb",
-        "azj",
-        "bak",
-        "bam",
-        "ban",
-        "bel",
-        "bem",
-        "ben",
-        "bho",
-        "bjn",
-        "bod",
-        "bos",
-        "bug",
-        "bul",
-        "cat",
-        "ceb",
-        "ces",
-        "cjk",
-        "ckb",
-        "crh",
-        "cym",
-        "dan",
-        "deu",
-        "dik",
-        "dyu",
-        "dzo",
-        "ell",
-        "eng",
-        "epo",
-        "est",
-        "eus",
-        "ewe",
-        "fao",
-        "fij",
-        "fin",
-        "fon",
-        "fra",
-        "fur",
-        "fuv",
-        "gaz",
-        "gla",
-        "gle",
-        "glg",
-        "grn",
-        "guj",
-        "hat",
-        "hau",
-        "heb",
-        "hin",
-        "hne",
-        "hrv",
-        "hun",
-        "hye",
-        "ibo",
-        "ilo",
-        "ind",
-        "isl",
-        "ita",
-        "jav",
-        "jpn",
-        "kab",
-        "kac",
-        "kam",
-        "kan",
-        "kas",
-        "kat",
-        "kaz",
-        "kbp",
-        "kea",
-        "khk",
-        "khm",
-        "kik",
-        "kin",
-        "kir",
-        "kmb",
-        "kmr",
-        "knc",
-        "kon",
-        "kor",
-        "lao",
-        "lij",
-        "lim",
-        "lin",
-        "lit",
-        "lmo",
-        "ltg",
-        "ltz",
-        "lua",
-        "lug",
-        "luo",
-        "lus",
-        "lvs",
-        "mag",
-        "mai",
-        "mal",
-        "mar",
-        "min",
-        "mkd",
-        "mlt",
-        "mni",
-        "mos",
-        "mri",
-        "mya",
-        "nld",
-        "nno",
-        "nob",
-        "npi",
-        "nso",
-        "nus",
-        "nya",
-        "oci",
-        "ory",
-        "pag",
-        "pan",
-        "pap",
-        "pbt",
-        "pes",
-        "plt",
-        "pol",
-        "por",
-        "prs",
-        "quy",
-        "ron",
-        "run",
-        "rus",
-        "sag",
-        "san",
-        "sat",
-        "scn",
-        "shn",
-        "sin",
-        "slk",
-        "slv",
-        "smo",
-        "sna",
-        "snd",
-        "som",
-        "sot",
-        "spa",
-        "srd",
-        "srp",
-        "ssw",
-        "sun",
-        "swe",
-        "swh",
-        "szl",
-        "tam",
-        "taq",
-        "tat",
-        "tel",
-        "tgk",
-        "tgl",
-        "tha",
-        "tir",
-        "tpi",
-        "tsn",
-        "tso",
-        "tuk",
-        "tum",
-        "tur",
-        "twi",
-        "tzm",
-        "uig",
-        "ukr",
-        "umb",
-        "urd",
-        "uzn",
-        "vec",
-        "vie",
-        "war",
-        "wol",
-        "xho",
-        "ydd",
-        "yor",
-        "yue",
-        "zho",
-        "zsm",
-        "zul",
-    ]
+    language_index = load_language_index(args.families)
 
-    isos_in_nllb = process_iso_codes(iso_codes, language_data, country_data, family_data, nllb_isos)
+    isos_in_nllb = process_iso_codes(iso_codes, language_index)
 
     print(f"\nThese {len(isos_in_nllb)} languages are in the same language family, or country and known to NLLB:")
     print(isos_in_nllb)
     for iso in isos_in_nllb:
-        lang_info = language_data[iso]
+        lang_info = language_index.info(iso)
         print(
             f"{iso}: {lang_info['Name']}, {lang_info['Country']}, {lang_info['Family']}"
         )
@@ -0,0 +1,151 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""A compiled index of languages by ISO code, country and language family.
+
+languageFamilies.json, the NLLB language tags and the ISO 639-1/639-2 code pairs in
+iso_info.py are compiled once into a pickle next to languageFamilies.json. The index
+has the name, country and family of each ISO code, the set of ISO codes for each
+country and each family, and the NLLB tag of each NLLB language. It is rebuilt when
+languageFamilies.json or iso_info.py is newer than it, and loaded once per process.
+
+Finding the languages related to a batch of ISO codes is a few set unions:
+    index = load_language_index()
+    related = index.related(["ksb", "tgl"]) & index.nllb_isos
+"""
+import argparse
+import json
+import os
+import pickle
+from functools import lru_cache
+from pathlib import Path
+from typing import Dict, FrozenSet, Iterable, Optional, Set
+
+import iso_info
+
+families_filename = "languageFamilies.json"
+index_filename = "language_index.pickle"
+default_families_file = Path(__file__).resolve().parent.parent / families_filename
+
+# Increase this when the layout of the index changes so old index files are rebuilt.
+index_version = 1
+relations = ["country", "family"]
+
+
+def source_files(families_file: Path) -> Dict[str, int]:
+    """The files the index is built from, with their modification times."""
+    files = [Path(families_file), Path(iso_info.__file__)]
+    return {str(file): os.stat(file).st_mtime_ns for file in files}
+
+
+def build_language_index(families_file: Path = default_families_file, index_file: Optional[Path] = None) -> Path:
+    """Compile the language data into an index file and return its path."""
+    families_file = Path(families_file)
+    index_file = Path(index_file) if index_file else families_file.with_name(index_filename)
+    with open(families_file, "r", encoding="utf-8") as file:
+        raw_data = json.load(file)
+
+    languages = {}
+    country_isos: Dict[str, Set[str]] = {}
+    family_isos: Dict[str, Set[str]] = {}
+    for lang in raw_data:
+        iso, country, family = lang["isoCode"], lang["langCountry"], lang["languageFamily"]
+        languages[iso] = {"Name": lang["language"], "Country": country, "Family": family}
+        country_isos.setdefault(country, set()).add(iso)
+        family_isos.setdefault(family, set()).add(iso)
+
+    index = {
+        "version": index_version,
+        "sources": source_files(families_file),
+        "languages": languages,
+        "country": {country: frozenset(isos) for country, isos in country_isos.items()},
+        "family": {family: frozenset(isos) for family, isos in family_isos.items()},
+        "nllb_tags": dict(iso_info.NLLB_TAG_FROM_ISO),
+        "alternatives": dict(iso_info.ALT_ISO.data),
+    }
+    tmp_file = index_file.with_name(index_file.name + ".tmp")
+    with open(tmp_file, "wb") as f:
+        pickle.dump(index, f, protocol=pickle.HIGHEST_PROTOCOL)
+    tmp_file.replace(index_file)
+    return index_file
+
+
+class LanguageIndex:
+    def __init__(self, index: Dict):
+        self.languages: Dict[str, Dict[str, str]] = index["languages"]
+        self.country: Dict[str, FrozenSet[str]] = index["country"]
+        self.family: Dict[str, FrozenSet[str]] = index["family"]
+        self.nllb_tags: Dict[str, str] = index["nllb_tags"]
+        self.alternatives: Dict[str, str] = index["alternatives"]
+        self.nllb_isos = frozenset(self.nllb_tags)
+
+    def normalize(self, iso: str) -> str:
+        """Return the three letter code for a two letter ISO 639-1 code, and other codes unchanged."""
+        return self.alternatives.get(iso, iso) if len(iso) == 2 else iso
+
+    def info(self, iso: str) -> Optional[Dict[str, str]]:
+        return self.languages.get(self.normalize(iso))
+
+    def related(self, isos: Iterable[str], by: Iterable[str] = relations) -> Set[str]:
+        """Return the ISO codes, with those of the languages from the same country or family as any of them."""
+        isos = {self.normalize(iso) for iso in isos}
+        related = set(isos)
+        known = [self.languages[iso] for iso in isos if iso in self.languages]
+        for relation in by:
+            groups = getattr(self, relation)
+            related.update(*(groups[key] for key in {language[relation.capitalize()] for language in known}))
+        return related
+
+    def related_in_nllb(self, isos: Iterable[str], by: Iterable[str] = relations) -> Set[str]:
+        return self.related(isos, by) & self.nllb_isos
+
+
+def index_is_current(index: Dict, families_file: Path) -> bool:
+    try:
+        return index.get("version") == index_version and index.get("sources") == source_files(families_file)
+    except OSError:
+        return False
+
+
+@lru_cache(maxsize=4)
+def load_language_index(families_file: Path = default_families_file, index_file: Optional[Path] = None) -> LanguageIndex:
+    """Load the index, building it first if it is missing or older than its sources."""
+    families_file = Path(families_file)
+    index_file = Path(index_file) if index_file else families_file.with_name(index_filename)
+    index = None
+    if index_file.is_file():
+        with open(index_file, "rb") as f:
+            index = pickle.load(f)
+    if index is None or not index_is_current(index, families_file):
+        build_language_index(families_file, index_file)
+        with open(index_file, "rb") as f:
+            index = pickle.load(f)
+    return LanguageIndex(index)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Build the language index, or show the languages related to ISO codes.")
+    parser.add_argument("iso_codes", type=str, nargs="*", help="ISO codes to show related languages for.")
+    parser.add_argument("--families", type=Path, default=default_families_file, help="The languageFamilies.json file.")
+    parser.add_argument("--index", type=Path, help=f"The index file. The default is {index_filename} next to the families file.")
+    parser.add_argument("--rebuild", action="store_true", help="Build the index even if it is up to date.")
+    parser.add_argument("--by", choices=relations, nargs="+", default=relations, help="Relate languages by country, family or both.")
+    parser.add_argument("--all", action="store_true", help="Show related languages that aren't in NLLB too.")
+    args = parser.parse_args()
+
+    if args.rebuild:
+        print(f"Wrote {build_language_index(args.families, args.index)}")
+    index = load_language_index(args.families, args.index)
+    if args.iso_codes:
+        related = index.related(args.iso_codes, args.by)
+        if not args.all:
+            related &= index.nllb_isos
+        for iso in sorted(related):
+            info = index.info(iso)
+            if info:
+                print(f"{iso}: {info['Name']}, {info['Country']}, {info['Family']}")
+            else:
+                print(f"{iso}")
+
+
+if __name__ == "__main__":
+    main()
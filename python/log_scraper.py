@@ -0,0 +1,193 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""Collect values from SILNLP preprocess.log and train.log files in a single read.
+
+All the patterns for a log are given at once. Each pattern is only tried on lines
+that contain the longest piece of literal text the pattern requires, so most lines
+of a log are skipped with a substring test. Patterns whose first match is wanted
+are read from the start of the log and reading stops once all are found. Patterns
+whose last match is wanted are read backwards from the end of the log, so only
+the tail of a multi gigabyte training log is read.
+
+Patterns with named groups give a value for each group. Other patterns give the
+value of their first group under the name they are given.
+"""
+import argparse
+import os
+import re
+from pathlib import Path
+from typing import Dict, Iterable, Iterator, List, Mapping, Optional, Tuple, Union
+
+Patterns = Union[Mapping[str, Union[str, re.Pattern]], Iterable[Union[str, re.Pattern]]]
+
+block_size = 1 << 20
+quantifiers = "*+?{"
+re_repeat = re.compile(r"\{\d*(,\d*)?\}")
+
+preprocess_patterns = {
+    "git_commit": r".*?INFO - Git commit: (?P<git_commit>.*)",
+    "all_chars_count": r".*?LOG\(INFO\) all chars count=(?P<all_chars_count>.*)",
+    "alphabet_size": r".*?LOG\(INFO\) Alphabet size=(?P<alphabet_size>.*)",
+    "vocabulary_size": r".*?INFO:tensorflow: - vocabulary size: (?P<vocabulary_size>.*)",
+    "alignment": r".*?INFO - Generating train alignments using (?P<alignment>.*)",
+    "sizes": r".*?INFO - train size: (?P<train_size>\d*?), val size: (?P<val_size>\d*?), test size: (?P<test_size>\d*?), dict size: (?P<dict_size>\d*?), terms train size: (?P<terms_train>\d*)",
+}
+preprocess_last_patterns = {"tokens_per_piece": r".*?num_tokens/piece=(?P<tokens_per_piece>\d*\.\d*)"}
+training_last_patterns = {
+    "evaluation": r".*?Evaluation result for step (?P<step>\d+): loss = (?P<loss>\d+.\d+) ; perplexity = (?P<perplexity>\d+.\d+) ; bleu = (?P<bleu>\d+.\d+)"
+}
+
+
+def required_literal(pattern: str) -> str:
+    """Return the longest run of literal text that every match of the pattern contains.
+
+    Only text outside groups is considered. An empty string means the pattern can't be filtered.
+    """
+    runs, run = [], ""
+    depth = 0
+    i = 0
+    while i < len(pattern):
+        char = pattern[i]
+        literal = None
+        if char == "\\":
+            escaped = pattern[i + 1 : i + 2]
+            if escaped and not escaped.isalnum():
+                literal = escaped
+            i += 2
+        elif char == "[":
+            # Skip the character class. A ] straight after [ or [^ is part of the class.
+            i += 2 if pattern[i + 1 : i + 2] == "^" else 1
+            i += 1 if pattern[i : i + 1] == "]" else 0
+            while i < len(pattern) and pattern[i] != "]":
+                i += 2 if pattern[i] == "\\" else 1
+            i += 1
+        elif char == "|" and depth == 0:
+            return ""
+        elif char == "{" and re_repeat.match(pattern, i):
+            # Skip the body of a {m,n} quantifier.
+            i = re_repeat.match(pattern, i).end()
+        else:
+            if char == "(":
+                depth += 1
+            elif char == ")":
+                depth -= 1
+            elif char not in ".^$|" + quantifiers:
+                literal = char
+            i += 1
+
+        # A quantifier that may allow no repeats makes the character optional, as does an
+        # alternative after it.
+        following = pattern[i : i + 1]
+        optional = following in ("*", "?", "|") or (following == "{" and re_repeat.match(pattern, i) is not None)
+        if literal is not None and depth == 0 and not optional:
+            run += literal
+        else:
+            runs.append(run)
+            run = ""
+
+    runs.append(run)
+    return max(runs, key=len)
+
+
+class LogScraper:
+    def __init__(self, first: Optional[Patterns] = None, last: Optional[Patterns] = None):
+        """first and last are the patterns whose first and last matches in a log are wanted.
+        Each is a dict of name to pattern or a list of patterns with named groups."""
+        self.first = self.compile(first)
+        self.last = self.compile(last)
+
+    @staticmethod
+    def compile(patterns: Optional[Patterns]) -> List[Tuple[str, re.Pattern, str]]:
+        if not patterns:
+            return []
+        if not isinstance(patterns, Mapping):
+            patterns = {f"pattern {number}": pattern for number, pattern in enumerate(patterns)}
+
+        compiled = []
+        for name, pattern in patterns.items():
+            pattern = re.compile(pattern)
+            literal = "" if pattern.flags & (re.IGNORECASE | re.VERBOSE) else required_literal(pattern.pattern)
+            compiled.append((name, pattern, literal))
+        return compiled
+
+    @staticmethod
+    def values(name: str, match: re.Match) -> Dict[str, Optional[str]]:
+        if match.re.groupindex:
+            return match.groupdict()
+        return {name: match.group(1) if match.re.groups else match.group(0)}
+
+    @staticmethod
+    def search(lines: Iterable[str], patterns: List[Tuple[str, re.Pattern, str]]) -> Dict[str, Optional[str]]:
+        """Return the values of the first match of each pattern in lines."""
+        found = {}
+        remaining = list(patterns)
+        for line in lines:
+            for item in list(remaining):
+                name, pattern, literal = item
+                if literal in line:
+                    match = pattern.match(line)
+                    if match:
+                        found.update(LogScraper.values(name, match))
+                        remaining.remove(item)
+            if not remaining:
+                break
+        return found
+
+    def scrape(self, log_file: Path) -> Dict[str, Optional[str]]:
+        """Return the values found in the log. Values for patterns that don't match are missing."""
+        found = {}
+        if self.first:
+            found.update(self.search(forward_lines(log_file), self.first))
+        if self.last:
+            found.update(self.search(reverse_lines(log_file), self.last))
+        return found
+
+
+def forward_lines(log_file: Path) -> Iterator[str]:
+    with open(log_file, "r", encoding="utf-8", errors="replace") as log:
+        for line in log:
+            yield line.rstrip("\r\n")
+
+
+def reverse_lines(log_file: Path) -> Iterator[str]:
+    """Yield the lines of a file from the last to the first, reading it in blocks from the end."""
+    with open(log_file, "rb") as log:
+        position = log.seek(0, os.SEEK_END)
+        tail = b""
+        while position > 0:
+            size = min(block_size, position)
+            position -= size
+            log.seek(position)
+            lines = (log.read(size) + tail).split(b"\n")
+            # The first line may continue in the previous block.
+            tail = lines[0]
+            for line in reversed(lines[1:]):
+                yield line.rstrip(b"\r").decode("utf-8", errors="replace")
+        yield tail.rstrip(b"\r").decode("utf-8", errors="replace")
+
+
+def scrape_log(log_file: Path, first: Optional[Patterns] = None, last: Optional[Patterns] = None) -> Dict[str, Optional[str]]:
+    return LogScraper(first, last).scrape(log_file)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Show the values found in SILNLP preprocess.log and train.log files.")
+    parser.add_argument("logs", nargs="+", type=Path, help="Log files or experiment folders.")
+    args = parser.parse_args()
+
+    preprocess_scraper = LogScraper(preprocess_patterns, preprocess_last_patterns)
+    training_scraper = LogScraper(last=training_last_patterns)
+
+    for path in args.logs:
+        logs = [path / "preprocess.log", path / "train.log"] if path.is_dir() else [path]
+        for log in logs:
+            if not log.is_file():
+                continue
+            scraper = training_scraper if log.name == "train.log" else preprocess_scraper
+            print(log)
+            for name, value in scraper.scrape(log).items():
+                print(f"    {name}: {value}")
+
+
+if __name__ == "__main__":
+    main()
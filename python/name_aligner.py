@@ -0,0 +1,199 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""Pair the names in a reference extract with the names in other extracts by how often they share verses.
+
+Pairing names by their position in a verse is usually wrong, since names come in
+different orders in different languages and some are left out. Instead, for each
+source name in the reference and each target name in another extract, the number of
+verses that contain both is counted. The counts for all the target extracts come from
+one product of sparse verse by name matrices. Only verses in which both extracts have
+names are counted, so a New Testament is compared with the New Testament of a Bible.
+
+Each pair is scored with the Dice coefficient 2 * both / (source + target), or with
+pointwise mutual information log(both * verses / (source * target)). The top_k target
+names for each source name are kept. The names come from a store built by
+name_extractor.py.
+"""
+import argparse
+import csv
+from pathlib import Path
+from typing import Dict, List, Optional, Sequence
+
+import numpy as np
+from scipy import sparse
+
+from name_extractor import NameStore
+
+measures = ["dice", "pmi"]
+output_header = ["target", "source_name", "target_name", "rank", "score", "dice", "pmi", "both", "source_count", "target_count", "verses"]
+
+
+def presence(rows: np.ndarray, columns: np.ndarray, shape) -> sparse.csr_matrix:
+    """A 0/1 matrix with a one for each (row, column) pair, however often it occurs."""
+    matrix = sparse.csr_matrix((np.ones(len(rows), dtype=np.int32), (rows, columns)), shape=shape)
+    matrix.sum_duplicates()
+    matrix.data[:] = 1
+    return matrix
+
+
+def empty_alignment() -> Dict[str, np.ndarray]:
+    """The result of align when no pair is kept."""
+    columns = ["extract_id", "source_id", "target_id", "rank", "both", "source_count", "target_count", "verses"]
+    empty = {name: np.array([], dtype=np.int64) for name in columns}
+    empty.update((name, np.array([], dtype=np.float64)) for name in ("score", "dice", "pmi"))
+    return empty
+
+
+def align(
+    src_verses: np.ndarray,
+    src_names: np.ndarray,
+    trg_verses: np.ndarray,
+    trg_extracts: np.ndarray,
+    trg_names: np.ndarray,
+    top_k: int = 5,
+    min_count: int = 2,
+    measure: str = "dice",
+) -> Dict[str, np.ndarray]:
+    """Return the top_k target names for each source name and target extract.
+
+    The source names are given by verse and name number, the target names by verse,
+    extract number and name number. The result has a row for each pair kept, with the
+    extract, source name and target name numbers, the rank of the pair among the pairs
+    for the source name, the Dice and PMI scores and the counts they come from.
+    """
+    if measure not in measures:
+        raise ValueError(f"measure must be one of {measures}, not {measure}")
+    n_verses = int(max(src_verses.max(initial=-1), trg_verses.max(initial=-1))) + 1
+
+    # Number the (extract, name) pairs of the targets so all the extracts are one matrix.
+    trg_keys = trg_extracts.astype(np.int64) * (int(trg_names.max(initial=0)) + 1) + trg_names
+    keys, trg_columns = np.unique(trg_keys, return_inverse=True)
+    trg_columns = trg_columns.ravel()
+    column_extract = np.zeros(len(keys), dtype=np.int64)
+    column_extract[trg_columns] = trg_extracts
+    column_name = np.zeros(len(keys), dtype=np.int64)
+    column_name[trg_columns] = trg_names
+    n_extracts = int(trg_extracts.max(initial=-1)) + 1
+
+    S = presence(src_verses, src_names, (n_verses, int(src_names.max(initial=-1)) + 1))
+    T = presence(trg_verses, trg_columns, (n_verses, len(keys)))
+    E = presence(trg_verses, trg_extracts, (n_verses, n_extracts))
+    has_source = np.asarray(S.sum(axis=1)).ravel() > 0
+
+    both = (S.T @ T).tocoo()
+    source_counts = (S.T @ E).tocsr()  # Verses with the source name in which each extract has names.
+    target_counts = T.T @ has_source.astype(np.int64)  # Verses with the target name in which the reference has names.
+    verses = E.T @ has_source.astype(np.int64)  # Verses in which both have names.
+
+    keep = both.data >= min_count
+    rows, columns, count = both.row[keep], both.col[keep], both.data[keep].astype(np.float64)
+    if not len(rows):
+        return empty_alignment()
+    extracts = column_extract[columns]
+    # Indexing a sparse matrix with arrays gives a numpy matrix, or a sparse one if they are empty.
+    picked = source_counts[rows, extracts]
+    source = (picked.toarray() if sparse.issparse(picked) else np.asarray(picked)).ravel().astype(np.float64)
+    target = target_counts[columns].astype(np.float64)
+    n = verses[extracts].astype(np.float64)
+    dice = 2 * count / (source + target)
+    pmi = np.log(count * n / (source * target))
+    score = dice if measure == "dice" else pmi
+
+    # Rank the pairs of each source name and extract by score, then by count.
+    groups = extracts * S.shape[1] + rows
+    order = np.lexsort((-count, -score, groups))
+    sorted_groups = groups[order]
+    starts = np.r_[True, sorted_groups[1:] != sorted_groups[:-1]]
+    group_start = np.maximum.accumulate(np.where(starts, np.arange(len(order)), 0))
+    rank = np.arange(len(order)) - group_start
+    order = order[rank < top_k]
+    rank = rank[rank < top_k]
+
+    return {
+        "extract_id": extracts[order],
+        "source_id": rows[order],
+        "target_id": column_name[columns[order]],
+        "rank": rank + 1,
+        "score": score[order],
+        "dice": dice[order],
+        "pmi": pmi[order],
+        "both": count[order].astype(np.int64),
+        "source_count": source[order].astype(np.int64),
+        "target_count": target[order].astype(np.int64),
+        "verses": n[order].astype(np.int64),
+    }
+
+
+def align_lists(src_lists: Sequence[List[str]], trg_lists: Sequence[List[str]], **options) -> List[List]:
+    """Align the names on each line of two lists of names per line.
+    Return rows of source name, target name, rank, score and number of shared lines."""
+    src_words = [name for names in src_lists for name in names]
+    trg_words = [name for names in trg_lists for name in names]
+    src_values, src_names = np.unique(np.array(src_words, dtype=str), return_inverse=True)
+    trg_values, trg_names = np.unique(np.array(trg_words, dtype=str), return_inverse=True)
+    aligned = align(
+        np.repeat(np.arange(len(src_lists)), [len(names) for names in src_lists]),
+        src_names.ravel(),
+        np.repeat(np.arange(len(trg_lists)), [len(names) for names in trg_lists]),
+        np.zeros(len(trg_words), dtype=np.int64),
+        trg_names.ravel(),
+        **options,
+    )
+    src_values, trg_values = src_values.tolist(), trg_values.tolist()
+    return [
+        [src_values[source], trg_values[target], rank, score, both]
+        for source, target, rank, score, both in zip(
+            aligned["source_id"].tolist(), aligned["target_id"].tolist(), aligned["rank"].tolist(), aligned["score"].tolist(), aligned["both"].tolist()
+        )
+    ]
+
+
+def align_store(
+    store: NameStore, reference: str, targets: Optional[Sequence[str]] = None, filtered: bool = True, **options
+) -> Dict[str, np.ndarray]:
+    """Align the names of the reference extract with those of the targets, by default every other extract in the store.
+    Extracts are given by file name. The result has the names as text."""
+    extract_names = [Path(extract).name for extract in store.extracts["extract"].tolist()]
+    if reference not in extract_names:
+        raise KeyError(f"{reference} isn't in the name store.")
+    reference_id = extract_names.index(reference)
+    target_ids = [number for number, name in enumerate(extract_names) if number != reference_id and (not targets or name in targets)]
+
+    table = store.rows(filtered)
+    src = table["extract_id"] == reference_id
+    trg = np.isin(table["extract_id"], target_ids)
+    aligned = align(
+        table["vref_id"][src], table["name_id"][src], table["vref_id"][trg], table["extract_id"][trg], table["name_id"][trg], **options
+    )
+    aligned["target"] = np.array(extract_names, dtype=str)[aligned.pop("extract_id")] if target_ids else np.array([], dtype=str)
+    aligned["source_name"] = store.names[aligned.pop("source_id")]
+    aligned["target_name"] = store.names[aligned.pop("target_id")]
+    order = np.lexsort((aligned["rank"], aligned["source_name"], aligned["target"]))
+    return {name: aligned[name][order] for name in output_header}
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Pair the names in a reference extract with the names in other extracts.")
+    parser.add_argument("store", type=Path, help="Name store folder made by name_extractor.py.")
+    parser.add_argument("reference", type=str, help="File name of the reference extract in the store.")
+    parser.add_argument("--targets", nargs="+", default=[], help="File names of the extracts to align. The default is every other extract in the store.")
+    parser.add_argument("--top_k", type=int, default=5, help="Number of target names to keep for each source name.")
+    parser.add_argument("--min_count", type=int, default=2, help="Number of verses a pair must share to be kept.")
+    parser.add_argument("--measure", choices=measures, default="dice", help="Score to rank the target names by.")
+    parser.add_argument("--all_words", action="store_true", help="Include words that are only capitalized at the start of a verse.")
+    parser.add_argument("--output", type=Path, default="name_pairs.csv", help="The csv file for the pairs.")
+    args = parser.parse_args()
+
+    store = NameStore(args.store)
+    aligned = align_store(
+        store, args.reference, args.targets, filtered=not args.all_words, top_k=args.top_k, min_count=args.min_count, measure=args.measure
+    )
+    with open(args.output, "w", encoding="utf-8", newline="") as csvfile:
+        writer = csv.writer(csvfile)
+        writer.writerow(output_header)
+        writer.writerows(zip(*(aligned[name].tolist() for name in output_header)))
+    print(f"Wrote {len(aligned['rank'])} name pairs to {args.output}")
+
+
+if __name__ == "__main__":
+    main()
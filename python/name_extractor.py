@@ -0,0 +1,274 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""Find the proper name candidates in every verse of many extracts and store them for querying.
+
+Each extract is read once, by a pool of processes. The words of a line are its
+whitespace separated tokens with every character that isn't a letter (Unicode
+category L) removed, as strip_punct in find_all_parallel_names.py does. A single
+compiled regular expression does that for a whole line. Words starting with an
+uppercase letter are the candidates.
+
+The candidates are kept in a store folder as columnar tables (see column_store.py)
+with one row per candidate: vref_id, extract_id, name_id and whether it is the first
+word of the verse. Names, extracts and vrefs are stored once each and the rows refer
+to them by number. The rows are sorted by verse so the names of every extract in a
+verse are found with a binary search. Extracts that haven't changed since the store
+was last updated are not read again.
+
+Words that are only ever capitalized as the first word of a verse in an extract are
+probably not names. remove_first_only finds them for all the extracts at once.
+"""
+import argparse
+import csv
+import os
+import re
+import sys
+import unicodedata
+from concurrent.futures import ProcessPoolExecutor
+from functools import lru_cache
+from pathlib import Path
+from typing import Dict, Iterable, List, Optional, Tuple
+
+import numpy as np
+
+from column_store import load_table, save_table
+
+names_filename = "names.npz"
+name_strings_filename = "name_strings.npz"
+extracts_filename = "extracts.npz"
+vrefs_filename = "vrefs.npz"
+
+
+@lru_cache(maxsize=1)
+def non_letters() -> re.Pattern:
+    """A regex matching runs of characters that are neither letters nor whitespace."""
+    ranges, start = [], None
+    for code in range(sys.maxunicode + 2):
+        letter = code <= sys.maxunicode and unicodedata.category(chr(code))[0] == "L"
+        if letter and start is None:
+            start = code
+        elif not letter and start is not None:
+            ranges.append(re.escape(chr(start)) + ("-" + re.escape(chr(code - 1)) if code - 1 > start else ""))
+            start = None
+    return re.compile(r"[^\s" + "".join(ranges) + "]+")
+
+
+def words(line: str) -> List[str]:
+    """The words of a line with everything but letters removed."""
+    return non_letters().sub("", line).split()
+
+
+def extract_names(extract: Path) -> Tuple[np.ndarray, np.ndarray, np.ndarray, np.ndarray]:
+    """Return the line number, local name number and first word flag of each candidate
+    in an extract, and the names the local numbers refer to."""
+    line_numbers, candidates, first = [], [], []
+    with open(extract, "r", encoding="utf-8", errors="replace") as f:
+        for line_number, line in enumerate(f):
+            for position, word in enumerate(words(line)):
+                if word[0].isupper():
+                    line_numbers.append(line_number)
+                    candidates.append(word)
+                    first.append(position == 0)
+    names, codes = np.unique(np.array(candidates, dtype=str), return_inverse=True)
+    return (
+        np.array(line_numbers, dtype=np.int32),
+        codes.astype(np.int32).ravel(),
+        np.array(first, dtype=bool),
+        names,
+    )
+
+
+def file_signature(file: Path) -> Tuple[int, int]:
+    stat = os.stat(file)
+    return stat.st_mtime_ns, stat.st_size
+
+
+def remove_first_only(table: Dict[str, np.ndarray]) -> np.ndarray:
+    """Return a mask of the rows to keep: those whose name isn't only ever the first
+    word of a verse in that extract."""
+    if not len(table["name_id"]):
+        return np.ones(0, dtype=bool)
+    key = table["extract_id"].astype(np.int64) * (int(table["name_id"].max()) + 1) + table["name_id"]
+    _, groups = np.unique(key, return_inverse=True)
+    groups = groups.ravel()
+    total = np.bincount(groups)
+    at_start = np.bincount(groups, weights=table["first"])
+    return (total != at_start)[groups]
+
+
+class NameStore:
+    def __init__(self, folder: Path):
+        """Open the store in folder. It is empty until update is called if it doesn't exist yet."""
+        self.folder = Path(folder)
+        if (self.folder / names_filename).is_file():
+            self.table = load_table(self.folder / names_filename)
+            self.names = load_table(self.folder / name_strings_filename)["name"]
+            self.extracts = load_table(self.folder / extracts_filename)
+            self.vrefs = load_table(self.folder / vrefs_filename)["vref"]
+        else:
+            self.clear()
+        self.filtered_table: Optional[Dict[str, np.ndarray]] = None
+        self.vref_ids = {vref: number for number, vref in enumerate(self.vrefs.tolist())}
+
+    def clear(self) -> None:
+        self.table = {
+            "vref_id": np.array([], dtype=np.int32),
+            "extract_id": np.array([], dtype=np.int32),
+            "name_id": np.array([], dtype=np.int32),
+            "first": np.array([], dtype=bool),
+        }
+        self.names = np.array([], dtype=str)
+        self.extracts = {"extract": np.array([], dtype=str), "mtime_ns": np.array([], dtype=np.int64), "size": np.array([], dtype=np.int64)}
+        self.vrefs = np.array([], dtype=str)
+        self.filtered_table = None
+
+    def update(self, extracts: Iterable[Path], vref_file: Path, workers: Optional[int] = None, rebuild: bool = False) -> None:
+        """Add the extracts to the store, reading only those that are new or have changed.
+        A different vref file, or rebuild, empties the store first."""
+        extracts = sorted(dict.fromkeys(Path(extract).resolve() for extract in extracts))
+        with open(vref_file, "r", encoding="utf-8") as f:
+            vrefs = np.array([line.strip() for line in f], dtype=str)
+        if rebuild or not np.array_equal(vrefs, self.vrefs):
+            # Row numbers are only comparable with the same vref file.
+            self.clear()
+            self.vrefs = vrefs
+            self.vref_ids = {vref: number for number, vref in enumerate(vrefs.tolist())}
+
+        known = {
+            extract: (mtime_ns, size)
+            for extract, mtime_ns, size in zip(
+                self.extracts["extract"].tolist(), self.extracts["mtime_ns"].tolist(), self.extracts["size"].tolist()
+            )
+        }
+        # Extracts already in the store stay there unless they have changed.
+        signatures = dict(known)
+        signatures.update((str(extract), file_signature(extract)) for extract in extracts)
+        changed = [extract for extract in extracts if known.get(str(extract)) != signatures[str(extract)]]
+        changed_names = {str(extract) for extract in changed}
+
+        # Keep the rows of unchanged extracts, renumbering the extracts.
+        old_ids = {extract: number for number, extract in enumerate(known)}
+        new_extracts = sorted(signatures)
+        extract_ids = {extract: number for number, extract in enumerate(new_extracts)}
+        new_ids = np.full(len(known) + 1, -1, dtype=np.int32)
+        for extract, number in extract_ids.items():
+            if extract in old_ids and extract not in changed_names:
+                new_ids[old_ids[extract]] = number
+        keep = new_ids[self.table["extract_id"]] >= 0
+        tables = [{name: column[keep] for name, column in self.table.items()}]
+        tables[0]["extract_id"] = new_ids[tables[0]["extract_id"]]
+
+        # Intern the names found in the changed extracts, keeping the numbers of known names.
+        name_ids = {name: number for number, name in enumerate(self.names.tolist())}
+        names = self.names.tolist()
+        with ProcessPoolExecutor(max_workers=workers) as executor:
+            for extract, (line_numbers, codes, first, local_names) in zip(changed, executor.map(extract_names, changed, chunksize=4)):
+                if len(line_numbers) and line_numbers.max() >= len(vrefs):
+                    print(f"Warning: {extract} has more lines than {vref_file}, the extra lines are ignored.")
+                    inside = line_numbers < len(vrefs)
+                    line_numbers, codes, first = line_numbers[inside], codes[inside], first[inside]
+                local_ids = np.empty(len(local_names), dtype=np.int32)
+                for number, name in enumerate(local_names.tolist()):
+                    if name not in name_ids:
+                        name_ids[name] = len(names)
+                        names.append(name)
+                    local_ids[number] = name_ids[name]
+                tables.append(
+                    {
+                        "vref_id": line_numbers,
+                        "extract_id": np.full(len(line_numbers), extract_ids[str(extract)], dtype=np.int32),
+                        "name_id": local_ids[codes],
+                        "first": first,
+                    }
+                )
+
+        table = {name: np.concatenate([part[name] for part in tables]) for name in self.table}
+        order = np.lexsort((table["extract_id"], table["vref_id"]))
+        self.table = {name: column[order] for name, column in table.items()}
+        self.filtered_table = None
+        self.names = np.array(names, dtype=str)
+        self.extracts = {
+            "extract": np.array(new_extracts, dtype=str),
+            "mtime_ns": np.array([signatures[extract][0] for extract in new_extracts], dtype=np.int64),
+            "size": np.array([signatures[extract][1] for extract in new_extracts], dtype=np.int64),
+        }
+
+        save_table(self.folder / names_filename, self.table)
+        save_table(self.folder / name_strings_filename, {"name": self.names})
+        save_table(self.folder / extracts_filename, self.extracts)
+        save_table(self.folder / vrefs_filename, {"vref": self.vrefs})
+        print(f"Read {len(changed)} of {len(new_extracts)} extracts. The store has {len(self.table['name_id'])} candidates and {len(names)} names.")
+
+    def rows(self, filtered: bool = True) -> Dict[str, np.ndarray]:
+        """All the candidates, without the words that are only capitalized at the start of a verse if filtered."""
+        if not filtered:
+            return self.table
+        # Filter the whole table once, so that looking up a verse is a binary search.
+        if self.filtered_table is None:
+            keep = remove_first_only(self.table)
+            self.filtered_table = {name: column[keep] for name, column in self.table.items()}
+        return self.filtered_table
+
+    def verse(self, vref: str, filtered: bool = True) -> Dict[str, List[str]]:
+        """Return the names in a verse for each extract that has any."""
+        if vref not in self.vref_ids:
+            raise KeyError(f"{vref} isn't in the vref file of the store.")
+        table = self.rows(filtered)
+        vref_id = self.vref_ids[vref]
+        start, end = np.searchsorted(table["vref_id"], [vref_id, vref_id + 1])
+        found = {}
+        for extract_id, name_id in zip(table["extract_id"][start:end].tolist(), table["name_id"][start:end].tolist()):
+            found.setdefault(Path(self.extracts["extract"][extract_id]).name, []).append(str(self.names[name_id]))
+        return found
+
+    def name_counts(self, filtered: bool = True) -> Dict[str, Dict[str, int]]:
+        """Return the number of occurrences of each name in each extract."""
+        table = self.rows(filtered)
+        key = table["extract_id"].astype(np.int64) * max(len(self.names), 1) + table["name_id"]
+        keys, counts = np.unique(key, return_counts=True)
+        found = {}
+        for key, count in zip(keys.tolist(), counts.tolist()):
+            extract_id, name_id = divmod(key, max(len(self.names), 1))
+            found.setdefault(Path(self.extracts["extract"][extract_id]).name, {})[str(self.names[name_id])] = count
+        return found
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Find the names in every verse of many extracts and store them for querying.")
+    parser.add_argument("store", type=Path, help="Folder for the name store.")
+    parser.add_argument("--input_folder", type=Path, help="Folder of extracts to add to the store.")
+    parser.add_argument("--extension", type=str, default="txt", help="Specify which files to read by extension. The default is 'txt'.")
+    parser.add_argument("--input_files", nargs="+", default=[], help="Extracts to add to the store. Ignores input folder and extension argument.")
+    parser.add_argument("--vref", type=Path, default="D:/GitHub/silnlp/silnlp/assets/vref.txt", help="vref.txt file.")
+    parser.add_argument("--workers", type=int, default=None, help="Number of extracts to read at once. The default is the number of CPUs.")
+    parser.add_argument("--rebuild", action="store_true", help="Read every extract again.")
+    parser.add_argument("--verse", nargs="+", default=[], help="Show the names in these verses, e.g. 'GEN 1:1'.")
+    parser.add_argument("--all_words", action="store_true", help="Include words that are only capitalized at the start of a verse.")
+    parser.add_argument("--output", type=Path, help="Write the names in the verses to this csv file instead of showing them.")
+    args = parser.parse_args()
+
+    store = NameStore(args.store)
+    extracts = [Path(file) for file in args.input_files]
+    if not extracts and args.input_folder:
+        extracts = sorted(args.input_folder.glob(f"*.{args.extension}"))
+    if extracts:
+        store.update(extracts, args.vref, args.workers, args.rebuild)
+
+    rows = [
+        [vref, extract, " ".join(names)]
+        for vref in args.verse
+        for extract, names in store.verse(vref, filtered=not args.all_words).items()
+    ]
+    if args.output:
+        with open(args.output, "w", encoding="utf-8", newline="") as csvfile:
+            writer = csv.writer(csvfile)
+            writer.writerow(["vref", "extract", "names"])
+            writer.writerows(rows)
+        print(f"Wrote {len(rows)} rows to {args.output}")
+    else:
+        for row in rows:
+            print(", ".join(row))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,199 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""Index of the names found in each verse of each extract, for fast lookups by verse or by name.
+
+The index is a SQLite database with one row per occurrence of a name in a verse of an
+extract. It is indexed both by verse and by name, so "which names are in GEN 12:1"
+and "where does Abraham occur" are answered without reading every line. Names can be
+added from a name store made by name_extractor.py or from the names_by_ref.txt files
+written by the older name scripts, which have lines like:
+    GEN 1:1,['*Sa', 'Namalyari'],['*Sa', 'Dios']
+where a * marks the first capitalized word of the verse.
+"""
+import argparse
+import ast
+import re
+import sqlite3
+from pathlib import Path
+from typing import Iterable, List, Optional, Sequence, Tuple
+
+index_filename = "names_index.sqlite"
+
+schema = """
+CREATE TABLE IF NOT EXISTS extracts (
+    id INTEGER PRIMARY KEY,
+    extract TEXT UNIQUE
+);
+CREATE TABLE IF NOT EXISTS names (
+    id INTEGER PRIMARY KEY,
+    name TEXT UNIQUE
+);
+CREATE TABLE IF NOT EXISTS vrefs (
+    id INTEGER PRIMARY KEY,
+    vref TEXT UNIQUE,
+    position INTEGER
+);
+CREATE TABLE IF NOT EXISTS occurrences (
+    vref_id INTEGER,
+    extract_id INTEGER,
+    name_id INTEGER,
+    first INTEGER
+);
+CREATE INDEX IF NOT EXISTS occurrences_by_vref ON occurrences (vref_id, extract_id);
+CREATE INDEX IF NOT EXISTS occurrences_by_name ON occurrences (name_id, vref_id);
+CREATE INDEX IF NOT EXISTS occurrences_by_extract ON occurrences (extract_id);
+"""
+
+re_names_by_ref = re.compile(r"^(.*?),(\[.*?\]),(\[.*\])\s*$")
+
+# An occurrence is (position, vref, name, first), where position is the line of the verse in vref.txt.
+Occurrence = Tuple[int, str, str, bool]
+
+
+def read_names_by_ref(names_by_ref_file: Path) -> Tuple[List[Occurrence], List[Occurrence]]:
+    """Read a names_by_ref.txt file into the occurrences of its first and second extract."""
+    first_names, second_names = [], []
+    with open(names_by_ref_file, "r", encoding="utf-8") as f:
+        for position, line in enumerate(f):
+            match = re_names_by_ref.match(line)
+            if not match:
+                continue
+            vref = match.group(1).strip()
+            for occurrences, names in ((first_names, match.group(2)), (second_names, match.group(3))):
+                for name in ast.literal_eval(names):
+                    occurrences.append((position, vref, name.lstrip("*"), name.startswith("*")))
+    return first_names, second_names
+
+
+class NamesIndex:
+    def __init__(self, db_file: Path):
+        self.db_file = Path(db_file)
+        self.db_file.parent.mkdir(parents=True, exist_ok=True)
+        self.connection = sqlite3.connect(str(self.db_file))
+        self.connection.executescript(schema)
+
+    def close(self) -> None:
+        self.connection.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+    def ids(self, table: str, column: str, values: Iterable[str]) -> dict:
+        """Return the id of each value, adding the values that aren't in the table yet."""
+        values = list(dict.fromkeys(values))
+        self.connection.executemany(f"INSERT OR IGNORE INTO {table} ({column}) VALUES (?)", [(value,) for value in values])
+        found = {}
+        # SQLite limits the number of parameters in a query.
+        for start in range(0, len(values), 500):
+            chunk = values[start : start + 500]
+            query = f"SELECT {column}, id FROM {table} WHERE {column} IN ({', '.join('?' * len(chunk))})"
+            found.update(self.connection.execute(query, chunk))
+        return found
+
+    def add(self, extract: str, occurrences: Sequence[Occurrence]) -> None:
+        """Replace the names of an extract with these occurrences."""
+        with self.connection:
+            extract_id = self.ids("extracts", "extract", [extract])[extract]
+            self.connection.execute("DELETE FROM occurrences WHERE extract_id = ?", (extract_id,))
+            self.connection.executemany(
+                "INSERT OR IGNORE INTO vrefs (vref, position) VALUES (?, ?)",
+                list({vref: (vref, position) for position, vref, _, _ in occurrences}.values()),
+            )
+            vref_ids = self.ids("vrefs", "vref", (vref for _, vref, _, _ in occurrences))
+            name_ids = self.ids("names", "name", (name for _, _, name, _ in occurrences))
+            self.connection.executemany(
+                "INSERT INTO occurrences (vref_id, extract_id, name_id, first) VALUES (?, ?, ?, ?)",
+                [(vref_ids[vref], extract_id, name_ids[name], int(first)) for _, vref, name, first in occurrences],
+            )
+
+    def add_store(self, store, filtered: bool = True) -> None:
+        """Add every extract in a name_extractor.NameStore."""
+        table = store.rows(filtered)
+        vrefs, names = store.vrefs.tolist(), store.names.tolist()
+        rows = zip(table["extract_id"].tolist(), table["vref_id"].tolist(), table["name_id"].tolist(), table["first"].tolist())
+        by_extract = {}
+        for extract_id, vref_id, name_id, first in rows:
+            by_extract.setdefault(extract_id, []).append((vref_id, vrefs[vref_id], names[name_id], first))
+        for extract_id, extract in enumerate(store.extracts["extract"].tolist()):
+            self.add(Path(extract).name, by_extract.get(extract_id, []))
+
+    def add_names_by_ref(self, names_by_ref_file: Path, extracts: Sequence[str]) -> None:
+        """Add the names of the two extracts in a names_by_ref.txt file, under the names given."""
+        for extract, occurrences in zip(extracts, read_names_by_ref(names_by_ref_file)):
+            self.add(extract, occurrences)
+
+    def extracts(self) -> List[str]:
+        return [extract for (extract,) in self.connection.execute("SELECT extract FROM extracts ORDER BY extract")]
+
+    def verse(self, vref: str, extract: Optional[str] = None) -> List[Tuple[str, str]]:
+        """Return (extract, name) for each name in a verse, in the order they occur."""
+        query = """
+            SELECT extracts.extract, names.name FROM occurrences
+            JOIN vrefs ON vrefs.id = occurrences.vref_id
+            JOIN extracts ON extracts.id = occurrences.extract_id
+            JOIN names ON names.id = occurrences.name_id
+            WHERE vrefs.vref = ?"""
+        parameters = [vref]
+        if extract:
+            query += " AND extracts.extract = ?"
+            parameters.append(extract)
+        return self.connection.execute(query + " ORDER BY extracts.extract, occurrences.rowid", parameters).fetchall()
+
+    def occurrences(self, name: str, extract: Optional[str] = None, like: bool = False) -> List[Tuple[str, str, str]]:
+        """Return (vref, extract, name) for each occurrence of a name, in verse order.
+        With like the name is an SQL LIKE pattern such as 'Abra%'."""
+        query = f"""
+            SELECT vrefs.vref, extracts.extract, names.name FROM names
+            JOIN occurrences ON occurrences.name_id = names.id
+            JOIN vrefs ON vrefs.id = occurrences.vref_id
+            JOIN extracts ON extracts.id = occurrences.extract_id
+            WHERE names.name {'LIKE' if like else '='} ?"""
+        parameters = [name]
+        if extract:
+            query += " AND extracts.extract = ?"
+            parameters.append(extract)
+        return self.connection.execute(query + " ORDER BY vrefs.position, extracts.extract", parameters).fetchall()
+
+    def names(self, pattern: str = "%") -> List[Tuple[str, int]]:
+        """Return the names matching an SQL LIKE pattern with their number of occurrences."""
+        return self.connection.execute(
+            """SELECT names.name, COUNT(*) FROM names JOIN occurrences ON occurrences.name_id = names.id
+            WHERE names.name LIKE ? GROUP BY names.id ORDER BY names.name""",
+            (pattern,),
+        ).fetchall()
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Look up names by verse or verses by name in a names index.")
+    parser.add_argument("index", type=Path, help=f"The index database, or a folder for {index_filename}.")
+    parser.add_argument("--store", type=Path, help="Add the extracts in this name store made by name_extractor.py.")
+    parser.add_argument("--names_by_ref", type=Path, help="Add the names in this names_by_ref.txt file.")
+    parser.add_argument("--extracts", nargs=2, default=["first", "second"], help="Names for the two extracts in the names_by_ref file.")
+    parser.add_argument("--verse", nargs="+", default=[], help="Show the names in these verses, e.g. 'GEN 1:1'.")
+    parser.add_argument("--name", nargs="+", default=[], help="Show the verses these names occur in. % and _ are wildcards.")
+    parser.add_argument("--extract", type=str, help="Only show names from this extract.")
+    args = parser.parse_args()
+
+    db_file = args.index / index_filename if args.index.is_dir() else args.index
+    with NamesIndex(db_file) as index:
+        if args.store:
+            from name_extractor import NameStore
+
+            index.add_store(NameStore(args.store))
+        if args.names_by_ref:
+            index.add_names_by_ref(args.names_by_ref, args.extracts)
+
+        for vref in args.verse:
+            for extract, name in index.verse(vref, args.extract):
+                print(f"{vref}, {extract}, {name}")
+        for name in args.name:
+            like = "%" in name or "_" in name
+            for vref, extract, found in index.occurrences(name, args.extract, like=like):
+                print(f"{found}, {vref}, {extract}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,293 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""One table of all the scores in the scores-*.csv files of a folder of experiments.
+
+Every scores file is read once into a typed columnar table (see column_store.py) with
+one row per score. BLEU scores such as "25.45/50.1/30.2/20.1/10.2" are parsed into
+numbers and the original text is kept. The modification time and size of each file
+are stored with the table, so later runs only read the files that are new or changed.
+The score reports (combine_scores.py, combine_scores_dict.py, aggregate_scores.py and
+summarize_scores_simple.py) are queries over the table.
+"""
+import argparse
+import csv
+import os
+import re
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+from typing import Dict, Iterable, List, Optional, Tuple
+
+import numpy as np
+
+from column_store import concat_tables, load_table, save_table, table_length
+from experiment_scan import re_scores, walk
+
+table_filename = "scores_table.npz"
+files_filename = "scores_table_files.npz"
+
+# The columns of the scores table and their types.
+columns = {
+    "series": str,
+    "experiment": str,
+    "steps": np.int64,
+    "book": str,
+    "src_iso": str,
+    "trg_iso": str,
+    "num_refs": np.int32,
+    "references": str,
+    "sent_len": np.int32,
+    "scorer": str,
+    "score": np.float64,
+    "score_text": str,
+    "file": str,
+}
+
+# The columns of a scores file written by SILNLP.
+scores_file_columns = ["book", "src_iso", "trg_iso", "num_refs", "references", "sent_len", "scorer", "score"]
+
+# The metrics that best and last checkpoints are chosen for. Lower is better for WER and TER.
+metrics = ["BLEU", "spBLEU", "CHRF3", "WER", "TER"]
+lower_is_better = ["WER", "TER"]
+best_by_choices = ["steps", "score"]
+
+re_steps = re.compile(r"scores-(\d+)\.csv$")
+re_number = re.compile(r"\s*(-?\d+(?:\.\d*)?)")
+
+missing_number = -1
+
+
+def parse_score(text: str) -> float:
+    """The score as a number. For BLEU "25.45/50.1/30.2/20.1/10.2" that is 25.45."""
+    match = re_number.match(text or "")
+    return float(match.group(1)) if match else np.nan
+
+
+def parse_int(text: str) -> int:
+    try:
+        return int(text)
+    except (TypeError, ValueError):
+        return missing_number
+
+
+def file_steps(scores_file: Path) -> int:
+    match = re_steps.match(scores_file.name)
+    return int(match.group(1)) if match else missing_number
+
+
+def empty_table() -> Dict[str, np.ndarray]:
+    return {name: np.array([], dtype=dtype) for name, dtype in columns.items()}
+
+
+def read_scores_file(scores_file: Path) -> Dict[str, np.ndarray]:
+    """Read one scores file into a table. The series and experiment are the names of the
+    grandparent and parent folders of the file."""
+    scores_file = Path(scores_file)
+    rows = {name: [] for name in columns}
+    with open(scores_file, "r", encoding="utf-8", newline="") as csvfile:
+        reader = csv.DictReader(csvfile)
+        for row in reader:
+            # Some scores files have been written with capitalized column names.
+            row = {key.strip().lower(): (value or "").strip() for key, value in row.items() if key}
+            for name in ("book", "src_iso", "trg_iso", "references", "scorer"):
+                rows[name].append(row.get(name, ""))
+            rows["num_refs"].append(parse_int(row.get("num_refs")))
+            rows["sent_len"].append(parse_int(row.get("sent_len")))
+            rows["score_text"].append(row.get("score", ""))
+            rows["score"].append(parse_score(row.get("score")))
+
+    length = len(rows["book"])
+    rows["series"] = [scores_file.parent.parent.name] * length
+    rows["experiment"] = [scores_file.parent.name] * length
+    rows["steps"] = [file_steps(scores_file)] * length
+    rows["file"] = [str(scores_file)] * length
+    return {name: np.array(rows[name], dtype=dtype) for name, dtype in columns.items()}
+
+
+def find_scores_files(roots: Iterable[Path], workers: int = 16) -> List[Path]:
+    return sorted(Path(folder, name) for folder, _, files in walk(roots, workers) for name in files if re_scores.match(name))
+
+
+def file_signature(scores_file: Path) -> Optional[Tuple[int, int]]:
+    try:
+        stat = os.stat(scores_file)
+    except OSError:
+        return None
+    return stat.st_mtime_ns, stat.st_size
+
+
+def load_signatures(files_file: Path) -> Dict[str, Tuple[int, int]]:
+    if not Path(files_file).is_file():
+        return {}
+    files = load_table(files_file)
+    return {file: (mtime_ns, size) for file, mtime_ns, size in zip(files["file"].tolist(), files["mtime_ns"].tolist(), files["size"].tolist())}
+
+
+def update_scores_table(
+    roots: Iterable[Path], table_folder: Optional[Path] = None, workers: int = 16, rebuild: bool = False
+) -> Dict[str, np.ndarray]:
+    """Bring the scores table for the roots up to date and return it.
+
+    The table is kept in table_folder, by default the first root. Files that have not
+    changed since the last update are not read again.
+    """
+    roots = [Path(root) for root in roots]
+    table_folder = Path(table_folder) if table_folder else roots[0]
+    table_file = table_folder / table_filename
+    files_file = table_folder / files_filename
+
+    with ThreadPoolExecutor(max_workers=workers) as executor:
+        scores_files = find_scores_files(roots, workers)
+        signatures = dict(zip((str(file) for file in scores_files), executor.map(file_signature, scores_files)))
+        signatures = {file: signature for file, signature in signatures.items() if signature}
+
+        known = {} if rebuild or not table_file.is_file() else load_signatures(files_file)
+        unchanged = [file for file, signature in signatures.items() if known.get(file) == signature]
+        changed = [file for file, signature in signatures.items() if known.get(file) != signature]
+
+        if known and not changed and len(unchanged) == len(known):
+            return load_table(table_file)
+
+        tables = []
+        if unchanged:
+            old = load_table(table_file)
+            tables.append({name: column[np.isin(old["file"], unchanged)] for name, column in old.items()})
+
+        def read_or_report(scores_file):
+            try:
+                return read_scores_file(scores_file)
+            except (OSError, csv.Error, UnicodeDecodeError) as e:
+                print(f"Can't read {scores_file}: {e}")
+                return None
+
+        tables.extend(table for table in executor.map(read_or_report, changed) if table)
+
+    table = concat_tables([table for table in tables if table_length(table)]) or empty_table()
+    save_table(table_file, table)
+    files = sorted(signatures)
+    save_table(
+        files_file,
+        {
+            "file": files,
+            "mtime_ns": np.array([signatures[file][0] for file in files], dtype=np.int64),
+            "size": np.array([signatures[file][1] for file in files], dtype=np.int64),
+        },
+    )
+    print(f"Read {len(changed)} of {len(signatures)} scores files into {table_file}")
+    return table
+
+
+def select(table: Dict[str, np.ndarray], **values) -> Dict[str, np.ndarray]:
+    """Return the rows whose columns have the given values. A list of values matches any of them."""
+    mask = np.ones(table_length(table), dtype=bool)
+    for name, value in values.items():
+        if isinstance(value, (list, tuple, set)):
+            mask &= np.isin(table[name], list(value))
+        else:
+            mask &= table[name] == value
+    return {name: column[mask] for name, column in table.items()}
+
+
+def sort_rows(table: Dict[str, np.ndarray], *names: str) -> Dict[str, np.ndarray]:
+    order = np.lexsort([table[name] for name in reversed(names)])
+    return {name: column[order] for name, column in table.items()}
+
+
+def group_ids(table: Dict[str, np.ndarray], names: Iterable[str]) -> np.ndarray:
+    """Number the distinct combinations of values in the named columns."""
+    names = list(names)
+    if not names:
+        return np.zeros(table_length(table), dtype=np.int64)
+    codes = np.stack([np.unique(table[name], return_inverse=True)[1].ravel() for name in names], axis=1)
+    return np.unique(codes, axis=0, return_inverse=True)[1].ravel()
+
+
+def select_checkpoints(
+    table: Dict[str, np.ndarray], keys: Iterable[str] = ("series", "experiment"), best_by: str = "steps"
+) -> Dict[str, np.ndarray]:
+    """Return the best and last checkpoint for each experiment, metric and book.
+
+    The experiment is identified by the key columns. The last checkpoint is the one with
+    the most steps. With best_by="steps" the best checkpoint is the one with the fewest
+    steps, since SILNLP keeps only the best and the last checkpoints. With best_by="score"
+    it is the one with the best score for the metric, the fewest steps winning a tie.
+    """
+    if best_by not in best_by_choices:
+        raise ValueError(f"best_by must be one of {best_by_choices}, not {best_by}")
+
+    scored = select(table, scorer=metrics)
+    keep = (scored["steps"] != missing_number) & ~np.isnan(scored["score"])
+    scored = {name: column[keep] for name, column in scored.items()}
+    names = list(keys) + ["scorer", "book"]
+    if not table_length(scored):
+        selected = {name: scored[name] for name in names}
+        selected.update(best_steps=scored["steps"], best_score=scored["score"], last_steps=scored["steps"], last_score=scored["score"])
+        return selected
+
+    groups = group_ids(scored, names)
+    steps, score = scored["steps"], scored["score"]
+
+    # Sorting by group first gives each group a run of rows, the same runs for both orders.
+    by_steps = np.lexsort((steps, groups))
+    sorted_groups = groups[by_steps]
+    starts = np.flatnonzero(np.r_[True, sorted_groups[1:] != sorted_groups[:-1]])
+    ends = np.r_[starts[1:], len(sorted_groups)] - 1
+
+    last = by_steps[ends]
+    if best_by == "steps":
+        best = by_steps[starts]
+    else:
+        value = np.where(np.isin(scored["scorer"], lower_is_better), -score, score)
+        best = np.lexsort((-steps, value, groups))[ends]
+
+    selected = {name: scored[name][last] for name in names}
+    selected["best_steps"] = steps[best]
+    selected["best_score"] = score[best]
+    selected["last_steps"] = steps[last]
+    selected["last_score"] = score[last]
+    return selected
+
+
+def scores_file_rows(table: Dict[str, np.ndarray]) -> Iterable[List]:
+    """Yield series, experiment and steps followed by the columns of the original scores file for each row."""
+    names = ["series", "experiment", "steps"] + scores_file_columns
+    lists = {name: table["score_text" if name == "score" else name].tolist() for name in names}
+    for number_column in ("num_refs", "sent_len"):
+        lists[number_column] = ["" if value == missing_number else value for value in lists[number_column]]
+    lists["steps"] = ["" if value == missing_number else value for value in lists["steps"]]
+    yield from zip(*(lists[name] for name in names))
+
+
+def scores_frame(table: Dict[str, np.ndarray]):
+    """The table as a pandas DataFrame."""
+    import pandas as pd
+
+    return pd.DataFrame(table)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Read all the scores-*.csv files below folders into one scores table.")
+    parser.add_argument("folders", nargs="+", type=Path, help="Folders of experiments.")
+    parser.add_argument("--table", type=Path, help="Folder for the table. The default is the first folder.")
+    parser.add_argument("--workers", type=int, default=16, help="Number of files to read at once.")
+    parser.add_argument("--rebuild", action="store_true", help="Read every scores file again.")
+    parser.add_argument("--checkpoints", type=Path, help="Write the best and last checkpoint of every experiment to this CSV file.")
+    parser.add_argument("--best-by", choices=best_by_choices, default="steps", help="Choose the best checkpoint by fewest steps or by best score.")
+    args = parser.parse_args()
+
+    table = update_scores_table(args.folders, args.table, args.workers, args.rebuild)
+    print(
+        f"The table has {table_length(table)} scores for {len(np.unique(table['experiment']))} experiments "
+        f"and {len(np.unique(table['scorer']))} scorers."
+    )
+
+    if args.checkpoints:
+        checkpoints = select_checkpoints(table, best_by=args.best_by)
+        with open(args.checkpoints, "w", encoding="utf-8", newline="") as csvfile:
+            writer = csv.writer(csvfile)
+            writer.writerow(list(checkpoints))
+            writer.writerows(zip(*(column.tolist() for column in checkpoints.values())))
+        print(f"Wrote {table_length(checkpoints)} best and last checkpoints to {args.checkpoints}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,131 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""Cached listings of the MT scripture folder and the Paratext projects folder.
+
+The extracts in the scripture folder are named <iso>-<project>.txt. Listing the folder,
+and checking for each project folder one at a time, is slow over SMB. Instead each
+folder is listed once and the listing is cached in a JSON file with the folder's
+modification time. A folder's modification time changes when files are added, removed
+or renamed in it, so later runs use the cached listing unless it has. Lookups for many
+ISO codes are then dictionary and set lookups.
+"""
+import argparse
+import csv
+import json
+import os
+from pathlib import Path
+from typing import Dict, Iterable, List, Optional
+
+cache_filename = "scripture_index.json"
+default_cache_dir = Path.home() / ".cache" / "textinfo"
+output_header = ["iso", "file", "project", "project_exists"]
+
+
+def list_folder(folder: Path, cache: Dict) -> Dict:
+    """Return the cached listing of a folder, listing it again if it has changed.
+
+    The listing has the folder's mtime_ns, the names of its files and of its subfolders.
+    """
+    key = str(folder)
+    mtime_ns = os.stat(folder).st_mtime_ns
+    cached = cache.get(key)
+    if cached and cached["mtime_ns"] == mtime_ns:
+        return cached
+
+    files, folders = [], []
+    with os.scandir(folder) as entries:
+        for entry in entries:
+            (folders if entry.is_dir() else files).append(entry.name)
+    cache[key] = {"mtime_ns": mtime_ns, "files": sorted(files), "folders": sorted(folders)}
+    return cache[key]
+
+
+class ScriptureIndex:
+    def __init__(self, scripture_dir: Path, projects_dir: Optional[Path] = None, cache_file: Optional[Path] = None):
+        """Index the extracts in scripture_dir and the project folders in projects_dir."""
+        self.cache_file = Path(cache_file) if cache_file else default_cache_dir / cache_filename
+        cache = {}
+        if self.cache_file.is_file():
+            try:
+                with open(self.cache_file, "r", encoding="utf-8") as f:
+                    cache = json.load(f)
+            except (OSError, json.JSONDecodeError):
+                cache = {}
+        before = {folder: listing["mtime_ns"] for folder, listing in cache.items()}
+
+        self.files_by_iso: Dict[str, List[str]] = {}
+        for name in list_folder(Path(scripture_dir), cache)["files"]:
+            stem, suffix = os.path.splitext(name)
+            if suffix == ".txt":
+                self.files_by_iso.setdefault(stem.split("-")[0], []).append(stem)
+        self.projects = set(list_folder(Path(projects_dir), cache)["folders"]) if projects_dir else set()
+        self.has_projects = projects_dir is not None
+
+        if {folder: listing["mtime_ns"] for folder, listing in cache.items()} != before:
+            self.save(cache)
+
+    def save(self, cache: Dict) -> None:
+        self.cache_file.parent.mkdir(parents=True, exist_ok=True)
+        tmp_file = self.cache_file.with_name(self.cache_file.name + ".tmp")
+        with open(tmp_file, "w", encoding="utf-8") as f:
+            json.dump(cache, f)
+        tmp_file.replace(self.cache_file)
+
+    def files(self, iso: str) -> List[str]:
+        """The extracts for an ISO code, without the .txt extension."""
+        return self.files_by_iso.get(iso, [])
+
+    def find(self, isos: Iterable[str]) -> List[Dict]:
+        """Return a row for each extract of each ISO code, with its project and whether the project folder exists."""
+        rows = []
+        for iso in dict.fromkeys(isos):
+            for file in self.files(iso):
+                project = file.split("-", maxsplit=1)[1] if "-" in file else ""
+                exists = project in self.projects if project and self.has_projects else None
+                rows.append({"iso": iso, "file": file, "project": project, "project_exists": exists})
+        return rows
+
+
+def write_rows(output_file: Path, rows: List[Dict]) -> None:
+    """Write the rows to a .json file, or to a csv file for any other extension."""
+    output_file = Path(output_file)
+    if output_file.suffix.lower() == ".json":
+        with open(output_file, "w", encoding="utf-8") as f:
+            json.dump(rows, f, indent=2, ensure_ascii=False)
+    else:
+        with open(output_file, "w", encoding="utf-8", newline="") as csvfile:
+            writer = csv.DictWriter(csvfile, fieldnames=output_header)
+            writer.writeheader()
+            writer.writerows(rows)
+    print(f"Wrote {len(rows)} rows to {output_file}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Find the extracts and Paratext projects for many ISO codes.")
+    parser.add_argument("scripture_dir", type=Path, help="The MT scripture folder.")
+    parser.add_argument("iso_codes", type=str, nargs="*", help="ISO codes to find.")
+    parser.add_argument("--iso_file", type=Path, help="A file with ISO codes, one per line or separated by spaces or commas.")
+    parser.add_argument("--projects_dir", type=Path, help="The Paratext projects folder.")
+    parser.add_argument("--cache", type=Path, help=f"The cache file. The default is {default_cache_dir / cache_filename}")
+    parser.add_argument("--output", type=Path, help="Write the results to a .csv or .json file.")
+    args = parser.parse_args()
+
+    isos = list(args.iso_codes)
+    if args.iso_file:
+        isos.extend(args.iso_file.read_text(encoding="utf-8").replace(",", " ").split())
+
+    index = ScriptureIndex(args.scripture_dir, args.projects_dir, args.cache)
+    rows = index.find(isos)
+    if args.output:
+        write_rows(args.output, rows)
+    else:
+        for row in rows:
+            exists = "" if row["project_exists"] is None else f" (project exists: {row['project_exists']})"
+            print(f"{row['iso']}: {row['file']}{exists}")
+    missing = [iso for iso in dict.fromkeys(isos) if not index.files(iso)]
+    if missing:
+        print(f"No extracts for {len(missing)} ISO codes: {' '.join(missing)}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,259 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""A streaming parser for SFM and USFM files.
+
+parse_file yields an Event for each marker in a file, one line at a time, so even very
+large files are parsed in constant memory. An event has the marker without its
+backslash, e.g. "v", "f" or "f*" for an end marker, any attributes, the text that
+follows the marker up to the next marker or the end of the line, and the line and
+column of the marker. A line that doesn't start with a marker continues the text of
+the previous one and is an event with the marker "".
+
+The book of \\id, and the numbers of \\c and \\v, are attributes rather than text:
+    \\v 3 And God said   ->   Event("v", {"number": "3"}, "And God said", 12, 1)
+USFM 3 attributes such as \\w grace|lemma="grace"\\w* are split from the text too.
+
+Most lines start with the only marker on them: \\id, \\c and \\v in USFM and \\ref, \\tx,
+\\tf and \\te in Toolbox interlinear files. These are split with str methods without
+searching the line for markers.
+"""
+import argparse
+import re
+import time
+from pathlib import Path
+from typing import Dict, Iterable, Iterator, List, NamedTuple, Optional, Tuple
+
+re_marker = re.compile(r"\\(\+?[A-Za-z0-9_-]*\*?)")
+re_attribute = re.compile(r"([\w-]+)\s*=\s*\"([^\"]*)\"")
+
+number_markers = {"c", "v", "ca", "va", "cp", "vp"}
+# Markers of lines whose text isn't part of the verse before them.
+non_verse_markers = {
+    "h", "toc1", "toc2", "toc3", "mt", "mt1", "mt2", "mt3", "ms", "ms1", "ms2", "mr", "s", "s1", "s2", "s3", "s4",
+    "sr", "r", "d", "sp", "cl", "cd", "rem", "sts", "ide", "usfm", "restore", "imt", "is", "ip", "io", "iot",
+}  # fmt: skip
+sfm_suffixes = {".sfm", ".usfm"}
+
+
+class Event(NamedTuple):
+    marker: str
+    attributes: Dict[str, str]
+    text: str
+    line: int
+    column: int
+
+
+def split_attributes(text: str) -> Tuple[str, Dict[str, str]]:
+    """Split the USFM 3 attributes after a | from the text of a character marker."""
+    text, _, attributes = text.rpartition("|")
+    pairs = dict(re_attribute.findall(attributes))
+    if not pairs and attributes.strip():
+        pairs = {"default": attributes.strip()}
+    return text, pairs
+
+
+def make_event(marker: str, text: str, line: int, column: int, closed: bool = False) -> Event:
+    """The event for a marker and the text between it and the next marker.
+    closed is true if the next marker is the end marker of this one."""
+    if marker == "id":
+        book, _, text = text.strip().partition(" ")
+        return Event(marker, {"book": book.upper()}, text.strip(), line, column)
+    if marker in number_markers:
+        number, _, text = text.lstrip().partition(" ")
+        return Event(marker, {"number": number}, text.lstrip(), line, column)
+    if closed and "|" in text:
+        # Only character markers closed by their end marker have attributes.
+        text, attributes = split_attributes(text)
+        return Event(marker, attributes, text, line, column)
+    return Event(marker, {}, text, line, column)
+
+
+def parse_lines(lines: Iterable[str], first_line: int = 1) -> Iterator[Event]:
+    """Yield the events in lines of SFM or USFM."""
+    for number, line in enumerate(lines, first_line):
+        line = line.rstrip()
+        if not line:
+            continue
+        if line[0] != "\\":
+            if "\\" not in line:
+                yield Event("", {}, line, number, 1)
+                continue
+        elif "\\" not in line[1:]:
+            # The usual case of one marker at the start of the line.
+            if line[1:2].isspace() or len(line) == 1:
+                # A backslash without a marker is kept as text.
+                yield Event("", {}, line, number, 1)
+                continue
+            marker, *text = line[1:].split(maxsplit=1)
+            yield make_event(marker, text[0] if text else "", number, 1)
+            continue
+
+        matches = list(re_marker.finditer(line))
+        if matches[0].start() > 0:
+            yield Event("", {}, line[: matches[0].start()], number, 1)
+        for match, following in zip(matches, matches[1:] + [None]):
+            text = line[match.end() : following.start() if following else len(line)]
+            marker = match.group(1)
+            if not marker:
+                # A backslash without a marker is kept as text.
+                yield Event("", {}, "\\" + text, number, match.start() + 1)
+                continue
+            # The space after a marker separates it from its text, except after end markers.
+            if not marker.endswith("*") and text[:1] in (" ", "\t"):
+                text = text[1:]
+            closed = following is not None and following.group(1) == marker + "*"
+            yield make_event(marker, text, number, match.start() + 1, closed)
+
+
+def parse_file(file: Path, encoding: str = "utf-8-sig", errors: str = "strict") -> Iterator[Event]:
+    """Yield the events in an SFM or USFM file."""
+    with open(file, "r", encoding=encoding, errors=errors) as f:
+        yield from parse_lines(f)
+
+
+def book_id(file: Path) -> Optional[str]:
+    """The book in the \\id line of a file, reading only as far as that line."""
+    for event in parse_file(file, errors="replace"):
+        if event.marker == "id":
+            return event.attributes["book"]
+    return None
+
+
+def records(events: Iterable[Event], record_marker: str = "ref") -> Iterator[Dict[str, str]]:
+    """Group the events of a Toolbox file into records, each starting with the record marker.
+
+    A record has the text of the first occurrence of each marker in it, with any lines
+    that continue it joined with spaces.
+    """
+    record: Dict[str, str] = {}
+    marker = None
+    for event in events:
+        if event.marker == record_marker and record:
+            yield record
+            record = {}
+        if event.marker == "":
+            if marker in record and marker is not None:
+                record[marker] = f"{record[marker]} {event.text}".strip()
+            continue
+        marker = event.marker if event.marker not in record else None
+        if marker is not None:
+            record[marker] = event.text
+    if record:
+        yield record
+
+
+def verses(events: Iterable[Event]) -> Iterator[Tuple[str, str, str, str]]:
+    """Yield the book, chapter, verse and text of each verse, without the markers, the text
+    of notes or the headings and other lines that aren't part of a verse."""
+    book, chapter, verse, parts = "", "", "", []
+    note_depth = 0
+    heading = False
+    for event in events:
+        marker = event.marker
+        if event.column == 1:
+            if marker:
+                heading = marker in non_verse_markers
+            # A new line separates words, but markers within a line don't.
+            parts.append(" ")
+        if marker in ("id", "c", "v"):
+            if verse:
+                yield book, chapter, verse, " ".join("".join(parts).split())
+            verse, parts = "", []
+            if marker == "id":
+                book, chapter = event.attributes["book"], ""
+            elif marker == "c":
+                chapter = event.attributes["number"]
+            else:
+                verse = event.attributes["number"]
+                parts.append(event.text)
+            continue
+        if marker in ("f", "x", "fe"):
+            note_depth += 1
+        elif marker in ("f*", "x*", "fe*"):
+            note_depth = max(0, note_depth - 1)
+            parts.append(event.text)
+            continue
+        if verse and not note_depth and not heading:
+            parts.append(event.text)
+    if verse:
+        yield book, chapter, verse, " ".join("".join(parts).split())
+
+
+def generate(events: Iterable[Event]) -> Iterator[str]:
+    """Yield the lines of SFM for the events, starting a new line for each event at column 1."""
+    parts: List[str] = []
+    previous = None
+    for event in events:
+        if event.column == 1 and parts:
+            yield "".join(parts)
+            parts = []
+        elif previous and previous.marker and not previous.marker.endswith("*") and not previous.text and (
+            event.marker[-1:] not in ("", "*") or event.text.startswith("\\")
+        ):
+            # The space that separated a marker without text from the next marker.
+            parts.append(" ")
+        previous = event
+        if event.marker:
+            parts.append(f"\\{event.marker}")
+            value = event.attributes.get("book") or event.attributes.get("number")
+            if value:
+                parts.append(f" {value}")
+            if event.text and not event.marker.endswith("*"):
+                parts.append(" ")
+        parts.append(event.text)
+        attributes = {key: value for key, value in event.attributes.items() if key not in ("book", "number")}
+        if attributes:
+            parts.append("|" + " ".join(f'{key}="{value}"' for key, value in attributes.items()))
+    if parts:
+        yield "".join(parts)
+
+
+def find_sfm_files(paths: Iterable[Path]) -> List[Path]:
+    """The SFM and USFM files given, and those in the folders given and their subfolders."""
+    files = []
+    for path in paths:
+        if path.is_dir():
+            files.extend(sorted(file for file in path.rglob("*") if file.suffix.lower() in sfm_suffixes and file.is_file()))
+        else:
+            files.append(path)
+    return files
+
+
+def benchmark(files: List[Path], repeat: int = 3) -> Dict[str, float]:
+    """Time parsing the files, taking the fastest of repeat runs."""
+    size = sum(file.stat().st_size for file in files)
+    best, events = float("inf"), 0
+    for _ in range(repeat):
+        start = time.perf_counter()
+        events = sum(1 for file in files for _ in parse_file(file, errors="replace"))
+        best = min(best, time.perf_counter() - start)
+    return {"files": len(files), "megabytes": size / 1e6, "events": events, "seconds": best}
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Parse SFM or USFM files and count their markers, or time the parser.")
+    parser.add_argument("paths", nargs="+", type=Path, help="SFM or USFM files, or folders to search for them.")
+    parser.add_argument("--benchmark", action="store_true", help="Report how fast the files are parsed.")
+    parser.add_argument("--repeat", type=int, default=3, help="Number of times to parse the files when benchmarking.")
+    args = parser.parse_args()
+
+    files = find_sfm_files(args.paths)
+    if args.benchmark:
+        result = benchmark(files, args.repeat)
+        seconds = max(result["seconds"], 1e-9)
+        print(
+            f"Parsed {result['files']} files, {result['megabytes']:.1f} MB and {result['events']} events in {seconds:.3f} s: "
+            f"{result['megabytes'] / seconds:.1f} MB/s, {result['events'] / seconds / 1e6:.2f} M events/s"
+        )
+        return
+
+    counts: Dict[str, int] = {}
+    for file in files:
+        for event in parse_file(file, errors="replace"):
+            counts[event.marker] = counts.get(event.marker, 0) + 1
+    for marker, count in sorted(counts.items(), key=lambda item: -item[1]):
+        print(f"{count:>10} \\{marker}" if marker else f"{count:>10} (continued text)")
+
+
+if __name__ == "__main__":
+    main()
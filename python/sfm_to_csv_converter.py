@@ -3,61 +3,38 @@ import csv
 import re
 from pathlib import Path
 
-def clean_text(text, replacements):
+from sfm_parser import parse_file, records
+
+# Text cleaning patterns
+replacements = [
+    (re.compile(r'[«"""»]'), ' '),  # Replace various quote marks
+    (re.compile(r'…|\.{3}'), ' '),  # Replace ellipsis (character or three dots)
+    (re.compile(r'/refr.*'), ' '),  # Replace "/refr" and anything after it
+    (re.compile(r':'), ' '),  # Replace colons with space
+    (re.compile(r'[#\[\]]'), ' '),  # Replace hashes and square brackets with a space
+    # Add more patterns here as needed
+]
+
+def clean_text(text, replacements=replacements):
     for pattern, replacement in replacements:
-        text = re.sub(pattern, replacement, text)
+        text = pattern.sub(replacement, text)
     # Replace multiple whitespace characters with a single space
-    text = re.sub(r'\s+', ' ', text)
-    return text.strip()
+    return " ".join(text.split())
 
 def convert_sfm_to_csv(input_file, output_file):
-    with open(input_file, 'r', encoding='utf-8') as file:
-        content = file.read()
-
-    # Split the content into rows based on the \ref marker, but keep the \ref
-    rows = re.split(r'(?=\\ref)', content)
-    
-    # Define text cleaning patterns
-    replacements = [
-        (r'[«"""»]', ' '),  # Replace various quote marks
-        (r'…|\.{3}', ' '),  # Replace ellipsis (character or three dots)
-        (r'/refr.*', ' '),  # Replace "/refr" and anything after it
-        (r':', ' '),  # Replace colons with space
-        (r'[#\[\]]', ' '),  # Replace hashes and square brackets with a space
-        # Add more patterns here as needed
-    ]
-
-    # Prepare the data for CSV
-    csv_data = []
-    for row in rows:
-        if not row.strip():
-            continue
-        
-        # Extract fields
-        ref = re.search(r'\\ref\s*(.*?)(?=\n|$)', row)
-        tx = re.search(r'\\tx\s*(.*?)(?=\n|$)', row)
-        tf = re.search(r'\\tf\s*(.*?)(?=\n|$)', row)
-        te = re.search(r'\\te\s*(.*?)(?=\n|$)', row)
-        
-        # Skip row if 'tx' is missing or both 'tf' and 'te' are missing
-        if not tx or (not tf and not te):
-            continue
-        
-        # Prepare row data and clean the text
-        row_data = [
-            clean_text(ref.group(1), replacements) if ref else '',
-            clean_text(tx.group(1), replacements) if tx else '',
-            clean_text(tf.group(1), replacements) if tf else '',
-            clean_text(te.group(1), replacements) if te else ''
-        ]
-        
-        csv_data.append(row_data)
-
-    # Write to CSV
+    """Write a csv row for each \\ref record of a Toolbox file that has a \\tx and a \\tf or \\te.
+    The file is read one record at a time. Return the number of rows written."""
+    count = 0
     with open(output_file, 'w', newline='', encoding='utf-8') as file:
         writer = csv.writer(file)
         writer.writerow(['Reference', 'Text', 'Translation (French)', 'Translation (English)'])
-        writer.writerows(csv_data)
+        for record in records(parse_file(input_file), record_marker="ref"):
+            # Skip row if 'tx' is missing or both 'tf' and 'te' are missing
+            if "tx" not in record or ("tf" not in record and "te" not in record):
+                continue
+            writer.writerow([clean_text(record.get(marker, '')) for marker in ("ref", "tx", "tf", "te")])
+            count += 1
+    return count
 
 def main():
     parser = argparse.ArgumentParser(
@@ -69,8 +46,8 @@ def main():
     args = parser.parse_args()
     sfm_file = Path(args.sfm)
     csv_file = sfm_file.with_suffix(".csv")
-    convert_sfm_to_csv(sfm_file, csv_file)
-    print(f"Conversion complete. Output saved to {csv_file}")
+    count = convert_sfm_to_csv(sfm_file, csv_file)
+    print(f"Conversion complete. {count} rows saved to {csv_file}")
 
 if __name__ == "__main__":
     main()
\ No newline at end of file
@@ -0,0 +1,185 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""Paired bootstrap significance tests between the experiments in a series.
+
+The test translations of each experiment found by summarize_scores_multi.py are scored
+with corpus_scorer.py, which gives n-gram statistics per verse. Experiments whose test
+references are identical are compared with the best scoring one, or with a baseline.
+The verses are resampled with replacement many times and each experiment is scored on
+every sample by summing the statistics of the sampled verses. All the samples are
+scored at once as a matrix product, so thousands of samples take seconds.
+
+The p-value is that of the paired bootstrap test (Koehn 2004) as computed by sacrebleu:
+the share of the centred absolute sample differences at least as large as the observed difference.
+Confidence intervals are the 2.5 and 97.5 percentiles of the sample scores.
+"""
+import argparse
+import csv
+import datetime as dt
+import hashlib
+import re
+from pathlib import Path
+from typing import Dict, List, Optional, Tuple
+
+import numpy as np
+
+from corpus_scorer import bleu_score, chrf_score, read_lines, sentence_stats
+from experiment_scan import scan_experiments
+
+# SILNLP test files in an experiment folder.
+re_predictions = re.compile(r"test\.trg-predictions(\.detok)?\.txt\.(\d+)$")
+reference_names = ["test.trg.detok.txt", "test.trg.txt"]
+
+score_functions = {"BLEU": bleu_score, "CHRF3": chrf_score}
+
+output_header = [
+    "references", "scorer", "baseline", "experiment", "steps", "score", "ci_low", "ci_high",
+    "baseline_score", "difference", "difference_ci_low", "difference_ci_high", "p_value", "significant",
+]  # fmt: skip
+
+
+def test_files(folder: Path, choice: str = "best") -> Optional[Tuple[Path, Path, int]]:
+    """Return the predictions, reference and steps of an experiment's test set.
+
+    choice is 'best' for the predictions with the fewest steps, since SILNLP keeps the best
+    and last checkpoints, or 'last' for those with the most steps. Detokenized files are used
+    when there are any.
+    """
+    reference = next((folder / name for name in reference_names if (folder / name).is_file()), None)
+    if reference is None:
+        return None
+
+    predictions = {}
+    for file in folder.iterdir():
+        match = re_predictions.match(file.name)
+        if match:
+            steps = int(match.group(2))
+            # Prefer the detokenized file for each checkpoint.
+            if match.group(1) or steps not in predictions:
+                predictions[steps] = file
+    if not predictions:
+        return None
+    steps = min(predictions) if choice == "best" else max(predictions)
+    return predictions[steps], reference, steps
+
+
+def file_hash(file: Path) -> str:
+    with open(file, "rb") as f:
+        return hashlib.sha1(f.read()).hexdigest()
+
+
+def resample_sums(stats: Dict[str, np.ndarray], samples: int, rng: np.random.Generator, chunk_cells: int = 4_000_000):
+    """Return the statistics summed over each bootstrap sample of the sentences, for each system.
+
+    stats maps each system to its per-sentence statistics. All systems use the same samples.
+    """
+    size = len(next(iter(stats.values())))
+    chunk = max(1, chunk_cells // max(size, 1))
+    sums = {system: [] for system in stats}
+    for start in range(0, samples, chunk):
+        count = min(chunk, samples - start)
+        indices = rng.integers(0, size, size=(count, size))
+        # How often each sentence is drawn in each sample.
+        weights = np.bincount((np.arange(count)[:, None] * size + indices).ravel(), minlength=count * size)
+        weights = weights.reshape(count, size).astype(np.float64)
+        for system, system_stats in stats.items():
+            sums[system].append(weights @ system_stats)
+    return {system: np.concatenate(parts) for system, parts in sums.items()}
+
+
+def paired_bootstrap(
+    system: np.ndarray, baseline: np.ndarray, score, samples: int = 1000, seed: int = 12345
+) -> Dict[str, float]:
+    """Compare a system with a baseline, given the per-sentence statistics of each."""
+    rng = np.random.default_rng(seed)
+    sums = resample_sums({"system": system, "baseline": baseline}, samples, rng)
+    system_scores, baseline_scores = score(sums["system"]), score(sums["baseline"])
+    observed = float(score(system.sum(axis=0)) - score(baseline.sum(axis=0)))
+    differences = system_scores - baseline_scores
+    absolute = np.abs(differences)
+    centred = absolute - absolute.mean()
+    return {
+        "score": float(score(system.sum(axis=0))),
+        "ci_low": float(np.percentile(system_scores, 2.5)),
+        "ci_high": float(np.percentile(system_scores, 97.5)),
+        "baseline_score": float(score(baseline.sum(axis=0))),
+        "difference": observed,
+        "difference_ci_low": float(np.percentile(differences, 2.5)),
+        "difference_ci_high": float(np.percentile(differences, 97.5)),
+        "p_value": float(((centred >= abs(observed)).sum() + 1) / (samples + 1)),
+    }
+
+
+def compare_group(
+    experiments: Dict[str, Dict[str, np.ndarray]], baseline: Optional[str], samples: int, alpha: float, seed: int
+) -> List[Dict]:
+    """Compare every experiment in a group that shares its references with the baseline.
+    Without a baseline the experiment with the best chrF3 score is used."""
+    if baseline and baseline not in experiments:
+        baseline = next((name for name in experiments if name.endswith("/" + baseline)), None)
+    if baseline is None:
+        baseline = max(experiments, key=lambda name: float(chrf_score(experiments[name]["CHRF3"].sum(axis=0))))
+
+    rows = []
+    for name, stats in experiments.items():
+        if name == baseline:
+            continue
+        for scorer, score in score_functions.items():
+            result = paired_bootstrap(stats[scorer], experiments[baseline][scorer], score, samples, seed)
+            rows.append({"scorer": scorer, "baseline": baseline, "experiment": name, **result, "significant": result["p_value"] < alpha})
+    return rows
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Test whether the score differences between experiments are significant.")
+    parser.add_argument("folders", nargs="+", type=Path, help="Folders to search for experiments.")
+    parser.add_argument("--baseline", help="The experiment to compare the others with, as series/experiment or experiment. The default is the best in each group.")
+    parser.add_argument("--checkpoint", choices=["best", "last"], default="best", help="Which test predictions of each experiment to use.")
+    parser.add_argument("--samples", type=int, default=1000, help="Number of bootstrap samples.")
+    parser.add_argument("--alpha", type=float, default=0.05, help="Significance level.")
+    parser.add_argument("--seed", type=int, default=12345, help="Seed for the random samples.")
+    parser.add_argument("--output", type=Path, help="Output folder. The default is the results folder used by summarize_scores_multi.py.")
+    parser.add_argument("--workers", type=int, default=16, help="Number of threads for listing folders.")
+    args = parser.parse_args()
+
+    scans, _ = scan_experiments(args.folders, workers=args.workers)
+
+    # Only experiments tested on the same references can be compared.
+    groups: Dict[str, Dict[str, Dict[str, np.ndarray]]] = {}
+    references: Dict[str, Path] = {}
+    steps_used: Dict[str, int] = {}
+    for scan in scans:
+        found = test_files(scan["folder"], args.checkpoint)
+        if not found:
+            continue
+        predictions, reference, steps = found
+        hyps, refs = read_lines(predictions), read_lines(reference)
+        if len(hyps) != len(refs):
+            print(f"Skipping {scan['folder']}: {predictions.name} has {len(hyps)} lines and {reference.name} has {len(refs)}.")
+            continue
+        key = file_hash(reference)
+        references.setdefault(key, reference)
+        name = f"{scan['folder'].parent.name}/{scan['folder'].name}"
+        groups.setdefault(key, {})[name] = sentence_stats(hyps, refs)
+        steps_used[name] = steps
+
+    output_path = args.output if args.output else args.folders[0] / "results"
+    output_path.mkdir(parents=True, exist_ok=True)
+    now = dt.datetime.now()
+    output_file = output_path / f"significance_{now.year}_{now.month}_{now.day}_{now.hour:02}h{now.minute:02}.csv"
+
+    with open(output_file, "w", encoding="utf-8", newline="") as csvfile:
+        writer = csv.DictWriter(csvfile, fieldnames=output_header)
+        writer.writeheader()
+        for key, experiments in groups.items():
+            if len(experiments) < 2:
+                continue
+            print(f"Comparing {len(experiments)} experiments tested on {references[key]}")
+            for row in compare_group(experiments, args.baseline, args.samples, args.alpha, args.seed):
+                writer.writerow({"references": str(references[key]), "steps": steps_used[row["experiment"]], **row})
+
+    print(f"Wrote the significance tests to {output_file}")
+
+
+if __name__ == "__main__":
+    main()
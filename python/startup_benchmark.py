@@ -0,0 +1,80 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""Measure the import time of the tokenizer tools with python -X importtime.
+
+Each module is imported in a fresh interpreter. The total import time and the slowest
+imports are reported. The exit code is 1 if any module takes longer than the budget or
+imports one of the heavy machine learning packages at startup.
+"""
+import argparse
+import re
+import subprocess
+import sys
+from pathlib import Path
+from typing import Dict, List, Tuple
+
+default_modules = ["tokens", "nllbtokenizer"]
+heavy_packages = ["transformers", "torch", "sacremoses", "tokenizers", "datasets"]
+
+# import time:       self [us] |  cumulative | imported package
+re_importtime = re.compile(r"import time:\s+(\d+)\s+\|\s+(\d+)\s+\|(\s*)(\S+)")
+
+
+def import_times(module: str) -> List[Tuple[str, int, int]]:
+    """Return (package, depth, cumulative microseconds) for each import made by importing module."""
+    result = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", f"import {module}"],
+        cwd=Path(__file__).parent,
+        capture_output=True,
+        text=True,
+    )
+    if result.returncode != 0:
+        raise RuntimeError(f"Importing {module} failed:\n{result.stderr[-2000:]}")
+
+    times = []
+    for line in result.stderr.splitlines():
+        match = re_importtime.match(line)
+        if match:
+            depth = (len(match.group(3)) - 1) // 2
+            times.append((match.group(4), depth, int(match.group(2))))
+    return times
+
+
+def summarize(module: str, top_n: int) -> Dict:
+    times = import_times(module)
+    total = next((cumulative for package, depth, cumulative in times if package == module), 0)
+    top_level = [package.split(".")[0] for package, _, _ in times]
+    return {
+        "module": module,
+        "total_ms": total / 1000,
+        "heavy": sorted(set(top_level).intersection(heavy_packages)),
+        "slowest": sorted(((cumulative, package) for package, depth, cumulative in times if depth == 1), reverse=True)[:top_n],
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Check how long the tokenizer tools take to import.")
+    parser.add_argument("modules", nargs="*", default=default_modules, help=f"Modules to import. The default is {default_modules}")
+    parser.add_argument("--max-ms", type=float, default=500, help="Import time budget per module in milliseconds.")
+    parser.add_argument("--top", type=int, default=5, help="Number of slowest imports to list.")
+    args = parser.parse_args()
+
+    failed = False
+    for module in args.modules:
+        summary = summarize(module, args.top)
+        print(f"{module}: {summary['total_ms']:.0f} ms")
+        for cumulative, package in summary["slowest"]:
+            print(f"    {cumulative / 1000:8.1f} ms  {package}")
+
+        if summary["heavy"]:
+            print(f"    {module} imports {', '.join(summary['heavy'])} at startup.")
+            failed = True
+        if summary["total_ms"] > args.max_ms:
+            print(f"    {module} takes longer than the budget of {args.max_ms:.0f} ms to import.")
+            failed = True
+
+    sys.exit(1 if failed else 0)
+
+
+if __name__ == "__main__":
+    main()
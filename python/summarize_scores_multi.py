@@ -1,6 +1,6 @@
 #!/usr/bin/python
 import argparse
-from collections import deque
+from concurrent.futures import ThreadPoolExecutor
 import csv
 import datetime as dt
 #from natsort import natsorted
@@ -9,8 +9,14 @@ from pathlib import Path
 from pprint import pprint
 import re
 import time
-import yaml
+from config_loader import load_config
+from log_scraper import scrape_log
 import boto3
+from column_store import concat_tables, table_length, table_rows
+from experiment_scan import scan_experiments
+from experiment_watch import ExperimentWatcher
+from scores_warehouse import best_by_choices, empty_table, metrics, read_scores_file, select_checkpoints
+from summary_index import SummaryIndex, index_filename, update_index
 
 
 csv.register_dialect("default")
@@ -23,45 +29,6 @@ def read_s3_text_file(bucket, key):
     return data
 
 
-def find_last_in_file(in_file, pattern, last_n=1):
-
-    lastmatches = deque(maxlen=last_n)
-
-    with open(in_file, "r", encoding="utf-8") as in_file:
-        for line in in_file:
-            match = re.match(pattern, line)
-            if match:
-                lastmatches.append(match)
-
-    return lastmatches
-
-
-def find_first_in_file(in_file, pattern, first_n=1):
-
-    matches = []
-
-    with open(in_file, "r", encoding="utf-8") as in_file:
-        for line in in_file:
-            match = re.match(pattern, line)
-            if match:
-                matches.append(match)
-                if len(matches) >= first_n:
-                    return matches
-
-    return matches
-
-
-def helper_function(infile, pattern, first_n=1):
-
-    pattern = re.compile(pattern)
-    result = find_first_in_file(infile, pattern, first_n)
-
-    if result:
-        return result[0].group(1)
-    else:
-        return None
-
-
 def get_data_from_process_log(experiment, data):
     """Useful data from preprocess log:
     trainer_interface.cc(458) LOG(INFO) all chars count=2067370
@@ -87,21 +54,15 @@ def get_data_from_process_log(experiment, data):
     # Get data from the process log if it exists
     preprocess_log = experiment["folder"] / "preprocess.log"
 
-    if preprocess_log.is_file() and preprocess_log.exists():
-
-        re_tokens = re.compile(".*?num_tokens/piece=(\d*\.\d*)")
-        tokens_per_pieces = find_last_in_file(preprocess_log, re_tokens, 1)
-        for tokens_per_piece in tokens_per_pieces:
-            print(tokens_per_piece[0])
-        exit()
-
-        if tokens_per_piece:
-            experiment["tokens per piece"] = tokens_per_piece[0].group(1)
-        else:
-            experiment["tokens per piece"] = "Not found"
-
-        for var, pattern in data.items():
-            experiment[var] = helper_function(preprocess_log, pattern)
+    if preprocess_log.is_file():
+        found = scrape_log(
+            preprocess_log,
+            first=data,
+            last={"tokens per piece": r".*?num_tokens/piece=(\d*\.\d*)"},
+        )
+        experiment["tokens per piece"] = found.get("tokens per piece", "Not found")
+        for var in data:
+            experiment[var] = found.get(var)
 
     return experiment
 
@@ -109,18 +70,11 @@ def get_data_from_process_log(experiment, data):
 def get_data_from_log(experiment, log, patterns):
 
     # Get data from a log file.
-    # Open log file, and search for the named groups in the patterns.
+    # Search for the named groups in the patterns, keeping the last match of each pattern.
     # Add the data found to the experiment with the name as the key.
 
-    if log.is_file() and log.exists():
-        # print(f"Searching in {log}")
-        for pattern in patterns:
-            with open(log, "r", encoding="utf-8") as log_file:
-                for line in log_file:
-                    match = re.match(pattern, line)
-                    if match:
-                        for named_group, data in match.groupdict().items():
-                            experiment[named_group] = data
+    if log.is_file():
+        experiment.update(scrape_log(log, last=patterns))
 
     return experiment
 
@@ -149,29 +103,29 @@ def get_config_data(config_file, fieldnames):
 
     # print(f"Searching in {config_file}")
 
-    with open(config_file, "r") as conf:
-        try:
-            config = yaml.load(conf, Loader=yaml.SafeLoader)
-        except:
-            return None, None
-        # print(f"These are the details in config file {experiment['config']} ")
-        # for k,v in config['data'].items():
-        #    print(f"{k}: {v}")
-        # exit()
-
-        if not "data" in config:
-            # This probably isn't a config.yml file for one of our experiments.
-            # experiment["experiment"] = "Invalid - no data section"
-            return None, None
-        
-        if not "corpus_pairs" in config["data"]:
-            # This probably isn't a config.yml file for one of our experiments.
-            # experiment["experiment"] = "Invalid - no data section"
-            return None, None
-        
-        # Skip experiments with more than one corpus pair.
-        if len(config["data"]["corpus_pairs"]) > 2:
-            return None, None
+    # Only the fields in the report are kept from the config, and unchanged configs are not parsed again.
+    try:
+        config = load_config(config_file, fieldnames)
+    except Exception:
+        return None, None
+    # print(f"These are the details in config file {experiment['config']} ")
+    # for k,v in config['data'].items():
+    #    print(f"{k}: {v}")
+    # exit()
+
+    if not "data" in config:
+        # This probably isn't a config.yml file for one of our experiments.
+        # experiment["experiment"] = "Invalid - no data section"
+        return None, None
+    
+    if not "corpus_pairs" in config["data"]:
+        # This probably isn't a config.yml file for one of our experiments.
+        # experiment["experiment"] = "Invalid - no data section"
+        return None, None
+    
+    # Skip experiments with more than one corpus pair.
+    if len(config["data"]["corpus_pairs"]) > 2:
+        return None, None
 
     for value in [
         "parent",
@@ -317,6 +271,11 @@ def get_fieldnames():
         'Best WER ALL':'Best WER ALL',
         'Best TER ALL':'Best TER ALL',
         'Best spBLEU ALL':'Best spBLEU ALL',
+        'Best BLEU ALL steps':'Best BLEU ALL steps',
+        'Best CHRF3 ALL steps':'Best CHRF3 ALL steps',
+        'Best WER ALL steps':'Best WER ALL steps',
+        'Best TER ALL steps':'Best TER ALL steps',
+        'Best spBLEU ALL steps':'Best spBLEU ALL steps',
         'Last steps':'Last steps',
         'Last BLEU ALL':'Last BLEU ALL',
         'Last CHRF3 ALL':'Last CHRF3 ALL',
@@ -407,40 +366,71 @@ def get_fieldnames():
 
     return all_fieldnames, omit
 
-def folder_contains_config(folder):
-    config = folder / "config.yml"
-    return config.is_file()
-
-
-def folder_contains_scores(folder):
-    scores_files = folder.glob("scores-*.csv")
-    return len([file for file in scores_files]) > 0
+def get_experiment(scan, included_fieldnames, best_by="steps"):
+    """Read the config and scores files of one experiment found by scan_experiments.
 
+    best_by chooses the best checkpoint by fewest steps or by best score, see select_checkpoints.
+    """
 
-def get_complete(folders):
-    complete_experiment_dirs = []
+    if scan["effective_configs"]:
+        experiment, no_pairs = get_config_data(scan["effective_configs"][0], included_fieldnames)
+    else:  # Use the config.yml file
+        experiment, no_pairs = get_config_data(scan["config"], included_fieldnames)
+
+    if not experiment:
+        return None, None
+
+    score_files = scan["scores"]
+    experiment["complete"] = len(score_files) > 0
+
+    if score_files:
+        # Read all the scores files of the experiment into one table and choose the
+        # best and last checkpoint for every metric and book at once.
+        tables = []
+        for score_file in score_files:
+            try:
+                tables.append(read_scores_file(score_file))
+            except (OSError, csv.Error, UnicodeDecodeError) as e:
+                print(f"Can't read the scores in {score_file}: {e}")
+        checkpoints = select_checkpoints(concat_tables(tables) or empty_table(), keys=(), best_by=best_by)
+
+        for row in table_rows(checkpoints):
+            experiment[f"Best {row['scorer']} {row['book']}"] = row["best_score"]
+            experiment[f"Best {row['scorer']} {row['book']} steps"] = row["best_steps"]
+            experiment[f"Last {row['scorer']} {row['book']}"] = row["last_score"]
+        if table_length(checkpoints):
+            # When the best checkpoint is chosen by score it can differ between metrics,
+            # so the best steps are those of the first metric scored on all books.
+            overall = [f"Best {metric} ALL steps" for metric in metrics if f"Best {metric} ALL steps" in experiment]
+            if best_by == "score" and overall:
+                experiment["Best steps"] = experiment[overall[0]]
+            else:
+                experiment["Best steps"] = int(checkpoints["best_steps"].min())
+            experiment["Last steps"] = int(checkpoints["last_steps"].max())
 
-    sub_folders = []
-    for folder in folders:
-        sub_folders.extend([f  for f in folder.glob("*") if f.is_dir()])
-        
-    for sub_folder in sub_folders:
-        if folder_contains_config(sub_folder) and folder_contains_scores(sub_folder):
-            complete_experiment_dirs.append(sub_folder)
+        # if len(scores) > 0:
 
-    return complete_experiment_dirs
+        #     best_steps = min(scores.keys())
+        #     last_steps = max(scores.keys())
+        #     print(scores)
+        #     experiment["complete"] = True
+        #     if "steps best" in included_fieldnames:
+        #         experiment["steps best"] = best_steps
+        #     if "score best" in included_fieldnames or "score max" in included_fieldnames:
+        #         experiment["score best"] = scores[best_steps]["score"]
+        #     if "steps last" in included_fieldnames:
+        #         experiment["steps last"] = last_steps
+        #     if "score last" in included_fieldnames or "score max" in included_fieldnames:
+        #         experiment["score last"] = scores[last_steps]["score"]
 
+        #     # print(best_steps, scores[best_steps] , last_steps, scores[last_steps])
+        #     if "score max" in included_fieldnames:
+        #         experiment["score max"] = max(
+        #             experiment["score best"], experiment["score last"]
+        #         )
 
-def get_incomplete(folders):
-    incomplete_experiment_dirs = []
-    for folder in folders:
-        if folder_contains_config(folder) and not folder_contains_scores(folder):
-            incomplete_experiment_dirs.append(folder)
-    return incomplete_experiment_dirs
-    
-     
+    return experiment, no_pairs
 
-    
 
 def main() -> None:
 
@@ -457,6 +447,17 @@ def main() -> None:
     )
     
     parser.add_argument("--output", type=Path, help="folder for summary csv file.")
+    parser.add_argument("--workers", type=int, default=16, help="Number of threads for listing folders and reading files.")
+    parser.add_argument("--index", type=Path, help=f"Summary index to use. The default is {index_filename} in the output folder.")
+    parser.add_argument("--rebuild", action="store_true", help="Read every experiment again instead of only those that have changed.")
+    parser.add_argument("--watch", action="store_true", help="Keep running and update the summary as experiments change.")
+    parser.add_argument("--interval", type=float, default=60, help="Seconds between checks for changes in watch mode.")
+    parser.add_argument(
+        "--best-by",
+        choices=best_by_choices,
+        default="steps",
+        help="Choose the best checkpoint as the one with the fewest steps, or the one with the best score for each metric.",
+    )
 
     parser.add_argument(
         "-c",
@@ -487,167 +488,70 @@ def main() -> None:
     #Add as a filter argument.
     #patterns = ["FT-*", "BT-*"]
 
-    all_folders = []
-    for folder in folders:
-        all_folders.extend(folder for folder in folder.rglob('*') if folder.is_dir())
-    
-    print(f"Checking {len(all_folders)} folders for scores files.")
+    print(f"Searching {', '.join(str(folder) for folder in folders)} for experiments.")
+    if args.watch:
+        # The watcher's listings of the folders are kept to find the changes later.
+        watcher = ExperimentWatcher(folders, workers=args.workers)
+        experiment_scans, folder_count = watcher.experiments(), len(watcher.listings)
+    else:
+        experiment_scans, folder_count = scan_experiments(folders, workers=args.workers)
+    print(f"Checked {folder_count} folders and found {len(experiment_scans)} experiment configurations.")
+
+    def wanted(scan):
+        return (not args.c or scan["scores"]) and (not args.i or not scan["scores"])
 
+    experiment_scans = [scan for scan in experiment_scans if wanted(scan)]
     if args.c:
-        experiment_paths = get_complete(folders)
-        print(f"Found {len(experiment_paths)} complete experiment folders.")
-    
+        print(f"Found {len(experiment_scans)} complete experiment folders.")
+    elif args.i:
+        print(f"Found {len(experiment_scans)} incomplete experiment folders.")
 
     if args.output:
         output_path = Path(args.output)
     else:
-        output_path = experiment_paths[0] / "results"
+        output_path = folders[0] / "results"
 
     output_path.mkdir(parents=False, exist_ok=True)
 
-    scores_filename_prefix = r"scores-"
-    ext = r".csv"
-
-    re_steps = re.compile("scores-(.*000)\.csv")
-
-    scores_file_pattern = "**/" + scores_filename_prefix + "*" + ext
-    preprocess_log_pattern = "preprocess.log"
-    train_log_pattern = "train.log"
-
     output_filename = f"scores_summary_{now.year}_{now.month}_{now.day}_{now.hour:02}h{now.minute:02}.csv"
     simple_output_filename = f"scores_summary.csv"
     output_file = output_path / output_filename
     missing_files = output_path / "missing_files.txt"
 
-    experiments = []
-    files_missing = []
-    effective_config_count = 0
-    max_pairs = 0
-
-    experiment_configs = []
-
-    for experiment_path in experiment_paths:
-        print(f"Processing {experiment_path}")
-        for config in experiment_path.rglob("config.yml"):
-            if config.is_file():
-                experiment_configs.append(config)
-
-    total_configs = len(experiment_configs)
-
-    # Remove duplicate paths (which can easily occur since multilple paths may be given in the arguments.
-    experiment_configs = list(dict.fromkeys(experiment_configs))
-    print(
-        f"Found {total_configs} configs initially, {len(experiment_configs)} are left after deduplication."
-    )
-
     all_fieldnames, omit = get_fieldnames()
     included_fieldnames = {fieldname  for fieldname in all_fieldnames if fieldname not in omit}
-    column_headers = [column_header for fieldname, column_header in all_fieldnames.items() if fieldname not in omit]
-    
-    print(f"Found {len(experiment_configs)} experiment configuations")
 
-    for experiment_config in experiment_configs[:100]:
-        experiment_folder = experiment_config.parent
-        effective_configs = list(experiment_folder.glob("effective-config-*.yml"))
-        print(f"Found {len(effective_configs)} effective config files in folder {experiment_folder} ")
-        if effective_configs:
-            effective_config_count += 1
-            experiment, no_pairs = get_config_data(effective_configs[0], included_fieldnames)
+    # Only experiments whose config or scores files have changed since the last run are read again.
+    index_file = args.index if args.index else output_path / index_filename
+    with SummaryIndex(index_file) as index:
+        # Experiments read with other settings must be read again.
+        settings = {"fieldnames": sorted(included_fieldnames), "best_by": args.best_by}
+        if args.rebuild or index.settings() != settings:
+            index.remove(index.folders())
+            index.save_settings(settings)
 
-        else:  # Use the config.yml file
-            experiment, no_pairs = get_config_data(experiment_config, included_fieldnames)
+        def read_experiment(scan):
+            return get_experiment(scan, included_fieldnames, args.best_by)
 
-        if not experiment:
-            #print(f"Skipping... {experiment}")
-            continue
+        # Reading the configs and scores files is mostly waiting on the file server, so use threads.
+        with ThreadPoolExecutor(max_workers=args.workers) as executor:
+            parsed = update_index(index, experiment_scans, read_experiment, executor)
+        print(f"Read {parsed} new or changed experiments, {len(experiment_scans) - parsed} were unchanged since the last run.")
+        write_summary(output_file, index, experiment_scans, args)
 
-        max_pairs = max(max_pairs, no_pairs)
+        if args.watch:
+            watch_experiments(watcher, index, read_experiment, wanted, output_file, args)
 
-        score_files = list(experiment["folder"].glob(scores_file_pattern))
-        print(f"Found {len(score_files)} scores files in {experiment_folder}")
 
-        best_and_last = [int(m.group(1)) for score_file in score_files if (m := re_steps.match(score_file.name))]
-        if len(best_and_last) >= 1:
-            best_steps = min(best_and_last)
-            last_steps = max(best_and_last)
-        else:
-            experiment["complete"] = False
-
-        if len(score_files) > 0:
-            experiment["complete"] = True
-            # Arrange scores with the factors that make the greatest difference first.
-            # i.e. The scorer can give any score, some might be in the range 0-1, or 0-100
-            # The length of training (ie. steps) has an impact.
-            # I expect the impact from the book to be the smallest impact usually, if the scoring is over the whole book.
-            # So {scorer: {experiment: {steps : {book: score}, steps: {book: score}} }}
-
-            scores = {}
-            for score_file in score_files:
-                m = re_steps.match(score_file.name)
-                if m:
-                    steps = int(m.group(1))
-                    
-                    if score_file.is_file() and score_file.exists():
-                        with open(score_file, "r", encoding="utf-8") as csvfile:
-                            csvreader = csv.DictReader(csvfile, delimiter=",")
-                            for i, row in enumerate(csvreader,1):
-                                print(i,row)
-                                try :
-                                    all_found = row["book"] == "ALL"
-                                except KeyError:
-                                    score = f"Can't read the BLEU score on row {i} of file {score_file}"
-                                try:
-                                    bleu_found = row["scorer"] == "BLEU"
-                                except KeyError:
-                                    score = f"Can't read the BLEU score on row {i} of file {score_file}"
-
-                                    if all_found:
-                                        if bleu_found:
-                                            try:
-                                                score, _ = row["score"].split("/", 1)   
-                                            except (ValueError, KeyError):
-                                                score = f"Can't read the BLEU score on row {i} of file {score_file}"
-                                                
-                                        else:
-                                            try:
-                                                score = row["score"]
-                                            except (ValueError, KeyError):
-                                                score = f"Can't read the BLEU score on row {i} of file {score_file}"    
-                                            score = row["score"]
-
-                                        if steps == best_steps:
-                                            experiment["Best steps"] = steps
-                                            experiment[f"Best {row['scorer']} {row['book']}"] = score
-                                        
-                                        elif steps == last_steps:
-                                            experiment["Last steps"] = steps
-                                            experiment[f"Last {row['scorer']} {row['book']}"] = score
-                    else:
-                        continue
-                #print(experiment)
-
-            # if len(scores) > 0:
-
-            #     best_steps = min(scores.keys())
-            #     last_steps = max(scores.keys())
-            #     print(scores)
-            #     experiment["complete"] = True
-            #     if "steps best" in included_fieldnames:
-            #         experiment["steps best"] = best_steps
-            #     if "score best" in included_fieldnames or "score max" in included_fieldnames:
-            #         experiment["score best"] = scores[best_steps]["score"]
-            #     if "steps last" in included_fieldnames:
-            #         experiment["steps last"] = last_steps
-            #     if "score last" in included_fieldnames or "score max" in included_fieldnames:
-            #         experiment["score last"] = scores[last_steps]["score"]
-
-            #     # print(best_steps, scores[best_steps] , last_steps, scores[last_steps])
-            #     if "score max" in included_fieldnames:
-            #         experiment["score max"] = max(
-            #             experiment["score best"], experiment["score last"]
-            #         )
-
-        experiments.append(experiment)
+def write_summary(output_file, index, experiment_scans, args):
+    """Write the summary CSV for the experiments from the index."""
+    all_fieldnames, omit = get_fieldnames()
+    column_headers = [column_header for fieldname, column_header in all_fieldnames.items() if fieldname not in omit]
+    results = index.experiments(scan["folder"] for scan in experiment_scans)
+
+    experiments = [experiment for experiment, no_pairs in results]
+    effective_config_count = sum(1 for scan in experiment_scans if scan["effective_configs"])
+    print(f"Found {len(experiments)} experiments, {effective_config_count} with effective config files.")
 
     # If experiments without scores are being reported add them
     # This is useful for finding out the tokens/piece value of a series
@@ -694,6 +598,25 @@ def main() -> None:
     # print(f"The column headers for the csv file are: {output_fields}")
     #print(f"These are the included_fieldnames\n{column_headers}")
 
+
+def watch_experiments(watcher, index, read_experiment, wanted, output_file, args):
+    """Keep the index and the summary up to date as experiments change, until interrupted."""
+    with watcher, ThreadPoolExecutor(max_workers=args.workers) as executor:
+        print(f"Watching for changes using {watcher.method} every {args.interval} seconds. Press Ctrl+C to stop.")
+        try:
+            while True:
+                time.sleep(args.interval)
+                changed, removed = watcher.poll()
+                if removed:
+                    index.remove(removed)
+                parsed = update_index(index, [scan for scan in changed if wanted(scan)], read_experiment, executor)
+                if parsed or removed:
+                    print(f"{dt.datetime.now():%H:%M:%S} Read {parsed} new or changed experiments, {len(removed)} were removed.")
+                    write_summary(output_file, index, [scan for scan in watcher.experiments() if wanted(scan)], args)
+        except KeyboardInterrupt:
+            print("Stopped watching.")
+
+
 if __name__ == "__main__":
     main()
 # Example commandline
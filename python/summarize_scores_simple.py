@@ -2,33 +2,13 @@ import argparse
 from pathlib import Path
 import pandas as pd
 
-# Function to find all scores files in a given directory
-def find_scores_files(directory):
-    scores_files = []
-    for file_path in Path(directory).rglob("scores-*.csv"):
-        scores_files.append(file_path)
-    return scores_files
-
-# Function to add experiment and scores number columns to each scores file
-def add_experiment_info(scores_files):
-    all_data = []  # List to hold all modified DataFrame objects
-    for file_path in scores_files:
-        experiment_name = file_path.parent.name
-        scores_number = file_path.stem.split("-")[-1]
-        try:
-            df = pd.read_csv(file_path)
-            df['experiment'] = experiment_name
-            df['steps'] = scores_number
-            # Further processing if "Scorer" is "Bleu"
-            if 'scorer' in df.columns and 'score' in df.columns:
-                if df['scorer'].str.contains('BLEU').any():  # Check if BLEU scorer exists in the file
-                    if '/' in df.loc[df['scorer'] == 'BLEU', 'score']:
-                        bleu_score = df.loc[df['scorer'] == 'BLEU', 'score'].str.split('/').str[0]
-                        df['score'] = bleu_score
-            all_data.append(df)  # Append modified DataFrame to the list
-        except Exception as e:
-            print(f"Error processing file {file_path}: {e}")
-    return all_data
+from scores_warehouse import scores_frame, update_scores_table
+
+# Function to load the scores of all the experiments in a given directory
+def load_scores(directory):
+    # The scores table is updated with any new or changed scores files.
+    # BLEU scores are already parsed to numbers, the original text is in score_text.
+    return scores_frame(update_scores_table([directory]))
 
 # Function to combine all scores files into one Scores.csv file
 def combine_scores_files(all_data, output_file):
@@ -101,17 +81,17 @@ def main():
     args = parser.parse_args()
 
     series_folder = Path(args.folder)
-    scores_files = find_scores_files(series_folder)
-    
+
     if args.rename:
         rename_files_in_subfolders(series_folder)
-    elif scores_files:
-        print("Found these files:")
-        for scores_file in scores_files:
+        return
+
+    scores = load_scores(series_folder)
+    if len(scores):
+        print(f"Found {len(scores)} scores from {scores['file'].nunique()} files:")
+        for scores_file in scores['file'].unique():
             print(scores_file)
-        all_data = add_experiment_info(scores_files)
-        print(f"Found this data:\n{all_data}")
-        print(f"\n{len(all_data)} lists found.")
+        all_data = [scores]
         #all_data.to_csv(series_folder / "all_scores.csv", index=False)
         #combine_dataframes_to_csv(all_data, series_folder / "Scores.csv")
         #combine_scores_files3(all_data, series_folder / "Scores.csv")
@@ -1,32 +1,14 @@
 from pathlib import Path
 import pandas as pd
 
-# Function to find all scores files in a given directory
-def find_scores_files(directory):
-    scores_files = []
-    for file_path in Path(directory).rglob("scores-*.csv"):
-        scores_files.append(file_path)
-    return scores_files
+from scores_warehouse import scores_frame, update_scores_table
 
-# Function to add experiment and scores number columns to each scores file
-def add_experiment_info(scores_files):
-    all_data = []  # List to hold all modified DataFrame objects
-    for file_path in scores_files:
-        experiment_name = file_path.parent.name
-        scores_number = file_path.stem.split("-")[-1]
-        try:
-            df = pd.read_csv(file_path)
-            df['Experiment'] = experiment_name
-            df['Steps'] = scores_number
-            # Further processing if "Scorer" is "Bleu"
-            if 'Scorer' in df.columns and 'Score' in df.columns:
-                if df['Scorer'].str.contains('BLEU').any():  # Check if BLEU scorer exists in the file
-                    bleu_score = df.loc[df['Scorer'] == 'BLEU', 'Score'].str.split('/').str[0]
-                    df['Score'] = bleu_score
-            all_data.append(df)  # Append modified DataFrame to the list
-        except Exception as e:
-            print(f"Error processing file {file_path}: {e}")
-    return all_data
+# Function to load the scores of all the experiments in a given directory
+def load_scores(directory):
+    # The scores table is updated with any new or changed scores files.
+    # BLEU scores are already parsed to numbers, the original text is in score_text.
+    scores = scores_frame(update_scores_table([directory]))
+    return scores.rename(columns={'experiment': 'Experiment', 'steps': 'Steps', 'score': 'Score'})
 
 # Function to combine all scores files into one Scores.csv file
 def combine_scores_files(all_data, output_file):
@@ -43,8 +25,7 @@ def combine_scores_files(all_data, output_file):
 # Main function to execute the process
 def main():
     series_folder = Path("path/to/Series")  # Update with the path to your Series folder
-    scores_files = find_scores_files(series_folder)
-    all_data = add_experiment_info(scores_files)
+    all_data = [load_scores(series_folder)]
     combine_scores_files(all_data, series_folder / "Scores.csv")
 
 if __name__ == "__main__":
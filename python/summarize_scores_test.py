@@ -1,6 +1,5 @@
 #!/usr/bin/python
 import argparse
-from collections import deque
 import csv
 import datetime as dt
 
@@ -10,7 +9,10 @@ from pathlib import Path
 from pprint import pprint
 import re
 import time
-import yaml
+from config_loader import load_config
+from column_store import concat_tables, table_rows
+from log_scraper import scrape_log
+from scores_warehouse import read_scores_file, select, select_checkpoints
 import boto3
 
 TMP = Path("E:\Work\TMP")
@@ -23,45 +25,6 @@ def read_s3_text_file(bucket, key):
     data = response['Body'].read().decode('utf-8')  # decoding the bytes to string
     return data
 
-def find_last_in_file(in_file, pattern, last_n=1):
-
-    lastmatches = deque(maxlen=last_n)
-
-    with open(in_file, "r", encoding="utf-8") as in_file:
-        for line in in_file:
-            match = re.match(pattern, line)
-            if match:
-                lastmatches.append(match)
-
-    return lastmatches
-
-
-def find_first_in_file(in_file, pattern, first_n=1):
-
-    matches = []
-
-    with open(in_file, "r", encoding="utf-8") as in_file:
-        for line in in_file:
-            match = re.match(pattern, line)
-            if match:
-                matches.append(match)
-                if len(matches) >= first_n:
-                    return matches
-
-    return matches
-
-
-def helper_function(infile, pattern, first_n=1):
-
-    pattern = re.compile(pattern)
-    result = find_first_in_file(infile, pattern, first_n)
-
-    if result:
-        return result[0].group(1)
-    else:
-        return None
-
-
 def get_data_from_process_log(experiment, data):
     """Useful data from preprocess log:
     trainer_interface.cc(458) LOG(INFO) all chars count=2067370
@@ -87,21 +50,15 @@ def get_data_from_process_log(experiment, data):
     # Get data from the process log if it exists
     preprocess_log = experiment["folder"] / "preprocess.log"
 
-    if preprocess_log.is_file() and preprocess_log.exists():
-
-        re_tokens = re.compile(".*?num_tokens/piece=(\d*\.\d*)")
-        tokens_per_pieces = find_last_in_file(preprocess_log, re_tokens, 1)
-        for tokens_per_piece in tokens_per_pieces:
-            print(tokens_per_piece[0])
-        exit()
-
-        if tokens_per_piece:
-            experiment["tokens per piece"] = tokens_per_piece[0].group(1)
-        else:
-            experiment["tokens per piece"] = "Not found"
-
-        for var, pattern in data.items():
-            experiment[var] = helper_function(preprocess_log, pattern)
+    if preprocess_log.is_file():
+        found = scrape_log(
+            preprocess_log,
+            first=data,
+            last={"tokens per piece": r".*?num_tokens/piece=(\d*\.\d*)"},
+        )
+        experiment["tokens per piece"] = found.get("tokens per piece", "Not found")
+        for var in data:
+            experiment[var] = found.get(var)
 
     return experiment
 
@@ -109,18 +66,11 @@ def get_data_from_process_log(experiment, data):
 def get_data_from_log(experiment, log, patterns):
 
     # Get data from a log file.
-    # Open log file, and search for the named groups in the patterns.
+    # Search for the named groups in the patterns, keeping the last match of each pattern.
     # Add the data found to the experiment with the name as the key.
 
-    if log.is_file() and log.exists():
-        # print(f"Searching in {log}")
-        for pattern in patterns:
-            with open(log, "r", encoding="utf-8") as log_file:
-                for line in log_file:
-                    match = re.match(pattern, line)
-                    if match:
-                        for named_group, data in match.groupdict().items():
-                            experiment[named_group] = data
+    if log.is_file():
+        experiment.update(scrape_log(log, last=patterns))
 
     return experiment
 
@@ -149,20 +99,20 @@ def get_config_data(config_file, fieldnames):
 
     # print(f"Searching in {config_file}")
 
-    with open(config_file, "r") as conf:
-        try:
-            config = yaml.load(conf, Loader=yaml.SafeLoader)
-        except:
-            return None, None
-        # print(f"These are the details in config file {experiment['config']} ")
-        # for k,v in config['data'].items():
-        #    print(f"{k}: {v}")
-        # exit()
-
-        if not "data" in config:
-            # This probably isn't a config.yml file for one of our experiments.
-            # experiment["experiment"] = "Invalid - no data section"
-            return None, None
+    # Only the fields in the report are kept from the config, and unchanged configs are not parsed again.
+    try:
+        config = load_config(config_file, fieldnames)
+    except Exception:
+        return None, None
+    # print(f"These are the details in config file {experiment['config']} ")
+    # for k,v in config['data'].items():
+    #    print(f"{k}: {v}")
+    # exit()
+
+    if not "data" in config:
+        # This probably isn't a config.yml file for one of our experiments.
+        # experiment["experiment"] = "Invalid - no data section"
+        return None, None
 
     #    pairs = config["data"]["corpus_pairs"]
     #    for i, pair in enumerate(pairs):
@@ -593,64 +543,23 @@ def main() -> None:
             ]
             experiment = get_data_from_log(experiment, training_log, training_patterns)
 
-        score_files = list(experiment["folder"].glob(scores_file_pattern))
-
-        best_and_last = [
-            int(m.group(1))
-            for score_file in score_files
-            if (m := re_steps.match(score_file.name))
+        score_files = [
+            score_file
+            for score_file in experiment["folder"].glob(scores_file_pattern)
+            if re_steps.match(score_file.name)
         ]
-        if len(best_and_last) >= 1:
-            best_steps = min(best_and_last)
-            last_steps = max(best_and_last)
-        else:
-            experiment["complete"] = False
-
-        if len(score_files) > 0:
-            experiment["complete"] = True
-            # Arrange scores with the factors that make the greatest difference first.
-            # i.e. The scorer can give any score, some might be in the range 0-1, or 0-100
-            # The length of training (ie. steps) has an impact.
-            # I expect the impact from the book to be the smallest impact usually, if the scoring is over the whole book.
-            # So {scorer: {experiment: {steps : {book: score}, steps: {book: score}} }}
-
-            scores = {}
-            for score_file in score_files:
-                m = re_steps.match(score_file.name)
-                if m:
-                    steps = int(m.group(1))
-
-                    if score_file.is_file() and score_file.exists():
-                        with open(score_file, "r", encoding="utf-8") as csvfile:
-                            csvreader = csv.DictReader(csvfile, delimiter=",")
-                            for i, row in enumerate(csvreader, 1):
-                                # print(i,row)
-
-                                if row["book"] == "ALL":
-                                    if row["scorer"] == "BLEU":
-                                        try:
-                                            score, _ = row["score"].split("/", 1)
-                                        except ValueError:
-                                            print(
-                                                f"Can't read the BLEU score on row {i} of file {score_file}"
-                                            )
-                                            exit()
-                                    else:
-                                        score = row["score"]
-
-                                    if steps == best_steps:
-                                        experiment["Best steps"] = steps
-                                        experiment[
-                                            f"Best {row['scorer']} {row['book']}"
-                                        ] = score
-
-                                    elif steps == last_steps:
-                                        experiment["Last steps"] = steps
-                                        experiment[
-                                            f"Last {row['scorer']} {row['book']}"
-                                        ] = score
-                    else:
-                        continue
+        experiment["complete"] = len(score_files) > 0
+
+        if score_files:
+            # The scores files are read into one typed table. Run fix_scores.py on
+            # files that can't be read.
+            table = concat_tables([read_scores_file(score_file) for score_file in score_files])
+            checkpoints = select(select_checkpoints(table, keys=()), book="ALL")
+            for row in table_rows(checkpoints):
+                experiment["Best steps"] = row["best_steps"]
+                experiment[f"Best {row['scorer']} {row['book']}"] = row["best_score"]
+                experiment["Last steps"] = row["last_steps"]
+                experiment[f"Last {row['scorer']} {row['book']}"] = row["last_score"]
 
         experiments.append(experiment)
 
@@ -0,0 +1,156 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""Persistent index of experiment summaries for summarize_scores_multi.py.
+
+The index is a SQLite database with one row per experiment folder. Each row holds the
+experiment data parsed from its config and scores files, and the modification time and
+size of those source files. On later runs only experiments whose source files have
+changed are parsed again. The summary CSV is written from the index.
+"""
+import json
+import os
+import sqlite3
+from pathlib import Path
+from typing import Dict, Iterable, List, Optional, Tuple
+
+index_filename = "scores_summary_index.sqlite"
+
+schema = """
+CREATE TABLE IF NOT EXISTS experiments (
+    folder TEXT PRIMARY KEY,
+    experiment TEXT,
+    no_pairs INTEGER,
+    updated REAL
+);
+CREATE TABLE IF NOT EXISTS sources (
+    folder TEXT,
+    path TEXT,
+    mtime_ns INTEGER,
+    size INTEGER,
+    PRIMARY KEY (folder, path)
+);
+CREATE TABLE IF NOT EXISTS settings (
+    key TEXT PRIMARY KEY,
+    value TEXT
+);
+"""
+
+Signature = Dict[str, Tuple[int, int]]
+
+
+def source_files(scan: Dict) -> List[Path]:
+    """The files an experiment summary is read from."""
+    files = [scan["config"]] + list(scan["effective_configs"]) + list(scan["scores"])
+    return [file for file in files if file]
+
+
+def source_signature(scan: Dict) -> Signature:
+    signature = {}
+    for file in source_files(scan):
+        try:
+            stat = os.stat(file)
+        except OSError:
+            continue
+        signature[str(file)] = (stat.st_mtime_ns, stat.st_size)
+    return signature
+
+
+class SummaryIndex:
+    def __init__(self, db_file: Path):
+        self.db_file = Path(db_file)
+        self.db_file.parent.mkdir(parents=True, exist_ok=True)
+        self.connection = sqlite3.connect(str(self.db_file))
+        self.connection.executescript(schema)
+
+    def close(self) -> None:
+        self.connection.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+    def signatures(self) -> Dict[str, Signature]:
+        signatures: Dict[str, Signature] = {}
+        for folder, path, mtime_ns, size in self.connection.execute("SELECT folder, path, mtime_ns, size FROM sources"):
+            signatures.setdefault(folder, {})[path] = (mtime_ns, size)
+        return signatures
+
+    def get(self, folder) -> Tuple[Optional[Dict], Optional[int]]:
+        row = self.connection.execute(
+            "SELECT experiment, no_pairs FROM experiments WHERE folder = ?", (str(folder),)
+        ).fetchone()
+        if row is None:
+            return None, None
+        experiment = json.loads(row[0]) if row[0] else None
+        return experiment, row[1]
+
+    def put(self, folder, experiment: Optional[Dict], no_pairs: Optional[int], signature: Signature) -> None:
+        """Store an experiment. Folders whose configs can't be used are stored with no experiment,
+        so that they are not parsed again until they change."""
+        folder = str(folder)
+        with self.connection:
+            self.connection.execute(
+                "INSERT OR REPLACE INTO experiments (folder, experiment, no_pairs, updated) VALUES (?, ?, ?, julianday('now'))",
+                (folder, json.dumps(experiment, default=str) if experiment else None, no_pairs),
+            )
+            self.connection.execute("DELETE FROM sources WHERE folder = ?", (folder,))
+            self.connection.executemany(
+                "INSERT INTO sources (folder, path, mtime_ns, size) VALUES (?, ?, ?, ?)",
+                [(folder, path, mtime_ns, size) for path, (mtime_ns, size) in signature.items()],
+            )
+
+    def remove(self, folders: Iterable) -> None:
+        folders = [(str(folder),) for folder in folders]
+        with self.connection:
+            self.connection.executemany("DELETE FROM experiments WHERE folder = ?", folders)
+            self.connection.executemany("DELETE FROM sources WHERE folder = ?", folders)
+
+    def settings(self) -> Dict:
+        """The settings the stored experiments were read with."""
+        return {key: json.loads(value) for key, value in self.connection.execute("SELECT key, value FROM settings")}
+
+    def save_settings(self, settings: Dict) -> None:
+        with self.connection:
+            self.connection.execute("DELETE FROM settings")
+            self.connection.executemany(
+                "INSERT INTO settings (key, value) VALUES (?, ?)", [(key, json.dumps(value)) for key, value in settings.items()]
+            )
+
+    def folders(self) -> List[str]:
+        return [folder for (folder,) in self.connection.execute("SELECT folder FROM experiments")]
+
+    def experiments(self, folders: Optional[Iterable] = None) -> List[Tuple[Dict, int]]:
+        """Return the stored experiments, for the given folders only if they are given."""
+        wanted = None if folders is None else {str(folder) for folder in folders}
+        experiments = []
+        for folder, experiment, no_pairs in self.connection.execute(
+            "SELECT folder, experiment, no_pairs FROM experiments ORDER BY folder"
+        ):
+            if experiment and (wanted is None or folder in wanted):
+                experiments.append((json.loads(experiment), no_pairs))
+        return experiments
+
+
+def update_index(index: SummaryIndex, scans: List[Dict], read_experiment, executor) -> int:
+    """Parse the experiments whose source files changed since they were indexed.
+
+    read_experiment(scan) returns (experiment, no_pairs). Returns the number of experiments parsed.
+    """
+    known = index.signatures()
+
+    def read_if_changed(scan):
+        signature = source_signature(scan)
+        if known.get(str(scan["folder"])) == signature:
+            return None
+        return scan, signature, read_experiment(scan)
+
+    parsed = 0
+    for result in executor.map(read_if_changed, scans):
+        if result is None:
+            continue
+        scan, signature, (experiment, no_pairs) = result
+        index.put(scan["folder"], experiment, no_pairs, signature)
+        parsed += 1
+    return parsed
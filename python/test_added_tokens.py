@@ -0,0 +1,89 @@
+# -*- coding: utf-8 -*-
+"""Check that AddedTokenProcessor gives the same output as the original prep and post_process."""
+import unittest
+
+from added_tokens import AddedTokenProcessor, space, special_token, start_of_word
+
+
+# The original implementations.
+
+
+def legacy_prep(line, unknown_code_points):
+    prepped_line = ""
+    for char in line:
+        if ord(char) in unknown_code_points:
+            prepped_line += char + special_token
+        else:
+            prepped_line += char
+    return prepped_line
+
+
+def legacy_post_process(tokenized_line, unknown_code_points):
+    index_to_remove = []
+    for index in range(len(tokenized_line)):
+        if tokenized_line[index] == special_token and tokenized_line[index - 1] == start_of_word:
+            index_to_remove.append(index - 1)
+            index_to_remove.append(index)
+
+    post_processed_line = [token for index, token in enumerate(tokenized_line) if index not in index_to_remove]
+
+    for index, token in enumerate(post_processed_line):
+        if len(token) == 2 and token[0] == space and ord(token[1]) in unknown_code_points:
+            post_processed_line[index] = start_of_word + token[1]
+
+    return post_processed_line
+
+
+code_points = {ord("ꞌ"), ord("ɓ"), ord("ŋ")}
+lines = [
+    "",
+    "plain text",
+    "ɓaŋ ꞌa",
+    "ŋŋŋ",
+    "line with\na break ɓ",
+    "ꞌ at the start and the end ꞌ",
+]
+
+
+class TestAddedTokenProcessor(unittest.TestCase):
+    def setUp(self):
+        self.processor = AddedTokenProcessor(code_points)
+
+    def test_prep(self):
+        for line in lines:
+            self.assertEqual(self.processor.prep(line), legacy_prep(line, code_points))
+
+    def test_prep_lines(self):
+        self.assertEqual(self.processor.prep_lines(lines), [legacy_prep(line, code_points) for line in lines])
+
+    def check_post_process(self, tokens):
+        self.assertEqual(self.processor.post_process(tokens), legacy_post_process(tokens, code_points))
+
+    def test_post_process_prepped_characters(self):
+        for line in lines:
+            self.check_post_process(list(self.processor.prep(line)))
+
+    def test_post_process_pairs(self):
+        self.check_post_process(["▁a", start_of_word, special_token, "▁b", start_of_word, special_token])
+        self.check_post_process([start_of_word, special_token, start_of_word, special_token])
+
+    def test_post_process_index_minus_one(self):
+        # A special token at the start is checked against the last token, as tokens[-1].
+        self.check_post_process([special_token, "▁a", start_of_word])
+        self.check_post_process([special_token, "▁a", "b"])
+        self.check_post_process([special_token])
+
+    def test_post_process_space_tokens(self):
+        self.check_post_process([" ɓ", "a", " ŋ"])
+        # Code points that weren't added are left alone.
+        self.check_post_process([" x", " é", "  ", " ꞌꞌ"])
+
+    def test_post_process_lines(self):
+        token_lists = [list(self.processor.prep(line)) for line in lines]
+        self.assertEqual(
+            self.processor.post_process_lines(token_lists), [legacy_post_process(tokens, code_points) for tokens in token_lists]
+        )
+
+
+if __name__ == "__main__":
+    unittest.main()
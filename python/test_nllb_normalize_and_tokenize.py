@@ -16,6 +16,7 @@ from datasets import (get_dataset_config_names, get_dataset_split_names, load_da
 from sacremoses import MosesPunctNormalizer
 from tqdm import tqdm
 from transformers import AutoModelForSeq2SeqLM, AutoTokenizer
+from added_tokens import AddedTokenProcessor
 
 # Set the paths to 
 root = Path("C:/Gutenberg")
@@ -103,38 +104,19 @@ def flatten(l):
 #Tokenize the string.
 #Strip out sequences of _ and \ufffc tokens from results.
 
+added_token_processor = AddedTokenProcessor(unknown_code_points)
+
+
 def prep(line):
     # Find every added character and add "\ufffc" after it.
-    special_token = u"\uFFFC"
-
-    prepped_line = ""
-    for char in line:
-        if ord(char) in unknown_code_points:
-            prepped_line += char + special_token
-        else :
-            prepped_line += char
-    return prepped_line
+    return added_token_processor.prep(line)
 
 
 def post_process(tokenized_line):
-    # Remove the '▁', '￼' pair from the tokenized line.
+    # Remove the '▁', '￼' pairs from the tokenized line.
     # Tokens that consist of a space and an added token only
     # are replaced with a start_of_word marker and the added token.
-    
-    index_to_remove = []
-    for index in range(len(tokenized_line)):
-
-        if tokenized_line[index] == special_token and tokenized_line[index-1] == start_of_word:
-            index_to_remove.append(index-1)
-            index_to_remove.append(index)
-    
-    post_processed_line = [token for index, token in enumerate(tokenized_line) if index not in index_to_remove]
-        
-    for index, token in enumerate(post_processed_line):
-        if len(token) == 2 and token[0] == space and ord(token[1]) in unknown_code_points:
-            post_processed_line[index] = start_of_word + token[1]
-
-    return post_processed_line
+    return added_token_processor.post_process(tokenized_line)
 
 
 def get_lines(files, line_numbers):
@@ -172,13 +154,14 @@ def tokenize(input_file):
 
             print(f"Tokenizing: {input_file.name}")
 
-            file = load_corpus(input_file)
-            tokenized_lines = [" ".join(post_process(tokenizer.tokenize(mpn.normalize(prep(line))))) + "\n" for line in file]   
+            prepped_lines = added_token_processor.prep_lines(load_corpus(input_file))
+            token_lists = added_token_processor.post_process_lines(tokenizer.tokenize(mpn.normalize(line)) for line in prepped_lines)
+            tokenized_lines = [" ".join(tokens) + "\n" for tokens in token_lists]
 
             #write the tokenized lines to the file.
             with open(tokenized_file, "w", encoding='utf-8') as tok_file:
                 tok_file.writelines(tokenized_lines)
-        elif :
+        else:
             print(f"{tokenized_file.name}")
 
     return tokenized_file
@@ -221,8 +204,7 @@ def simple_tokenize(input_file):
     unknown_token = '<unk>'
     unknowns = Counter()
     tokenized_file = tokenized_path /  get_tokenized_filename(input_file)
-    file = load_corpus(input_file)
-    norm_lines = [mpn.normalize(prep(line)) for line in file]
+    norm_lines = [mpn.normalize(line) for line in added_token_processor.prep_lines(load_corpus(input_file))]
 
     tokenized_lines = []
     for i, norm_line in enumerate(norm_lines):
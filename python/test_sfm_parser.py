@@ -0,0 +1,31 @@
+# -*- coding: utf-8 -*-
+"""Check the verse text that sfm_parser extracts from USFM."""
+import unittest
+
+from sfm_parser import parse_lines, verses
+
+
+def verse_texts(lines):
+    return [text for _, _, _, text in verses(parse_lines(lines))]
+
+
+class VersesTest(unittest.TestCase):
+    def test_footnote_before_punctuation(self):
+        lines = ["\\id GEN", "\\c 1", "\\p", "\\v 1 In the beginning\\f + \\ft a note\\f*, God created."]
+        self.assertEqual(verse_texts(lines), ["In the beginning, God created."])
+
+    def test_character_marker_inside_word(self):
+        lines = ["\\id GEN", "\\c 1", "\\p", "\\v 1 The \\nd LORD\\nd*'s word."]
+        self.assertEqual(verse_texts(lines), ["The LORD's word."])
+
+    def test_lines_are_separated(self):
+        lines = ["\\id PSA", "\\c 1", "\\q1", "\\v 1 Blessed is the man", "\\q2 who walks", "not in the counsel", "\\v 2 But"]
+        self.assertEqual(verse_texts(lines), ["Blessed is the man who walks not in the counsel", "But"])
+
+    def test_headings_are_left_out(self):
+        lines = ["\\id GEN", "\\c 1", "\\p", "\\v 1 In the beginning.", "\\s1 A heading", "\\p", "\\v 2 And"]
+        self.assertEqual(verse_texts(lines), ["In the beginning.", "And"])
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,58 @@
+# -*- coding: utf-8 -*-
+"""Check that the paired bootstrap test gives the scores and p-values of sacrebleu."""
+import os
+import random
+import unittest
+from unittest import mock
+
+from corpus_scorer import sentence_stats
+from significance import paired_bootstrap, score_functions
+
+try:
+    from sacrebleu.metrics import BLEU, CHRF
+    from sacrebleu.significance import PairedTest
+except ImportError:
+    PairedTest = None
+
+words = "the a man woman dog cat saw walked to house river and of in".split()
+
+
+def make_corpus(sentences=60, seed=1):
+    """References and two systems that are close enough for a p-value well above the minimum."""
+    rng = random.Random(seed)
+    refs = [" ".join(rng.choice(words) for _ in range(rng.randint(4, 12))) for _ in range(sentences)]
+
+    def noisy(line, rate):
+        return " ".join(word if rng.random() > rate else rng.choice(words) for word in line.split())
+
+    return refs, [noisy(ref, 0.4) for ref in refs], [noisy(ref, 0.38) for ref in refs]
+
+
+class PairedBootstrapTest(unittest.TestCase):
+    @unittest.skipIf(PairedTest is None, "sacrebleu isn't installed")
+    def test_same_as_sacrebleu(self):
+        refs, baseline, system = make_corpus()
+        metrics = {"BLEU": BLEU(), "CHRF3": CHRF(beta=3)}
+        with mock.patch.dict(os.environ, {"SACREBLEU_SEED": "12345"}):
+            test = PairedTest([("baseline", baseline), ("system", system)], metrics, [refs], test_type="bs", n_samples=1000)
+            _, results = test()
+
+        baseline_stats, system_stats = sentence_stats(baseline, refs), sentence_stats(system, refs)
+        for scorer, score in score_functions.items():
+            expected = results["chrF3" if scorer == "CHRF3" else scorer][1]
+            result = paired_bootstrap(system_stats[scorer], baseline_stats[scorer], score, samples=1000, seed=12345)
+            self.assertAlmostEqual(result["score"], expected.score, places=6)
+            self.assertGreater(result["p_value"], 0.05)
+            self.assertAlmostEqual(result["p_value"], expected.p_value, places=9)
+
+    def test_ties_count_against_significance(self):
+        refs, baseline, _ = make_corpus()
+        stats = sentence_stats(baseline, refs)
+        for scorer, score in score_functions.items():
+            result = paired_bootstrap(stats[scorer], stats[scorer], score, samples=100)
+            self.assertEqual(result["difference"], 0.0)
+            self.assertEqual(result["p_value"], 1.0)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,109 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""Streaming tokenization statistics for extracts.
+
+TokenStats is updated one line at a time while a file is tokenized and keeps only
+running totals, per book and for the whole file. The results are saved with
+column_store as one row per file and book, with book 'ALL' for the whole file.
+"""
+import csv
+from functools import lru_cache
+from pathlib import Path
+from typing import Dict, List, Optional, Sequence
+
+import numpy as np
+
+from column_store import concat_tables, save_table, table_rows
+
+unk_token = "<unk>"
+start_of_word = "▁"
+
+# Upper bounds of the tokens per line histogram bins. The last bin holds longer lines.
+length_bins = np.array([0, 8, 16, 32, 64, 128, 256, 512])
+length_columns = [f"lines_up_to_{bound}_tokens" for bound in length_bins] + [f"lines_over_{length_bins[-1]}_tokens"]
+
+count_columns = ["lines", "empty_lines", "words", "chars", "tokens", "unknowns"]
+
+
+@lru_cache(maxsize=4)
+def get_books(vref_file: Path) -> List[str]:
+    """Return the book of each line of vref.txt, which are the lines of an extract."""
+    with open(vref_file, "r", encoding="utf-8") as vref_f:
+        return [line.split(" ", 1)[0] for line in vref_f.read().splitlines()]
+
+
+class TokenStats:
+    def __init__(self, file_name: str, books: Optional[Sequence[str]] = None):
+        self.file_name = file_name
+        self.books = books
+        self.line_number = 0
+        self.counts: Dict[str, np.ndarray] = {}
+        self.histograms: Dict[str, np.ndarray] = {}
+
+    def __getstate__(self):
+        # The book list is the same for every file, so don't send it back from worker processes.
+        state = self.__dict__.copy()
+        state["books"] = None
+        return state
+
+    def _add(self, key: str, counts: np.ndarray, length_bin: int) -> None:
+        if key not in self.counts:
+            self.counts[key] = np.zeros(len(count_columns), dtype=np.int64)
+            self.histograms[key] = np.zeros(len(length_columns), dtype=np.int64)
+        self.counts[key] += counts
+        self.histograms[key][length_bin] += 1
+
+    def add_line(self, line: str, tokens: Sequence[str]) -> None:
+        book = self.books[self.line_number] if self.books and self.line_number < len(self.books) else None
+        self.line_number += 1
+
+        # Empty lines are verses missing from the extract, they are counted but don't affect the ratios.
+        if not line:
+            counts = np.array([1, 1, 0, 0, 0, 0])
+            self._add("ALL", counts, 0)
+            if book:
+                self._add(book, counts, 0)
+            return
+
+        words = line.split()
+        counts = np.array(
+            [1, 0, len(words), sum(len(word) for word in words), len(tokens), sum(1 for token in tokens if token == unk_token)]
+        )
+        length_bin = int(np.searchsorted(length_bins, len(tokens)))
+        self._add("ALL", counts, length_bin)
+        if book:
+            self._add(book, counts, length_bin)
+
+    def table(self) -> Dict[str, np.ndarray]:
+        keys = list(self.counts)
+        counts = np.array([self.counts[key] for key in keys]).reshape(-1, len(count_columns))
+        histograms = np.array([self.histograms[key] for key in keys]).reshape(-1, len(length_columns))
+
+        table = {"file": np.array([self.file_name] * len(keys), dtype=str), "book": np.array(keys, dtype=str)}
+        for column, values in zip(count_columns, counts.T):
+            table[column] = values
+
+        with np.errstate(divide="ignore", invalid="ignore"):
+            table["tokens_per_word"] = np.where(table["words"] > 0, table["tokens"] / table["words"], np.nan)
+            table["chars_per_token"] = np.where(table["tokens"] > 0, table["chars"] / table["tokens"], np.nan)
+            table["unk_rate"] = np.where(table["tokens"] > 0, table["unknowns"] / table["tokens"], np.nan)
+
+        for column, values in zip(length_columns, histograms.T):
+            table[column] = values
+        return table
+
+
+def write_token_stats(stats_file: Path, all_stats: Sequence[TokenStats]) -> Path:
+    """Save the statistics for many files in one table."""
+    table = concat_tables([stats.table() for stats in all_stats])
+    save_table(stats_file, table)
+    return stats_file
+
+
+def write_token_stats_csv(csv_file: Path, all_stats: Sequence[TokenStats]) -> Path:
+    table = concat_tables([stats.table() for stats in all_stats])
+    with open(csv_file, "w", encoding="utf-8", newline="") as out:
+        writer = csv.DictWriter(out, fieldnames=list(table))
+        writer.writeheader()
+        writer.writerows(table_rows(table))
+    return csv_file
@@ -1,10 +1,9 @@
 import csv
 from collections import Counter
+from functools import lru_cache
 import multiprocessing as mp
 from pathlib import Path
 import re
-from sacremoses import MosesPunctNormalizer
-from transformers import AutoModelForSeq2SeqLM, AutoTokenizer
 from tqdm import tqdm
 from typing import IO, Iterable, Iterator, List, Optional, Tuple, cast, Sequence
 from unicodedata import name
@@ -15,8 +14,17 @@ tokenized_path = Path('C:/Gutenberg/MT/experiments/HuggingFace/NLLB_BT-English/t
 report_path = Path('C:/Gutenberg/MT/experiments/HuggingFace/NLLB_BT-English/charfreq')
 unknowns_summary  = "unknown_tokens.csv"
 unknowns_report   = "unknown_token_by_file.csv"
-mpn = MosesPunctNormalizer()
-mpn.substitutions = [(re.compile(r), sub) for r, sub in mpn.substitutions]
+
+
+@lru_cache(maxsize=None)
+def get_punct_normalizer():
+    # sacremoses is slow to import and only needed once a file is read.
+    from sacremoses import MosesPunctNormalizer
+
+    mpn = MosesPunctNormalizer()
+    mpn.substitutions = [(re.compile(r), sub) for r, sub in mpn.substitutions]
+    return mpn
+
 
 def char_name(char):
 
@@ -38,6 +46,7 @@ def char_name(char):
 def count_unknows(detok_file):
     
     unknowns = Counter()
+    mpn = get_punct_normalizer()
     detok_lines = [mpn.normalize(line) for line in load_corpus(detok_file)]
     tok_file = tokenized_path /  get_simple_tokenized_filename(detok_file)
     if tok_file.is_file():
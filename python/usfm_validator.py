@@ -0,0 +1,426 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""Validate the USFM of every book of every Paratext project in a folder.
+
+Each project folder in the projects root is searched for .sfm and .usfm files, and the
+files are parsed with sfm_parser in a pool of processes. The problems reported are:
+    encoding  bytes that aren't UTF-8
+    id        a missing or repeated \\id, or one for a different book than expected
+    marker    unknown markers, end markers without a start and notes or character
+              markers that aren't closed before the end of the paragraph
+    chapter   missing, repeated, out of order or invalid chapter numbers
+    verse     missing, repeated or invalid verse numbers
+    io        files that can't be read
+    parse     files that the validator failed on
+With a vref.txt file the chapters and verses of each book are also checked against it,
+so that missing chapters and verses, and those that aren't in the versification, are found.
+
+The problems found in each file are cached with its size, modification time and hash.
+A file that is unchanged is not read again, and one that has been touched or copied
+but not changed is read and hashed but not parsed again. All the problems are written
+to one .json or .csv report.
+"""
+import argparse
+import csv
+import hashlib
+import json
+import os
+import re
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from pathlib import Path
+from typing import Dict, Iterable, List, Optional, Tuple
+
+from sfm_parser import Event, parse_lines, sfm_suffixes
+from versification import load_versification
+
+cache_filename = "usfm_validation.json"
+default_cache_dir = Path.home() / ".cache" / "textinfo"
+report_header = ["project", "file", "book", "line", "column", "kind", "message"]
+
+# Increase this when the checks change so that cached results are not used.
+validator_version = 3
+
+paragraph_markers = {
+    "id", "usfm", "ide", "sts", "rem", "h", "toc", "toca", "imt", "imte", "is", "ip", "ipi", "im", "imi", "ipq",
+    "imq", "ipr", "iq", "ib", "ili", "iot", "io", "iex", "ie", "mt", "mte", "ms", "mr", "s", "sr", "r", "d", "sp",
+    "sd", "c", "cl", "cp", "cd", "p", "m", "po", "pr", "cls", "pmo", "pm", "pmc", "pmr", "pi", "mi", "nb", "pc",
+    "ph", "q", "qr", "qc", "qa", "qm", "qd", "lh", "li", "lf", "lim", "b", "tr", "th", "thr", "tc", "tcr", "pb",
+    "periph", "restore", "lit",
+}  # fmt: skip
+character_markers = {
+    "add", "bk", "dc", "k", "nd", "ord", "pn", "png", "addpn", "qt", "sig", "sls", "tl", "wj", "em", "bd", "it",
+    "bdit", "no", "sc", "sup", "w", "wg", "wh", "wa", "rb", "pro", "ior", "iqt", "rq", "fig", "ndx", "jmp", "qs",
+    "qac", "ca", "va", "vp", "cat", "litl", "lik", "liv", "xop", "xot", "xnt", "xdc", "fdc", "fm", "fv", "efm",
+}  # fmt: skip
+note_markers = {"f", "fe", "ef", "x", "ex"}
+# Markers in notes that are closed by the next one or the end of the note.
+note_content_markers = {"fr", "fq", "fqa", "fk", "fl", "fw", "fp", "ft", "xo", "xk", "xq", "xt", "xta"}
+milestones = {"qt", "ts"}
+other_markers = {"v"}
+
+re_numbered = re.compile(r"^(.*?)(\d+(-\d+)?)?$")
+re_verse_number = re.compile(r"^(\d+)[a-z]?(?:-(\d+)[a-z]?)?$")
+
+Problem = Dict
+
+
+def base_marker(marker: str) -> str:
+    """The marker without a + for nesting, a number such as the 1 of q1, or a * for end markers."""
+    marker = marker.lstrip("+").rstrip("*")
+    return re_numbered.match(marker).group(1)
+
+
+def is_known(marker: str) -> bool:
+    base = base_marker(marker)
+    if base.startswith("z"):
+        # Markers starting with z are for each project's own use.
+        return True
+    if base.endswith(("-s", "-e")):
+        return base_marker(base[:-2]) in milestones
+    return base in paragraph_markers or base in character_markers or base in note_markers or base in note_content_markers or base in other_markers
+
+
+def number_ranges(numbers: Iterable[int]) -> str:
+    """The numbers as ranges, e.g. 1-3, 7."""
+    ranges, start, previous = [], None, None
+    for number in sorted(numbers):
+        if start is None:
+            start = previous = number
+        elif number == previous + 1:
+            previous = number
+        else:
+            ranges.append(f"{start}-{previous}" if previous > start else f"{start}")
+            start = previous = number
+    if start is not None:
+        ranges.append(f"{start}-{previous}" if previous > start else f"{start}")
+    return ", ".join(ranges)
+
+
+def decode(data: bytes) -> Tuple[str, List[Problem]]:
+    """Decode the bytes of a file as UTF-8, replacing bytes that aren't and reporting where they are."""
+    try:
+        return data.decode("utf-8-sig"), []
+    except UnicodeDecodeError as error:
+        line = data[: error.start].count(b"\n") + 1
+        text = data.decode("utf-8-sig", errors="replace")
+        count = text.count("\ufffd")
+        message = f"Invalid UTF-8 byte {data[error.start]:#04x}"
+        if count > 1:
+            message += f" and {count - 1} more"
+        return text, [problem(line, 0, "encoding", message)]
+
+
+def problem(line: int, column: int, kind: str, message: str) -> Problem:
+    return {"line": line, "column": column, "kind": kind, "message": message}
+
+
+def validate_events(events: Iterable[Event], expected_book: Optional[str] = None) -> Tuple[str, List[Problem]]:
+    """Check the markers and chapters of one book. Return the book and the problems found."""
+    problems = []
+    book = ""
+    chapter = 0
+    chapters = set()
+    open_markers: List[Event] = []
+
+    def close_paragraph():
+        for event in open_markers:
+            kind = "note" if base_marker(event.marker) in note_markers else "character marker"
+            problems.append(problem(event.line, event.column, "marker", f"The {kind} \\{event.marker} isn't closed."))
+        open_markers.clear()
+
+    for event in events:
+        marker = event.marker
+        if not marker:
+            if event.text.startswith("\\"):
+                problems.append(problem(event.line, event.column, "marker", "A backslash without a marker"))
+            continue
+        if marker == "*":
+            # The end of a milestone.
+            continue
+        if not is_known(marker):
+            problems.append(problem(event.line, event.column, "marker", f"Unknown marker \\{marker}"))
+            continue
+
+        base = base_marker(marker)
+        if marker.endswith("*"):
+            names = [base_marker(opened.marker) for opened in open_markers]
+            if base in names:
+                # Character markers in a note are closed by the end of the note.
+                del open_markers[len(names) - 1 - names[::-1].index(base) :]
+            elif base not in note_content_markers:
+                problems.append(problem(event.line, event.column, "marker", f"The end marker \\{marker} has no start marker."))
+            continue
+        if base in note_markers or base in character_markers:
+            open_markers.append(event)
+            continue
+        if base not in paragraph_markers:
+            continue
+
+        close_paragraph()
+        if marker == "id":
+            if book:
+                problems.append(problem(event.line, event.column, "id", f"A second \\id {event.attributes['book']}"))
+                continue
+            book = event.attributes["book"][:3]
+            if expected_book and book != expected_book:
+                problems.append(problem(event.line, event.column, "id", f"The \\id is {book} instead of {expected_book}"))
+        elif marker == "c":
+            number = event.attributes["number"]
+            if not number.isdigit():
+                problems.append(problem(event.line, event.column, "chapter", f"Invalid chapter number '{number}'"))
+                continue
+            number = int(number)
+            if number in chapters:
+                problems.append(problem(event.line, event.column, "chapter", f"Chapter {number} is repeated."))
+            elif number < chapter:
+                problems.append(problem(event.line, event.column, "chapter", f"Chapter {number} comes after chapter {chapter}."))
+            chapter = number
+            chapters.add(chapter)
+
+    if not book:
+        problems.append(problem(1, 1, "id", "There is no \\id marker."))
+    close_paragraph()
+    return book, problems
+
+
+def check_verses(verse_events: List[Tuple[int, Event]], book: str, versification=None) -> List[Problem]:
+    """Check the verse numbers of each chapter, given each \\v event with its chapter, and against the
+    versification if there is one."""
+    problems = []
+    seen: Dict[int, set] = {}
+    if versification is not None and versification.max_chapter(book) == 0:
+        # The book isn't in the versification.
+        versification = None
+    for chapter, event in verse_events:
+        number = event.attributes["number"]
+        match = re_verse_number.match(number)
+        if chapter == 0:
+            problems.append(problem(event.line, event.column, "verse", f"Verse {number} comes before the first chapter."))
+            continue
+        if not match:
+            problems.append(problem(event.line, event.column, "verse", f"Invalid verse number '{number}' in chapter {chapter}"))
+            continue
+        first = int(match.group(1))
+        last = int(match.group(2) or first)
+        verses = seen.setdefault(chapter, set())
+        repeated = [verse for verse in range(first, last + 1) if verse in verses]
+        # Verse parts like 3a and 3b are the same verse.
+        if repeated and not number[-1:].isalpha():
+            problems.append(problem(event.line, event.column, "verse", f"{'Verses' if len(repeated) > 1 else 'Verse'} {number_ranges(repeated)} of chapter {chapter} {'are' if len(repeated) > 1 else 'is'} repeated."))
+        verses.update(range(first, last + 1))
+        if versification is not None:
+            max_verse = versification.max_verse(book, chapter)
+            if max_verse and last > max_verse:
+                problems.append(
+                    problem(event.line, event.column, "verse", f"Verse {number} isn't in the versification, chapter {chapter} has {max_verse} verses.")
+                )
+
+    if versification is not None:
+        max_chapter = versification.max_chapter(book)
+        for chapter in sorted(seen):
+            if chapter > max_chapter:
+                problems.append(problem(0, 0, "chapter", f"Chapter {chapter} isn't in the versification, {book} has {max_chapter} chapters."))
+        missing = set(range(1, max_chapter + 1)) - set(seen)
+        # A book that is only partly translated is not reported chapter by chapter.
+        if missing and seen:
+            problems.append(problem(0, 0, "chapter", f"{'Chapters' if len(missing) > 1 else 'Chapter'} {number_ranges(missing)} {'are' if len(missing) > 1 else 'is'} missing."))
+        for chapter, verses in sorted(seen.items()):
+            missing = set(range(1, versification.max_verse(book, chapter) + 1)) - verses
+            if missing:
+                problems.append(problem(0, 0, "verse", f"Chapter {chapter} is missing {'verses' if len(missing) > 1 else 'verse'} {number_ranges(missing)}."))
+    return problems
+
+
+def validate_text(text: str, expected_book: Optional[str] = None, versification=None) -> Tuple[str, List[Problem]]:
+    """Validate the text of one book file. Return the book in its \\id and the problems found."""
+    verse_events: List[Tuple[int, Event]] = []
+    state = {"chapter": 0}
+
+    def events():
+        for event in parse_lines(text.splitlines()):
+            if event.marker == "c" and event.attributes["number"].isdigit():
+                state["chapter"] = int(event.attributes["number"])
+            elif event.marker == "v":
+                verse_events.append((state["chapter"], event))
+            yield event
+
+    book, problems = validate_events(events(), expected_book)
+    problems.extend(check_verses(verse_events, book, versification))
+    problems.sort(key=lambda item: (item["line"] or float("inf"), item["column"]))
+    return book, problems
+
+
+def validate_file(file: str, vref_file: Optional[str] = None, expected_book: Optional[str] = None) -> Tuple[str, str, List[Problem]]:
+    """Validate a book file. Return its hash, the book in its \\id and the problems found."""
+    data = Path(file).read_bytes()
+    text, problems = decode(data)
+    versification = load_versification(Path(vref_file)) if vref_file else None
+    book, text_problems = validate_text(text, expected_book, versification)
+    return hashlib.sha1(data).hexdigest(), book, problems + text_problems
+
+
+def find_book_files(projects_root: Path) -> List[Tuple[str, os.stat_result]]:
+    """The path and stat of each SFM or USFM file in each project folder of the projects root."""
+    files = []
+    with os.scandir(projects_root) as projects:
+        for project in projects:
+            if not project.is_dir():
+                continue
+            try:
+                with os.scandir(project.path) as entries:
+                    for entry in entries:
+                        if os.path.splitext(entry.name)[1].lower() in sfm_suffixes and entry.is_file():
+                            files.append((entry.path, entry.stat()))
+            except PermissionError:
+                continue
+    return sorted(files)
+
+
+class ValidationCache:
+    def __init__(self, cache_file: Path, settings: Dict):
+        """Results are only used if they were found with the same settings, such as the vref file."""
+        self.cache_file = Path(cache_file)
+        self.settings = settings
+        self.files: Dict[str, Dict] = {}
+        if self.cache_file.is_file():
+            try:
+                with open(self.cache_file, "r", encoding="utf-8") as f:
+                    cache = json.load(f)
+                if cache.get("settings") == settings:
+                    self.files = cache["files"]
+            except (OSError, json.JSONDecodeError, KeyError):
+                pass
+        self.by_hash = {entry["sha1"]: entry for entry in self.files.values()}
+
+    def get(self, file: str, stat: os.stat_result) -> Optional[Dict]:
+        entry = self.files.get(file)
+        if entry and entry["mtime_ns"] == stat.st_mtime_ns and entry["size"] == stat.st_size:
+            return entry
+        return None
+
+    def get_by_hash(self, file: str, stat: os.stat_result) -> Optional[Dict]:
+        """The result for a file with the same content, after hashing the file."""
+        with open(file, "rb") as f:
+            sha1 = hashlib.sha1(f.read()).hexdigest()
+        entry = self.by_hash.get(sha1)
+        if entry:
+            return self.set(file, stat, sha1, entry["book"], entry["problems"])
+        return None
+
+    def set(self, file: str, stat: os.stat_result, sha1: str, book: str, problems: List[Problem]) -> Dict:
+        entry = {"mtime_ns": stat.st_mtime_ns, "size": stat.st_size, "sha1": sha1, "book": book, "problems": problems}
+        self.files[file] = entry
+        self.by_hash[sha1] = entry
+        return entry
+
+    def save(self, files: Iterable[str]) -> None:
+        """Save the results for these files, dropping those for files that no longer exist."""
+        self.cache_file.parent.mkdir(parents=True, exist_ok=True)
+        tmp_file = self.cache_file.with_name(self.cache_file.name + ".tmp")
+        with open(tmp_file, "w", encoding="utf-8") as f:
+            json.dump({"settings": self.settings, "files": {file: self.files[file] for file in files if file in self.files}}, f)
+        tmp_file.replace(self.cache_file)
+
+
+def get_by_hash(cache: ValidationCache, file: str, stat: os.stat_result) -> Optional[Dict]:
+    """The cached result for a file with the same content, or None if there is none or the file can't be read."""
+    try:
+        return cache.get_by_hash(file, stat)
+    except OSError:
+        return None
+
+
+def validate_projects(
+    projects_root: Path, vref_file: Optional[Path] = None, cache_file: Optional[Path] = None, workers: int = 0, rehash: bool = True
+) -> Tuple[List[Dict], Dict[str, int]]:
+    """Validate every book file of every project in the projects root.
+    Return a row for each problem and the number of files that were parsed or found in the cache."""
+    projects_root = Path(projects_root)
+    vref = str(Path(vref_file).resolve()) if vref_file else None
+    settings = {"version": validator_version, "vref": vref, "vref_mtime_ns": os.stat(vref).st_mtime_ns if vref else None}
+    cache = ValidationCache(cache_file or default_cache_dir / cache_filename, settings)
+    if vref:
+        # Parse vref.txt here so that the workers load the cached arrays.
+        load_versification(Path(vref))
+
+    files = find_book_files(projects_root)
+    counts = {"files": len(files), "cached": 0, "same_hash": 0, "parsed": 0, "failed": 0}
+    results: Dict[str, Dict] = {}
+    to_parse = []
+    for file, stat in files:
+        entry = cache.get(file, stat)
+        if entry:
+            counts["cached"] += 1
+        elif rehash and cache.by_hash and (entry := get_by_hash(cache, file, stat)):
+            counts["same_hash"] += 1
+        else:
+            to_parse.append((file, stat))
+            continue
+        results[file] = entry
+
+    if to_parse:
+        workers = workers if workers > 0 else max(1, (os.cpu_count() or 2) - 1)
+        with ProcessPoolExecutor(max_workers=workers) as executor:
+            futures = {executor.submit(validate_file, file, vref): (file, stat) for file, stat in to_parse}
+            for future in as_completed(futures):
+                file, stat = futures[future]
+                try:
+                    sha1, book, problems = future.result()
+                except Exception as error:
+                    # A file that failed isn't cached, so that it is tried again next time.
+                    kind = "io" if isinstance(error, OSError) else "parse"
+                    results[file] = {"book": "", "problems": [problem(0, 0, kind, f"{type(error).__name__}: {error}")]}
+                    counts["failed"] += 1
+                    continue
+                results[file] = cache.set(file, stat, sha1, book, problems)
+                counts["parsed"] += 1
+    cache.save(file for file, _ in files)
+
+    rows = []
+    for file, _ in files:
+        entry = results[file]
+        path = Path(file)
+        for item in entry["problems"]:
+            rows.append({"project": path.parent.name, "file": path.name, "book": entry["book"], **item})
+    return rows, counts
+
+
+def write_report(output_file: Path, rows: List[Dict], counts: Dict[str, int]) -> None:
+    """Write the problems to a .json file, or to a csv file for any other extension."""
+    output_file = Path(output_file)
+    if output_file.suffix.lower() == ".json":
+        with open(output_file, "w", encoding="utf-8") as f:
+            json.dump({"counts": counts, "problems": rows}, f, indent=1, ensure_ascii=False)
+    else:
+        with open(output_file, "w", encoding="utf-8", newline="") as csvfile:
+            writer = csv.DictWriter(csvfile, fieldnames=report_header)
+            writer.writeheader()
+            writer.writerows(rows)
+    print(f"Wrote {len(rows)} problems to {output_file}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Validate the USFM of every book of every Paratext project in a folder.")
+    parser.add_argument("projects_root", type=Path, help="The folder of Paratext projects.")
+    parser.add_argument("--vref", type=Path, help="A vref.txt file to check the chapters and verses against.")
+    parser.add_argument("--output", type=Path, default="usfm_validation.csv", help="The .csv or .json report file.")
+    parser.add_argument("--cache", type=Path, help=f"The cache file. The default is {default_cache_dir / cache_filename}")
+    parser.add_argument("--workers", type=int, default=0, help="Number of processes. The default is one per cpu less one.")
+    args = parser.parse_args()
+
+    rows, counts = validate_projects(args.projects_root, args.vref, args.cache, args.workers)
+    print(
+        f"Checked {counts['files']} files: {counts['parsed']} parsed, {counts['cached']} unchanged "
+        f"and {counts['same_hash']} with the same content as before."
+        + (f" {counts['failed']} could not be validated." if counts["failed"] else "")
+    )
+    kinds: Dict[str, int] = {}
+    for row in rows:
+        kinds[row["kind"]] = kinds.get(row["kind"], 0) + 1
+    for kind, count in sorted(kinds.items()):
+        print(f"{count:>8} {kind} problems")
+    write_report(args.output, rows, counts)
+
+
+if __name__ == "__main__":
+    main()
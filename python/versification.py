@@ -0,0 +1,401 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""Book identifiers and the verse references of vref.txt, shared by the USFM tools.
+
+The books are numbered as in the SIL canon: GEN is 1, MAT is 40 and the
+deuterocanonical and other books follow REV. Paratext names book files with the
+number one higher from MAT up to XXG, e.g. 41MAT.sfm, and from FRT on with a letter,
+e.g. A0FRT.sfm.
+
+vref.txt has one verse reference such as "GEN 1:1" per line of an extract. It is parsed
+once into packed integer arrays of book number, chapter and verse, which are cached on
+disk and loaded again while vref.txt is unchanged. A Versification converts between
+line numbers and references in constant time and gives the lines of each book and
+chapter as slices and the last chapter and verse of each.
+"""
+import hashlib
+import os
+import re
+from functools import lru_cache
+from pathlib import Path
+from typing import Dict, List, Optional, Set, Tuple, Union
+
+import numpy as np
+
+ALL_BOOK_IDS = [
+    "GEN",
+    "EXO",
+    "LEV",
+    "NUM",
+    "DEU",
+    "JOS",
+    "JDG",
+    "RUT",
+    "1SA",
+    "2SA",  # 10
+    "1KI",
+    "2KI",
+    "1CH",
+    "2CH",
+    "EZR",
+    "NEH",
+    "EST",
+    "JOB",
+    "PSA",
+    "PRO",  # 20
+    "ECC",
+    "SNG",
+    "ISA",
+    "JER",
+    "LAM",
+    "EZK",
+    "DAN",
+    "HOS",
+    "JOL",
+    "AMO",  # 30
+    "OBA",
+    "JON",
+    "MIC",
+    "NAM",
+    "HAB",
+    "ZEP",
+    "HAG",
+    "ZEC",
+    "MAL",
+    "MAT",  # 40
+    "MRK",
+    "LUK",
+    "JHN",
+    "ACT",
+    "ROM",
+    "1CO",
+    "2CO",
+    "GAL",
+    "EPH",
+    "PHP",  # 50
+    "COL",
+    "1TH",
+    "2TH",
+    "1TI",
+    "2TI",
+    "TIT",
+    "PHM",
+    "HEB",
+    "JAS",
+    "1PE",  # 60
+    "2PE",
+    "1JN",
+    "2JN",
+    "3JN",
+    "JUD",
+    "REV",
+    "TOB",
+    "JDT",
+    "ESG",
+    "WIS",  # 70
+    "SIR",
+    "BAR",
+    "LJE",
+    "S3Y",
+    "SUS",
+    "BEL",
+    "1MA",
+    "2MA",
+    "3MA",
+    "4MA",  # 80
+    "1ES",
+    "2ES",
+    "MAN",
+    "PS2",
+    "ODA",
+    "PSS",
+    "JSA",  # actual variant text for JOS, now in LXA text
+    "JDB",  # actual variant text for JDG, now in LXA text
+    "TBS",  # actual variant text for TOB, now in LXA text
+    "SST",  # actual variant text for SUS, now in LXA text, 90
+    "DNT",  # actual variant text for DAN, now in LXA text
+    "BLT",  # actual variant text for BEL, now in LXA text
+    "XXA",
+    "XXB",
+    "XXC",
+    "XXD",
+    "XXE",
+    "XXF",
+    "XXG",
+    "FRT",  # 100
+    "BAK",
+    "OTH",
+    "3ES",  # Used previously but really should be 2ES
+    "EZA",  # Used to be called 4ES, but not actually in any known project
+    "5EZ",  # Used to be called 5ES, but not actually in any known project
+    "6EZ",  # Used to be called 6ES, but not actually in any known project
+    "INT",
+    "CNC",
+    "GLO",
+    "TDX",  # 110
+    "NDX",
+    "DAG",
+    "PS3",
+    "2BA",
+    "LBA",
+    "JUB",
+    "ENO",
+    "1MQ",
+    "2MQ",
+    "3MQ",  # 120
+    "REP",
+    "4BA",
+    "LAO",
+]
+
+NON_CANONICAL_IDS = {
+    "XXA",
+    "XXB",
+    "XXC",
+    "XXD",
+    "XXE",
+    "XXF",
+    "XXG",
+    "FRT",
+    "BAK",
+    "OTH",
+    "INT",
+    "CNC",
+    "GLO",
+    "TDX",
+    "NDX",
+}
+
+BOOK_NUMBERS = dict((id, i + 1) for i, id in enumerate(ALL_BOOK_IDS))
+
+FIRST_BOOK = 1
+LAST_BOOK = len(ALL_BOOK_IDS)
+
+OT_BOOKS = ALL_BOOK_IDS[:39]
+NT_BOOKS = ALL_BOOK_IDS[39:66]
+
+BOOK_NAMES = {
+    "GEN": "Genesis", "EXO": "Exodus", "LEV": "Leviticus", "NUM": "Numbers", "DEU": "Deuteronomy",
+    "JOS": "Joshua", "JDG": "Judges", "RUT": "Ruth", "1SA": "1 Samuel", "2SA": "2 Samuel",
+    "1KI": "1 Kings", "2KI": "2 Kings", "1CH": "1 Chronicles", "2CH": "2 Chronicles", "EZR": "Ezra",
+    "NEH": "Nehemiah", "EST": "Esther", "JOB": "Job", "PSA": "Psalms", "PRO": "Proverbs",
+    "ECC": "Ecclesiastes", "SNG": "Song of Songs", "ISA": "Isaiah", "JER": "Jeremiah", "LAM": "Lamentations",
+    "EZK": "Ezekiel", "DAN": "Daniel", "HOS": "Hosea", "JOL": "Joel", "AMO": "Amos",
+    "OBA": "Obadiah", "JON": "Jonah", "MIC": "Micah", "NAM": "Nahum", "HAB": "Habakkuk",
+    "ZEP": "Zephaniah", "HAG": "Haggai", "ZEC": "Zechariah", "MAL": "Malachi", "MAT": "Matthew",
+    "MRK": "Mark", "LUK": "Luke", "JHN": "John", "ACT": "Acts", "ROM": "Romans",
+    "1CO": "1 Corinthians", "2CO": "2 Corinthians", "GAL": "Galatians", "EPH": "Ephesians", "PHP": "Philippians",
+    "COL": "Colossians", "1TH": "1 Thessalonians", "2TH": "2 Thessalonians", "1TI": "1 Timothy", "2TI": "2 Timothy",
+    "TIT": "Titus", "PHM": "Philemon", "HEB": "Hebrews", "JAS": "James", "1PE": "1 Peter",
+    "2PE": "2 Peter", "1JN": "1 John", "2JN": "2 John", "3JN": "3 John", "JUD": "Jude",
+    "REV": "Revelation",
+}  # fmt: skip
+
+# Other English names used in the texts that have been converted.
+BOOK_NAME_ALIASES = {"Song of Solomon": "SNG", "Psalm": "PSA", "Revelations": "REV"}
+BOOK_IDS_BY_NAME = {name.lower(): book for book, name in BOOK_NAMES.items()}
+BOOK_IDS_BY_NAME.update((name.lower(), book) for name, book in BOOK_NAME_ALIASES.items())
+
+re_roman_prefix = re.compile(r"^(III|II|I)\s+")
+re_vref = re.compile(r"^(\w+)\s+(\d+):(\d+)", re.MULTILINE)
+
+cache_dir = Path.home() / ".cache" / "textinfo"
+
+
+def book_number_to_id(number: int, error_value: str = "***") -> str:
+    if number < 1 or number >= len(ALL_BOOK_IDS):
+        return error_value
+    index = number - 1
+    return ALL_BOOK_IDS[index]
+
+
+def book_id_to_number(id: str) -> int:
+    return BOOK_NUMBERS.get(id.upper(), 0)
+
+
+def get_books(books: Union[str, List[str]]) -> Set[int]:
+    if isinstance(books, str):
+        books = books.split(",")
+    book_set: Set[int] = set()
+    for book_id in books:
+        book_id = book_id.strip().strip("*").upper()
+        if book_id == "NT":
+            book_set.update(range(40, 67))
+        elif book_id == "OT":
+            book_set.update(range(40))
+        else:
+            book_num = book_id_to_number(book_id)
+            if book_num is None:
+                raise RuntimeError("A specified book Id is invalid.")
+            book_set.add(book_num)
+    return book_set
+
+
+def is_nt(book_num: int) -> bool:
+    return book_num >= 40 and book_num < 67
+
+
+def is_ot(book_num: int) -> bool:
+    return book_num < 40
+
+
+def is_ot_nt(book_num: int) -> bool:
+    return is_ot(book_num) or is_nt(book_num)
+
+
+def is_book_id_valid(book_id: str) -> bool:
+    return book_id_to_number(book_id) > 0
+
+
+def is_canonical(book: Union[str, int]) -> bool:
+    if isinstance(book, int):
+        book = book_number_to_id(book)
+    return is_book_id_valid(book) and book not in NON_CANONICAL_IDS
+
+
+def book_file_number(book: Union[str, int]) -> str:
+    """The number Paratext puts before the book id in the names of book files, e.g. 41 for MAT.
+
+    Paratext adds one to the numbers of the books from MAT to the one before XXG. XXG is 100
+    and the books after it are A0 to A9, B0 and so on.
+    """
+    number = book_id_to_number(book) if isinstance(book, str) else book
+    if number < 40:
+        return f"{number:02}"
+    if number < 99:
+        return f"{number + 1:02}"
+    if number == 99:
+        return "100"
+    return f"{chr(ord('A') + (number - 100) // 10)}{number % 10}"
+
+
+def book_file_name(book: str, post_part: str = "", extension: str = ".sfm") -> str:
+    """The Paratext name of a book file, e.g. 41MAT.sfm."""
+    return f"{book_file_number(book)}{book}{post_part}{extension}"
+
+
+def book_id_from_name(name: str) -> Optional[str]:
+    """The book id for an English book name such as 'II Kings', '2 Kings' or 'Song of Solomon'."""
+    name = " ".join(name.split())
+    name = re_roman_prefix.sub(lambda match: f"{len(match.group(1))} ", name)
+    return BOOK_IDS_BY_NAME.get(name.lower())
+
+
+
+def parse_vref(vref: str) -> Tuple[str, int, int]:
+    match = re_vref.match(vref)
+    if match:
+        return match.group(1), int(match.group(2)), int(match.group(3))
+    raise ValueError(f"Invalid vref format: {vref}")
+
+
+class Versification:
+    def __init__(self, books: np.ndarray, chapters: np.ndarray, verses: np.ndarray):
+        """books, chapters and verses give the book number, chapter and verse of each line."""
+        self.books = books
+        self.chapters = chapters
+        self.verses = verses
+        self.keys = pack(books, chapters, verses)
+        self.line_numbers = {key: line for line, key in enumerate(self.keys.tolist())}
+
+        # The lines of a book, and of a chapter, follow each other in vref.txt.
+        book_chapters = pack(books, chapters, 0)
+        _, starts, counts = np.unique(book_chapters, return_index=True, return_counts=True)
+        self.chapter_lines = {
+            (int(books[start]), int(chapters[start])): slice(int(start), int(start + count))
+            for start, count in zip(starts, counts)
+        }
+        _, starts, counts = np.unique(books, return_index=True, return_counts=True)
+        self.book_lines = {int(books[start]): slice(int(start), int(start + count)) for start, count in zip(starts, counts)}
+
+    def __len__(self) -> int:
+        return len(self.keys)
+
+    @classmethod
+    def parse(cls, vref_file: Path) -> "Versification":
+        with open(vref_file, "r", encoding="utf-8") as f:
+            text = f.read()
+        references = re_vref.findall(text)
+        if len(references) != len(text.splitlines()):
+            raise ValueError(f"Some lines of {vref_file} aren't verse references like GEN 1:1.")
+        unknown = {book for book, _, _ in references} - BOOK_NUMBERS.keys()
+        if unknown:
+            raise ValueError(f"Unknown book ids in {vref_file}: {' '.join(sorted(unknown))}")
+        books = np.array([BOOK_NUMBERS[book] for book, _, _ in references], dtype=np.uint8)
+        chapters = np.array([chapter for _, chapter, _ in references], dtype=np.uint16)
+        verses = np.array([verse for _, _, verse in references], dtype=np.uint16)
+        return cls(books, chapters, verses)
+
+    def line(self, book: Union[str, int], chapter: int, verse: int) -> Optional[int]:
+        """The line number of a verse, or None if it isn't in the versification."""
+        number = book_id_to_number(book) if isinstance(book, str) else book
+        return self.line_numbers.get(int(pack(number, chapter, verse)))
+
+    def reference(self, line: int) -> Tuple[str, int, int]:
+        return ALL_BOOK_IDS[self.books[line] - 1], int(self.chapters[line]), int(self.verses[line])
+
+    def vref(self, line: int) -> str:
+        book, chapter, verse = self.reference(line)
+        return f"{book} {chapter}:{verse}"
+
+    def vrefs(self) -> List[str]:
+        return [self.vref(line) for line in range(len(self))]
+
+    def book_ids(self) -> List[str]:
+        """The books in the versification, in order."""
+        return [ALL_BOOK_IDS[number - 1] for number in self.book_lines]
+
+    def book_slice(self, book: Union[str, int]) -> slice:
+        number = book_id_to_number(book) if isinstance(book, str) else book
+        return self.book_lines.get(number, slice(0, 0))
+
+    def chapter_slice(self, book: Union[str, int], chapter: int) -> slice:
+        number = book_id_to_number(book) if isinstance(book, str) else book
+        return self.chapter_lines.get((number, chapter), slice(0, 0))
+
+    def max_chapter(self, book: Union[str, int]) -> int:
+        lines = self.book_slice(book)
+        return int(self.chapters[lines].max()) if lines.stop > lines.start else 0
+
+    def max_verse(self, book: Union[str, int], chapter: int) -> int:
+        lines = self.chapter_slice(book, chapter)
+        return int(self.verses[lines].max()) if lines.stop > lines.start else 0
+
+    def max_chapters(self) -> Dict[str, int]:
+        return {book: self.max_chapter(book) for book in self.book_ids()}
+
+    def max_verses(self) -> Dict[str, Dict[int, int]]:
+        """The last verse of each chapter of each book."""
+        max_verses: Dict[str, Dict[int, int]] = {}
+        for (number, chapter), lines in self.chapter_lines.items():
+            max_verses.setdefault(ALL_BOOK_IDS[number - 1], {})[chapter] = int(self.verses[lines].max())
+        return max_verses
+
+
+def pack(books, chapters, verses):
+    """One integer key for each book, chapter and verse."""
+    return (np.asarray(books, dtype=np.int64) << 32) | (np.asarray(chapters, dtype=np.int64) << 16) | np.asarray(verses, dtype=np.int64)
+
+
+@lru_cache(maxsize=4)
+def load_versification(vref_file: Path) -> Versification:
+    """Parse vref.txt, or load the arrays cached the last time it was parsed if it hasn't changed since."""
+    vref_file = Path(vref_file).resolve()
+    stat = os.stat(vref_file)
+    cache_file = cache_dir / f"vref_{hashlib.sha1(str(vref_file).encode('utf-8')).hexdigest()[:16]}.npz"
+    signature = np.array([stat.st_mtime_ns, stat.st_size], dtype=np.int64)
+    if cache_file.is_file():
+        try:
+            with np.load(cache_file) as cached:
+                if np.array_equal(cached["signature"], signature):
+                    return Versification(cached["books"], cached["chapters"], cached["verses"])
+        except (OSError, ValueError, KeyError):
+            pass
+
+    versification = Versification.parse(vref_file)
+    cache_dir.mkdir(parents=True, exist_ok=True)
+    tmp_file = cache_file.with_name(cache_file.name + ".tmp")
+    with open(tmp_file, "wb") as f:
+        np.savez(f, signature=signature, books=versification.books, chapters=versification.chapters, verses=versification.verses)
+    tmp_file.replace(cache_file)
+    return versification
@@ -0,0 +1,233 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""Character coverage index for a tokenizer vocabulary.
+
+A bitmap over every Unicode code point records whether the tokenizer vocabulary can
+represent that character. The bitmap is built once per tokenizer fingerprint and saved
+to disk so that a whole corpus can be checked for uncovered characters with NumPy,
+without tokenizing anything.
+"""
+import argparse
+import csv
+import hashlib
+import multiprocessing as mp
+import unicodedata
+from collections import Counter
+from pathlib import Path
+from typing import Callable, Dict, Iterable, Iterator, List, Optional
+
+import numpy as np
+
+UNICODE_SIZE = 0x110000
+start_of_word = "▁"
+model_name = "facebook/nllb-200-distilled-600M"
+default_cache_dir = Path.home() / ".cache" / "textinfo" / "coverage"
+
+# Characters read per chunk when streaming a corpus file.
+chunk_size = 1 << 20
+
+
+def vocab_fingerprint(pieces: Iterable[str]) -> str:
+    """Return a short hash that identifies the exact set of pieces in a vocabulary."""
+    sha = hashlib.sha1()
+    for piece in sorted(pieces):
+        sha.update(piece.encode("utf-8", "surrogatepass"))
+        sha.update(b"\0")
+    return sha.hexdigest()[:16]
+
+
+def build_bitmap(pieces: Iterable[str], normalize: Optional[Callable[[str], str]] = None) -> np.ndarray:
+    """Mark the code points that the vocabulary can represent.
+
+    A character is covered if it is a piece on its own, with or without the start of word marker.
+    Whitespace is covered when the start of word marker is in the vocabulary.
+    If the tokenizer's normalize function is given, characters that normalize to covered
+    characters (or to nothing at all) are also covered, since they never produce <unk>.
+    """
+    bitmap = np.zeros(UNICODE_SIZE, dtype=bool)
+    pieces = set(pieces)
+
+    for piece in pieces:
+        chars = piece[1:] if piece.startswith(start_of_word) and len(piece) > 1 else piece
+        if len(chars) == 1:
+            bitmap[ord(chars)] = True
+
+    if start_of_word in pieces:
+        # U+3000 IDEOGRAPHIC SPACE is the highest whitespace code point.
+        for code_point in range(0x3001):
+            if chr(code_point).isspace():
+                bitmap[code_point] = True
+
+    if normalize is not None:
+        for code_point in np.flatnonzero(~bitmap):
+            char = chr(code_point)
+            if unicodedata.category(char) in ("Cn", "Cs"):
+                continue
+            normalized = normalize(char).replace(start_of_word, " ")
+            if all(c.isspace() or bitmap[ord(c)] for c in normalized):
+                bitmap[code_point] = True
+
+    return bitmap
+
+
+class CoverageIndex:
+    """Bitmap of the code points a tokenizer vocabulary can represent."""
+
+    def __init__(self, bitmap: np.ndarray, fingerprint: str, model: str = ""):
+        self.bitmap = bitmap
+        self.fingerprint = fingerprint
+        self.model = model
+
+    @classmethod
+    def from_tokenizer(cls, tokenizer, cache_dir: Path = default_cache_dir) -> "CoverageIndex":
+        # get_vocab() builds a new dict on each call, so call it exactly once.
+        vocab = tokenizer.get_vocab()
+        fingerprint = vocab_fingerprint(vocab)
+        index_file = Path(cache_dir) / f"{fingerprint}.npz"
+        if index_file.is_file():
+            return cls.load(index_file)
+
+        backend = getattr(tokenizer, "backend_tokenizer", None)
+        normalizer = getattr(backend, "normalizer", None)
+        normalize = normalizer.normalize_str if normalizer is not None else None
+
+        index = cls(build_bitmap(vocab, normalize), fingerprint, getattr(tokenizer, "name_or_path", ""))
+        index.save(index_file)
+        return index
+
+    @classmethod
+    def from_model(cls, model: str = model_name, cache_dir: Path = default_cache_dir) -> "CoverageIndex":
+        from transformers import AutoTokenizer
+
+        return cls.from_tokenizer(AutoTokenizer.from_pretrained(model), cache_dir)
+
+    @classmethod
+    def load(cls, index_file: Path) -> "CoverageIndex":
+        with np.load(index_file) as data:
+            bitmap = np.unpackbits(data["bits"], count=UNICODE_SIZE).astype(bool)
+            return cls(bitmap, str(data["fingerprint"]), str(data["model"]))
+
+    def save(self, index_file: Path) -> Path:
+        index_file = Path(index_file)
+        index_file.parent.mkdir(parents=True, exist_ok=True)
+        with open(index_file, "wb") as out:
+            np.savez(out, bits=np.packbits(self.bitmap), fingerprint=self.fingerprint, model=self.model)
+        return index_file
+
+    def __contains__(self, char: str) -> bool:
+        return len(char) == 1 and bool(self.bitmap[ord(char)])
+
+    def covered_code_points(self) -> np.ndarray:
+        return np.flatnonzero(self.bitmap)
+
+    def uncovered(self, text: str) -> Counter:
+        """Count the characters in text that the vocabulary can't represent."""
+        return counts_to_counter(*uncovered_counts(self.bitmap, text))
+
+
+def code_points(text: str) -> np.ndarray:
+    return np.frombuffer(text.encode("utf-32-le", "surrogatepass"), dtype="<u4")
+
+
+def uncovered_counts(bitmap: np.ndarray, text: str):
+    """Return the unique uncovered code points in text and their counts."""
+    points = code_points(text)
+    return np.unique(points[~bitmap[points]], return_counts=True)
+
+
+def counts_to_counter(points: np.ndarray, counts: np.ndarray) -> Counter:
+    return Counter({chr(point): int(count) for point, count in zip(points.tolist(), counts.tolist())})
+
+
+def read_chunks(corpus_path: Path) -> Iterator[str]:
+    with open(corpus_path, "r", encoding="utf-8-sig") as in_file:
+        while chunk := in_file.read(chunk_size):
+            yield chunk
+
+
+# The bitmap is handed to each worker once rather than pickled with every file.
+worker_bitmap = None
+
+
+def init_worker(packed_bits):
+    global worker_bitmap
+    worker_bitmap = np.unpackbits(packed_bits, count=UNICODE_SIZE).astype(bool)
+
+
+def count_uncovered_in_file(corpus_path: Path, bitmap: Optional[np.ndarray] = None) -> Counter:
+    bitmap = worker_bitmap if bitmap is None else bitmap
+    totals = np.zeros(0, dtype=np.int64)
+    for chunk in read_chunks(corpus_path):
+        points, counts = uncovered_counts(bitmap, chunk)
+        if len(points):
+            if points[-1] >= len(totals):
+                totals = np.pad(totals, (0, int(points[-1]) + 1 - len(totals)))
+            totals[points] += counts
+    points = np.flatnonzero(totals)
+    return counts_to_counter(points, totals[points])
+
+
+def coverage_report(files: Iterable[Path], index: Optional[CoverageIndex] = None, workers: int = 0) -> Dict[Path, Counter]:
+    """Find the characters in each file that the vocabulary can't represent.
+
+    Files are streamed in chunks and processed in parallel. Returns {file: Counter(char: count)}.
+    """
+    index = CoverageIndex.from_model() if index is None else index
+    files = list(files)
+    workers = workers or max(1, mp.cpu_count() - 1)
+
+    if workers == 1 or len(files) <= 1:
+        return {file: count_uncovered_in_file(file, index.bitmap) for file in files}
+
+    with mp.Pool(workers, initializer=init_worker, initargs=(np.packbits(index.bitmap),)) as pool:
+        results = pool.map(count_uncovered_in_file, files, chunksize=4)
+    return dict(zip(files, results))
+
+
+def char_name(char: str) -> str:
+    try:
+        return unicodedata.name(char)
+    except ValueError:
+        return "No name found."
+
+
+def write_coverage_report(report_file: Path, uncovered_by_file: Dict[Path, Counter]) -> None:
+    with open(report_file, "w", encoding="utf-8", newline="") as csv_file:
+        writer = csv.writer(csv_file)
+        writer.writerow(["File", "Codepoint", "Unicode name", "Count"])
+        for file, uncovered in uncovered_by_file.items():
+            for char, count in uncovered.most_common():
+                writer.writerow([file.name, ord(char), char_name(char), count])
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description="Find the characters in a corpus that a tokenizer vocabulary can't represent, without tokenizing."
+    )
+    parser.add_argument("input", type=Path, help="A folder of extracts or a single file.")
+    parser.add_argument("--output", type=Path, default=Path("uncovered_chars.csv"), help="CSV report to write.")
+    parser.add_argument("--model", default=model_name, help=f"Tokenizer to index. The default is {model_name}")
+    parser.add_argument("--index", type=Path, help="Use a saved coverage index instead of loading the tokenizer.")
+    parser.add_argument("--cache-dir", type=Path, default=default_cache_dir, help="Folder for saved coverage indexes.")
+    parser.add_argument("--workers", type=int, default=0, help="Number of processes. The default is one per cpu less one.")
+    args = parser.parse_args()
+
+    if args.index:
+        index = CoverageIndex.load(args.index)
+    else:
+        index = CoverageIndex.from_model(args.model, args.cache_dir)
+    print(f"Coverage index {index.fingerprint} for {index.model} covers {int(index.bitmap.sum())} code points.")
+
+    files: List[Path] = sorted(args.input.glob("*.txt")) if args.input.is_dir() else [args.input]
+    print(f"Checking {len(files)} files.")
+
+    uncovered_by_file = coverage_report(files, index, args.workers)
+    all_uncovered = sum(uncovered_by_file.values(), Counter())
+    write_coverage_report(args.output, uncovered_by_file)
+    print(f"Found {len(all_uncovered)} uncovered characters, {sum(all_uncovered.values())} in total.")
+    print(f"Wrote the report to {args.output}")
+
+
+if __name__ == "__main__":
+    mp.freeze_support()
+    main()
@@ -1,196 +1,53 @@
 import argparse
+import hashlib
+import json
 import os
+from concurrent.futures import ProcessPoolExecutor
 from pathlib import Path
 import re
-#from ..common.environment import SIL_NLP_ENV
-silnlp_folder = Path("F:\Github\silnlp")
 
-BIBLE = {
-    "GEN": 50,
-    "EXO": 40,
-    "LEV": 27,
-    "NUM": 36,
-    "DEU": 34,
-    "JOS": 24,
-    "JDG": 21,
-    "RUT": 4,
-    "1SA": 31,
-    "2SA": 24,
-    "1KI": 22,
-    "2KI": 25,
-    "1CH": 29,
-    "2CH": 36,
-    "EZR": 10,
-    "NEH": 13,
-    "EST": 10,
-    "JOB": 42,
-    "PSA": 150,
-    "PRO": 31,
-    "ECC": 12,
-    "SNG": 8,
-    "ISA": 66,
-    "JER": 52,
-    "LAM": 5,
-    "EZK": 48,
-    "DAN": 12,
-    "HOS": 14,
-    "JOL": 4,
-    "AMO": 9,
-    "OBA": 1,
-    "JON": 4,
-    "MIC": 7,
-    "NAM": 3,
-    "HAB": 3,
-    "ZEP": 3,
-    "HAG": 2,
-    "ZEC": 14,
-    "MAL": 3,
-    "MAT": 28,
-    "MRK": 16,
-    "LUK": 24,
-    "JHN": 21,
-    "ACT": 28,
-    "ROM": 16,
-    "1CO": 16,
-    "2CO": 13,
-    "GAL": 6,
-    "EPH": 6,
-    "PHP": 4,
-    "COL": 4,
-    "1TH": 5,
-    "2TH": 3,
-    "1TI": 6,
-    "2TI": 4,
-    "TIT": 3,
-    "PHM": 1,
-    "HEB": 13,
-    "JAS": 5,
-    "1PE": 5,
-    "2PE": 3,
-    "1JN": 5,
-    "2JN": 1,
-    "3JN": 1,
-    "JUD": 1,
-    "REV": 22,
-}
-
-OT = dict(list(BIBLE.items())[0:39])
-NT = dict(list(BIBLE.items())[39:])
+import numpy as np
 
-def get_sfm_files(project_dir):
-    return [file for file in project_dir.glob("*") if file.is_file() and file.suffix[1:].lower() in ["sfm", "usfm"]]
+from versification import ALL_BOOK_IDS, book_file_name, load_versification
 
-def get_vrefs():
-    #vref_file = SIL_NLP_ENV.assets_dir / "vref.txt"
-    vref_file = silnlp_folder / "silnlp" / "assets" / "vref.txt"
-    with open(vref_file) as vref_f:
-        return [line.strip() for line in vref_f.readlines()]
+#from ..common.environment import SIL_NLP_ENV
+silnlp_folder = Path("F:\Github\silnlp")
 
+vref_file = silnlp_folder / "silnlp" / "assets" / "vref.txt"
+manifest_filename = "vref2project.json"
 
-def get_vref_dict() -> dict:
-    vref_dict = {}
-    vrefs = get_vrefs()
-    for vref in vrefs:
-        book, chapter, verse = parse_vref(vref)
-        if book not in vref_dict:
-            vref_dict[book] = {}
-        if chapter not in vref_dict[book]:
-            vref_dict[book][chapter] = []
 
-        vref_dict[book][chapter].append(verse)
-    return vref_dict
+def get_sfm_files(project_dir):
+    return [file for file in project_dir.glob("*") if file.is_file() and file.suffix[1:].lower() in ["sfm", "usfm"]]
 
 
-def parse_vref(vref):
+def get_versification():
+    #vref_file = SIL_NLP_ENV.assets_dir / "vref.txt"
+    return load_versification(vref_file)
 
-    vref_pattern = r"(?P<book>\w+)\s+(?P<chapter>\d+):(?P<verse>\d+)"
-    match = re.match(vref_pattern, vref)
 
-    if match:
-        book = match.group("book")
-        chapter = int(match.group("chapter"))
-        verse = int(match.group("verse"))
-        return book, chapter, verse
-    else:
-        raise ValueError(f"Invalid vref format: {vref}")
+def get_vrefs():
+    return get_versification().vrefs()
 
 
 def get_max_chapters() -> dict:
-    vrefs = get_vrefs()
-    max_chapters = {}
-    for vref in vrefs:
-        book, chapter, _ = parse_vref(vref)
-        max_chapters[book] = chapter
-    return max_chapters
+    return get_versification().max_chapters()
 
 
-def get_max_chapter(book) -> dict:
-    vref_dict = get_vref_dict()
-    return max(vref_dict[book])
+def get_max_chapter(book) -> int:
+    return get_versification().max_chapter(book)
 
 
 def get_max_verse(book, chapter) -> int:
-    vref_dict = get_vref_dict()
-    return max(vref_dict[book][chapter])
+    return get_versification().max_verse(book, chapter)
 
 
 def get_files_from_folder(folder, ext):
     files = [file for file in folder.glob(f"*{ext}") if file.is_file]
     return files
 
-def parse_extract(file):
-
-    with open(file, "r", encoding="utf-8") as f:
-        lines = [line.strip() for line in f.readlines()]
-    
-    usfm_data = dict()
-    vrefs = get_vrefs()
-    if not len(lines) == len(vrefs):
-        raise RuntimeError(f"There are {len(lines)} and {len(vrefs)} verse references. These should match.")
-    
-    #print(f"There are {len(lines)} lines and {len(vrefs)} verse references.")
-    
-    verses_in_range = 0
-    for line_no, line in enumerate(lines):
-        
-        # while line == '<range>':
-        #     verses_in_range += 1
-        #     continue
-
-        if line == '':
-            continue
-            
-        vref = vrefs[line_no]
-        #print(vref, line)
-        
-        book, chapter, verse = parse_vref(vref)
-        if book not in usfm_data:
-            usfm_data[book] = {}
-        if chapter not in usfm_data[book]:
-            usfm_data[book][chapter] = {}
-        if verse not in usfm_data[book][chapter]:
-            usfm_data[book][chapter][verse] = line.strip()
-            #print(f"{line_no}  Added {book} {chapter}:{verse}  {line} ")
-
-    if not book:
-        print(f"Warning: Could not parse book ID from {file}. ")
-        return None
-
-    return usfm_data
-
-
-def save_to_usfm(book_id, usfm_data, output_file):
-
-    with open(output_file, "w", encoding="utf-8") as f:
-        f.write(f"\\id {book_id}\n")
-        for chapter in sorted(usfm_data[book_id], key=int):
-            f.write(f"\\c {chapter}\n")
-            for verse in sorted(usfm_data[book_id][chapter], key=int):
-                f.write(f"\\v {verse} {usfm_data[book_id][chapter][verse]}\n")
-    return True
-
-
-def write_settings_file(language_name, iso_code, sfm_folder):
+
+def write_settings_file(language_name, iso_code, sfm_folder, verbose=True):
     settings = f'<ScriptureText>\n  <Language>{language_name}</Language>\n  <Encoding>65001</Encoding>\n  <LanguageIsoCode>{iso_code}:::</LanguageIsoCode>\n  <Versification>4</Versification>\n  <Naming PrePart="" PostPart=".sfm" BookNameForm="41MAT" />\n</ScriptureText>'
     settings_file = sfm_folder / "Settings.xml"
 
@@ -200,10 +57,135 @@ def write_settings_file(language_name, iso_code, sfm_folder):
     else:
         with open(settings_file, "w", encoding="utf-8") as f_out:
             f_out.write(settings)
-        print(f"Wrote Settings.xml file: {settings_file}")
+        if verbose:
+            print(f"Wrote Settings.xml file: {settings_file}")
         return True
 
 
+def book_usfm(book, lines, versification):
+    """The USFM for a book, with a verse for each line of the extract in it that isn't empty."""
+    book_lines = versification.book_slice(book)
+    chapters = versification.chapters[book_lines].tolist()
+    verses = versification.verses[book_lines].tolist()
+    parts = [f"\\id {book}\n"]
+    current_chapter = None
+    for chapter, verse, line in zip(chapters, verses, lines[book_lines]):
+        if not line:
+            continue
+        if chapter != current_chapter:
+            parts.append(f"\\c {chapter}\n")
+            current_chapter = chapter
+        parts.append(f"\\v {verse} {line}\n")
+    return "".join(parts)
+
+
+def get_project_details(input_file, iso=None, language=None, project=None):
+    """Return the project folder name, iso code and language name for an extract named like iso-project.txt."""
+    if 'OpenBible' in input_file.name:
+        # ben-OpenBible_Bengali_Latn
+        match = re.match(r"(?P<iso>.\w{2,3})-OpenBible_(?P<Language>.+)", input_file.stem)
+        return project or f"OpenBible_{match.group('Language')}", iso or match.group('iso'), language or match.group('Language')
+
+    match = re.match(r"(?P<iso>.\w{2,3})-(?P<project>.+)", input_file.stem)
+    if not match:
+        raise ValueError(f"Can't find the iso code and project name in {input_file.name}")
+    return project or match.group('project'), iso or match.group('iso'), language
+
+
+def sha1(data):
+    return hashlib.sha1(data).hexdigest()
+
+
+def read_manifest(project_folder):
+    manifest_file = project_folder / manifest_filename
+    if manifest_file.is_file():
+        try:
+            with open(manifest_file, "r", encoding="utf-8") as f:
+                return json.load(f)
+        except (OSError, json.JSONDecodeError):
+            pass
+    return {"source": None, "books": {}}
+
+
+def convert_extract(input_file, project_folder, iso, language, vref_file, update=False):
+    """Write the books of an extract to a Paratext project folder and return a summary of what changed.
+
+    The hash of the extract and of each book file are kept in the project's manifest. If the
+    project exists it is skipped, or with update only the books whose text has changed are
+    written and those no longer in the extract are removed.
+    """
+    result = {"extract": input_file.name, "project": project_folder.name, "status": "", "written": 0, "unchanged": 0, "removed": 0}
+    exists = project_folder.is_dir()
+    if exists and not update:
+        result["status"] = "skipped"
+        return result
+
+    data = input_file.read_bytes()
+    manifest = read_manifest(project_folder)
+    source_hash = sha1(data)
+    if manifest["source"] == source_hash and all((project_folder / file).is_file() for file in manifest["books"]):
+        result["status"] = "unchanged"
+        result["unchanged"] = len(manifest["books"])
+        return result
+
+    versification = load_versification(vref_file)
+    lines = np.array([line.strip() for line in data.decode("utf-8").splitlines()], dtype=object)
+    if len(lines) != len(versification):
+        raise RuntimeError(f"{input_file.name} has {len(lines)} lines and there are {len(versification)} verse references. These should match.")
+
+    books = [ALL_BOOK_IDS[number - 1] for number in np.unique(versification.books[lines != ""]).tolist()]
+    project_folder.mkdir(parents=True, exist_ok=True)
+    book_hashes = {}
+    for book in books:
+        text = book_usfm(book, lines, versification).encode("utf-8")
+        sfm_file = project_folder / book_file_name(book)
+        book_hash = sha1(text)
+        book_hashes[sfm_file.name] = book_hash
+        if sfm_file.is_file() and (manifest["books"].get(sfm_file.name) or sha1(sfm_file.read_bytes())) == book_hash:
+            result["unchanged"] += 1
+            continue
+        # Write bytes so the line endings are the same on every platform and match the hash.
+        with open(sfm_file, "wb") as f:
+            f.write(text)
+        result["written"] += 1
+
+    for file in set(manifest["books"]) - set(book_hashes):
+        if (project_folder / file).is_file():
+            (project_folder / file).unlink()
+            result["removed"] += 1
+
+    write_settings_file(language or iso, iso, project_folder, verbose=False)
+    tmp_file = project_folder / (manifest_filename + ".tmp")
+    with open(tmp_file, "w", encoding="utf-8") as f:
+        json.dump({"source": source_hash, "books": book_hashes}, f, indent=1)
+    tmp_file.replace(project_folder / manifest_filename)
+    result["status"] = "updated" if exists else "created"
+    return result
+
+
+def convert_extracts(input_files, output_folder, vref_file, iso=None, language=None, project=None, update=False, workers=0):
+    """Convert extracts to Paratext projects in output_folder, several at once. Yield the summary for each."""
+    # Parse vref.txt here so that the workers load the cached arrays.
+    load_versification(vref_file)
+    jobs = []
+    for input_file in input_files:
+        try:
+            project_name, file_iso, file_language = get_project_details(input_file, iso, language, project)
+        except ValueError as error:
+            yield {"extract": input_file.name, "project": "", "status": f"failed: {error}", "written": 0, "unchanged": 0, "removed": 0}
+            continue
+        jobs.append((input_file, Path(output_folder) / project_name, file_iso, file_language, vref_file, update))
+
+    workers = workers if workers > 0 else max(1, (os.cpu_count() or 2) - 1)
+    with ProcessPoolExecutor(max_workers=min(workers, len(jobs) or 1)) as executor:
+        futures = [executor.submit(convert_extract, *job) for job in jobs]
+        for job, future in zip(jobs, futures):
+            try:
+                yield future.result()
+            except (OSError, RuntimeError, UnicodeDecodeError) as error:
+                yield {"extract": job[0].name, "project": job[1].name, "status": f"failed: {error}", "written": 0, "unchanged": 0, "removed": 0}
+
+
 def main():
     parser = argparse.ArgumentParser(description="Convert vref files to Paratext projects")
     parser.add_argument(
@@ -219,70 +201,54 @@ def main():
     parser.add_argument(
         "--output_folder",
         type=Path,
-        help="The path to the Paratext projects folder. The project folder will be created inside this folder.",
+        required=True,
+        help="The path to the Paratext projects folder. The project folders will be created inside this folder.",
     )
 
     parser.add_argument(
         "--language",
         type=str,
-        help="The language name - for the Settings.xml file both language name and iso_code are required.",
+        help="The language name for the Settings.xml file. The default is the iso code, or the language in an OpenBible file name.",
     )
     parser.add_argument(
         "--iso",
         type=str,
-        help="The iso code for the language. https://en.wikipedia.org/wiki/ISO_639-3/",
+        help="The iso code for the language. https://en.wikipedia.org/wiki/ISO_639-3/ The default is the one in the file name.",
     )
+    parser.add_argument(
+        "--project",
+        type=str,
+        help="The project folder name when converting one file. The default is the part of the file name after the iso code.",
+    )
+    parser.add_argument(
+        "--update",
+        action="store_true",
+        help="Update existing projects, writing only the books that have changed. Otherwise existing projects are skipped.",
+    )
+    parser.add_argument("--vref", type=Path, default=vref_file, help=f"The vref.txt file. The default is {vref_file}")
+    parser.add_argument("--workers", type=int, default=0, help="Number of processes. The default is one per cpu less one.")
 
     args = parser.parse_args()
 
     if args.file:
         input_files = [Path(args.file)]
-
     elif args.input_folder:
-        input_folder = Path(args.input_folder)
-        input_files = [file for file in input_folder.glob("*.txt")]
-
-    for input_file in input_files:
-        if 'OpenBible' in input_file.name:
-            # ben-OpenBible_Bengali_Latn
-            project_name_pattern = r"(?P<iso>.\w{2,3})-OpenBible_(?P<Language>.+)"
-            match = re.match(project_name_pattern, input_file.stem)
-            iso = match.group('iso')
-            language = match.group('Language')
-            project_folder_name = f"OpenBible_{language}"
-        else:
-            project_name_pattern = r"(?P<iso>.\w{2,3})-(?P<project>.+)"
-            print(input_file.stem)
-            match = re.match(project_name_pattern, input_file.stem)
-            print(match)
-            #project_folder_name = match.group('project')
-            iso = args.iso if args.iso else match.group('iso')
-            language = args.language
-            project_folder_name = 'RLV15'
-        project_folder = Path(args.output_folder) / project_folder_name
-        if project_folder.is_dir():
-            print(f"Output folder {project_folder} already exists. Stopping.")
-            exit()
-        else:
-            print(f"Creating folder for output: {project_folder}")
-            os.makedirs(project_folder, exist_ok=False)
-
-
-        usfm_data = parse_extract(input_file)
-        count = 0 
-        for book in usfm_data:
-            book_number = list(BIBLE.keys()).index(book) + 1
-            
-            sfm_file = project_folder / f"{book_number:02}{book}.sfm"
-            if save_to_usfm(book, usfm_data, sfm_file):
-                count += 1
-        
-        print(f"Saved {count} sfm files to {sfm_file.parent}")
-
-        write_settings_file(language, iso, project_folder)
-            
-        
-        #    print(f"Specify a Language in order to write the Settings.xml file.")
+        input_files = sorted(Path(args.input_folder).glob("*.txt"))
+    else:
+        parser.error("Specify a --file or an --input_folder to convert.")
+
+    if args.project and len(input_files) > 1:
+        parser.error("--project can only be used when converting one file.")
+
+    counts = {}
+    for result in convert_extracts(input_files, args.output_folder, args.vref, args.iso, args.language, args.project, args.update, args.workers):
+        status = result["status"].split(":")[0]
+        counts[status] = counts.get(status, 0) + 1
+        print(
+            f"{result['extract']} -> {result['project']}: {result['status']}, {result['written']} books written, "
+            f"{result['unchanged']} unchanged, {result['removed']} removed"
+        )
+    print(", ".join(f"{count} {status}" for status, count in counts.items()))
 
 
 if __name__ == "__main__":